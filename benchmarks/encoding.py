@@ -0,0 +1,113 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Detect the encoding, BOM and newline of a corpus of files in mixed encodings
+# within a time budget, and check the detected files load and save unchanged
+#
+# Run from the project root:
+#   python -m benchmarks.encoding [MB of the big files]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from ttkeditor.encoding import detectEncoding
+from ttkeditor.loader import readLines
+
+# Max seconds to detect a file
+BUDGET = 0.01
+
+TEXT = "Ünïcödé façade, naïve café — “quoted” ½ € line {}"
+LATIN1 = "Façade, naïve café, déjà vu ½ ± line {}"
+CP1252 = "“Smart quotes” — dash € sign line {}"
+
+# name, text, encoding, bom, newline
+CORPUS = (
+    ('ascii.txt', "plain ascii line {}", 'UTF-8', False, '\n'),
+    ('utf8.txt', TEXT, 'UTF-8', False, '\n'),
+    ('utf8-crlf.txt', TEXT, 'UTF-8', False, '\r\n'),
+    ('utf8-bom.txt', TEXT, 'UTF-8', True, '\n'),
+    ('utf8-cr.txt', TEXT, 'UTF-8', False, '\r'),
+    ('utf16le-bom.txt', TEXT, 'UTF-16-LE', True, '\r\n'),
+    ('utf16be-bom.txt', TEXT, 'UTF-16-BE', True, '\n'),
+    ('utf16le.txt', "ascii in utf-16 line {}", 'UTF-16-LE', False, '\n'),
+    ('utf32le-bom.txt', TEXT, 'UTF-32-LE', True, '\n'),
+    ('latin1.txt', LATIN1, 'ISO-8859-1', False, '\n'),
+    ('latin1-crlf.txt', LATIN1, 'ISO-8859-1', False, '\r\n'),
+    ('cp1252.txt', CP1252, 'CP1252', False, '\r\n'),
+)
+
+
+def write(path, text, encoding, bom, newline, lines):
+    with open(path, 'w', encoding=encoding, newline=newline) as f:
+        if bom:
+            f.write('\ufeff')
+        f.write('\n'.join(text.format(i) for i in range(lines)))
+
+
+def run(size):
+    folder = tempfile.mkdtemp()
+    try:
+        files = []
+        for name, text, encoding, bom, newline in CORPUS:
+            files.append((os.path.join(folder, name), encoding, bom, newline, 1000))
+            # Only the end of the big files is not ASCII
+            line = "ascii line {} " + "x"*40
+            lines = size*1024*1024//len(line)
+            big = os.path.join(folder, f"big-{name}")
+            write(big, line, encoding, bom, newline, lines)
+            with open(big, 'a', encoding=encoding, newline=newline) as f:
+                f.write('\n' + text.format(lines))
+            files.append((big, encoding, bom, newline, None))
+        for (name, text, encoding, bom, newline), (path, *_) in zip(CORPUS, files[::2]):
+            write(path, text, encoding, bom, newline, 1000)
+
+        print(f"{'':30}{'MB':>8}{'encoding':>12}{'bom':>6}{'newline':>8}{'ms':>8}")
+        worst = 0
+        for path, encoding, bom, newline, lines in files:
+            t = time.perf_counter()
+            detected = detectEncoding(path)
+            elapsed = time.perf_counter() - t
+            worst = max(worst, elapsed)
+            print(f"{os.path.basename(path):30}{os.path.getsize(path)/1024/1024:8.1f}{detected[0]:>12}"
+                  f"{str(detected[1]):>6}{repr(detected[2]):>8}{elapsed*1000:8.2f}")
+            assert detected == (encoding, bom, newline), (path, detected)
+            if lines:
+                # Loaded and saved as the detected encoding the file is unchanged
+                text = '\n'.join(l for ls, _ in readLines(path, detected[0], 1024, detected[1]) for l in ls)
+                with open(path, 'rb') as f:
+                    data = f.read()
+                out = os.path.join(folder, 'out')
+                write(out, text.replace('{', '{{').replace('}', '}}'), *detected, 1)
+                with open(out, 'rb') as f:
+                    assert f.read() == data, path
+        print(f"worst {worst*1000:.2f}ms, budget {BUDGET*1000:.0f}ms")
+        assert worst < BUDGET
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 32)
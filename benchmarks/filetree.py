@@ -0,0 +1,89 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Expand a folder with many entries in the TTkEditorFileTree and measure
+# the time the caller (the UI) is blocked, the time to list it in background
+# (first listing and cached), compared with the TermTk file tree listing it
+# in the caller
+#
+# Run from the project root (in a terminal):
+#   python -m benchmarks.filetree [entries]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from TermTk import TTkHelper
+from TermTk import TTkFileTreeWidget
+
+from ttkeditor.filetree import TTkEditorFileTree, TTKEditorDirectoryCache
+
+ENTRIES = 50000
+
+
+def expand(view, node):
+    # Seconds blocked in the call and until listed
+    t = time.perf_counter()
+    view._setExpanded(node, True)
+    blocked = time.perf_counter() - t
+    while True:
+        # The rows are updated with the view locked
+        with view._mutex:
+            if not node.loading and node.children is not None:
+                break
+        time.sleep(0.001)
+    return blocked, time.perf_counter() - t
+
+
+def run():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else ENTRIES
+    root = tempfile.mkdtemp()
+    try:
+        os.makedirs(folder := os.path.join(root, 'big'))
+        for i in range(entries):
+            open(os.path.join(folder, f"file{i:06}.txt"), 'w').close()
+
+        t = time.perf_counter()
+        TTkFileTreeWidget._getFileItems(folder)
+        print(f"TTkFileTree listing{(time.perf_counter()-t)*1000:10.1f} ms blocked")
+
+        tree = TTkEditorFileTree(path=root)
+        view = tree._fileTreeView
+        while view._root.children is None:
+            time.sleep(0.001)
+        node = view._root.children[0]
+        for name in ('first listing', 'cached'):
+            blocked, listed = expand(view, node)
+            assert len(view._rows) == entries+1
+            print(f"{name:>18}{blocked*1000:10.1f} ms blocked{listed*1000:10.1f} ms listed")
+            view._setExpanded(node, False)
+            # The cached entries are used by the next listing
+            node.children = node.entries = None
+    finally:
+        TTkHelper.quitEvent.emit()
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,75 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Highlight a file with the lexer (as when opened the first time)
+# and restore the same highlight from the TTKEditorHighlightCache
+#
+# Run from the project root:
+#   python -m benchmarks.highlightcache [file] [copies]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from ttkeditor.config import TTKEditorConfig
+from ttkeditor.formatter import TTKEditorFormatter
+from ttkeditor.highlighter import highlightLines
+from ttkeditor.highlightcache import TTKEditorHighlightCache
+from ttkeditor.lexercache import TTKEditorLexerCache
+
+
+def run(filePath, copies):
+    TTKEditorConfig.pathCfg = tempfile.mkdtemp()
+    try:
+        with open(filePath) as f:
+            texts = f.read().split('\n')*copies
+        lines = len(texts)
+        lexer = TTKEditorLexerCache.lexer(filePath, '\n'.join(texts[:30]))
+        formatter = TTKEditorFormatter(style='gruvbox-dark')
+
+        t = time.perf_counter()
+        spans, states, _ = highlightLines(lexer, formatter, ('root',), texts, [None]*lines, bytes(lines), ())
+        lexed = time.perf_counter() - t
+        status = bytes(lines)
+
+        t = time.perf_counter()
+        TTKEditorHighlightCache.save(filePath, 0, 0, lexer.name, status, states, spans)
+        saved = time.perf_counter() - t
+        size = os.path.getsize(TTKEditorHighlightCache.cachePath(filePath, 0, 0))
+
+        t = time.perf_counter()
+        cached = TTKEditorHighlightCache.load(filePath, 0, 0, lines)
+        loaded = time.perf_counter() - t
+        assert cached[3] == spans and cached[2] == states
+
+        print(f"{filePath} x{copies}: {lines} lines, {lexer.name}, cache {size/1024:.0f} KB ({size/lines:.1f} bytes/line)")
+        print(f"{'lex':>8}{lexed*1000:10.1f} ms")
+        print(f"{'save':>8}{saved*1000:10.1f} ms")
+        print(f"{'load':>8}{loaded*1000:10.1f} ms")
+    finally:
+        shutil.rmtree(TTKEditorConfig.pathCfg)
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else 'ttkeditor/app.py',
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100)
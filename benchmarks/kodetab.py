@@ -0,0 +1,90 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Find the pane of each of the tabs of a TTkEditorKodeTab split in nested panes,
+# compared with walking the nested splitters, and activate each tab
+# (the tab bar update of TermTk is included)
+#
+# Run from the project root (in a terminal):
+#   python -m benchmarks.kodetab [tabs]
+
+import sys
+import time
+
+from TermTk import TTkK, TTkHelper, TTkLabel, TTkSplitter
+from TermTk.TTkWidgets.kodetab import _TTkKodeTab
+
+from ttkeditor.kodetab import TTkEditorKodeTab
+
+TABS = 300
+PANES = 10
+
+
+def walkOwner(kodetab, widget):
+    # The _TTkKodeTab of the widget found walking the splitters
+    for w in kodetab.layout().iterWidgets():
+        if type(w) is _TTkKodeTab:
+            if widget in w._tabWidgets:
+                return w
+        elif isinstance(w, TTkSplitter) and (owner := walkOwner(w, widget)) is not None:
+            return owner
+    return None
+
+
+def run():
+    tabs = int(sys.argv[1]) if len(sys.argv) > 1 else TABS
+    codeView = TTkEditorKodeTab(border=False, closable=True)
+    # Each pane is nested in the splitter of the previous one
+    splitter, panes = codeView, [codeView._lastKodeTabWidget]
+    for i in range(1, PANES):
+        splitter.addWidget(child := TTkSplitter(orientation=TTkK.VERTICAL if i % 2 else TTkK.HORIZONTAL))
+        child.addWidget(pane := _TTkKodeTab(baseWidget=codeView, border=False, closable=True))
+        splitter, panes = child, panes + [pane]
+    widgets = []
+    for i in range(tabs):
+        panes[i % PANES].addTab(widget := TTkLabel(text=f"tab {i}"), f"tab {i}")
+        widgets.append(widget)
+
+    for widget in widgets:
+        assert codeView.kodeTab(widget) is walkOwner(codeView, widget) is not None
+
+    results = {}
+    for name, find in (
+            ('kodeTab', codeView.kodeTab),
+            ('walk the splitters', lambda w: walkOwner(codeView, w))):
+        t = time.perf_counter()
+        for widget in widgets:
+            find(widget)
+        results[name] = time.perf_counter() - t
+    t = time.perf_counter()
+    for widget in widgets:
+        codeView.setCurrentWidget(widget)
+    results['setCurrentWidget'] = time.perf_counter() - t
+
+    print(f"{tabs} tabs in {PANES} nested panes, us/tab")
+    for name, t in results.items():
+        print(f"{name:>20}{t/tabs*1e6:10.1f}")
+    TTkHelper.quitEvent.emit()
+
+
+if __name__ == "__main__":
+    run()
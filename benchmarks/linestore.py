@@ -0,0 +1,73 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Compare the TTKEditorLineStore with the list storage
+# on the operations applied by TTkTextCursor and the snapshots
+#
+# Run from the project root:
+#   python -m benchmarks.linestore [lines]
+
+import sys
+import timeit
+
+from ttkeditor.linestore import TTKEditorLineStore
+
+PASTE = [f"pasted line {i}" for i in range(10000)]
+
+
+def insert(lines, i):
+    # TTkTextCursor.insertText with a newline
+    lines[i] = lines[i] + "x"
+    lines.insert(i+1, "new line")
+
+
+def delete(lines, i):
+    # TTkTextCursor._removeSelectedText over 100 lines
+    lines[i] = lines[i] + lines[i+100]
+    return lines[:i+1] + lines[i+101:]
+
+
+def paste(lines, i):
+    lines[i:i+1] = PASTE
+
+
+def snapshot(lines, i):
+    # TTkTextDocument.saveSnapshot
+    return lines.copy()
+
+
+def run(size, number=20):
+    base = [f"line {i} of the text used for the benchmark" for i in range(size)]
+    print(f"{size} lines, ms per operation")
+    print(f"{'':20}{'list':>10}{'store':>10}")
+    for op in (insert, delete, paste, snapshot):
+        for where, i in (('start', 0), ('middle', size//2), ('end', size-200)):
+            times = []
+            for storage in (list, TTKEditorLineStore):
+                lines = storage(base)
+                t = timeit.timeit(lambda: op(lines, i), number=number)
+                times.append(t*1000/number)
+            print(f"{op.__name__+' '+where:20}{times[0]:10.3f}{times[1]:10.3f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
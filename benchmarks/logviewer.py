@@ -0,0 +1,79 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Cost of a new message in the TTkEditorLogRepository (ingest and the
+# size queried by the log viewer) with the repository holding more messages,
+# compared with computing the width over all the messages
+#
+# Run from the project root:
+#   python -m benchmarks.logviewer
+
+import time
+
+from TermTk import TTkLog, TTkString
+
+from ttkeditor.config import TTKEditorConfig
+from ttkeditor.logviewer import TTkEditorLogRepository
+
+SIZES = (1000, 10000, 100000)
+SAMPLES = 1000
+
+
+class _Context:
+    file = 'ttkeditor/textdocument.py'
+    line = 42
+
+
+def perMessage(repository, messages):
+    # Seconds per message: add it and get the area size as the viewer does
+    t = time.perf_counter()
+    for i in range(messages):
+        repository.loggingCallback(TTkLog.InfoMsg, _Context, f"message {i} ünïcödé" if i % 10 == 0 else f"message {i}")
+        repository.width(), repository.count()
+    return (time.perf_counter() - t) / max(1, messages)
+
+
+def fullWidth(repository):
+    # The width computed from all the messages
+    t = time.perf_counter()
+    max(m.termWidth() for m in repository.messages())
+    return time.perf_counter() - t
+
+
+def run():
+    TTKEditorConfig.logFileSize = 0
+    print(f"{'messages':>10}{'capacity':>10}{'us/message':>12}{'full width ms':>15}")
+    for capacity, full in ((max(SIZES)+SAMPLES, False), (min(SIZES), True)):
+        repository = TTkEditorLogRepository(capacity=capacity, level='debug')
+        kept = 0
+        for size in SIZES:
+            perMessage(repository, size-kept-SAMPLES)
+            cost = perMessage(repository, SAMPLES)
+            kept = size
+            assert repository.count() == min(size, capacity)
+            assert repository.width() == max(m.termWidth() for m in repository.messages())
+            print(f"{size:10}{capacity:10}{cost*1e6:12.2f}{fullWidth(repository)*1000:15.1f}")
+
+
+if __name__ == "__main__":
+    run()
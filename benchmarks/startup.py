@@ -0,0 +1,114 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+# Cold start of the editor opening a file as $EDITOR does:
+# time to import ttkeditor.app and time to the first frame
+# with the file shown, each run in a new interpreter on a pty
+#
+# Run from the project root:
+#   python -m benchmarks.startup [file]
+
+import os
+import pty
+import sys
+import json
+import time
+import fcntl
+import struct
+import termios
+import tempfile
+import statistics
+import subprocess
+
+RUNS = 5
+
+CHILD = r'''
+import sys, json, time
+start = time.perf_counter()
+import ttkeditor.app
+imported = time.perf_counter()
+
+from TermTk import TTk, TTkHelper, TTkGridLayout
+from ttkeditor.config import TTKEditorConfig
+from ttkeditor.texteditview import TTKEditorTextEditView
+
+TTKEditorConfig.pathCfg = sys.argv[2]
+painted = []
+paintEvent = TTKEditorTextEditView.paintEvent
+def _paintEvent(self, canvas):
+    paintEvent(self, canvas)
+    painted.append(time.perf_counter())
+TTKEditorTextEditView.paintEvent = _paintEvent
+
+paintAll = TTkHelper.paintAll
+def _paintAll():
+    paintAll()
+    # The first frame with the file pushed to the terminal
+    if painted and TTkHelper._rootCanvas is not None:
+        with open(sys.argv[3], 'w') as f:
+            json.dump({'import': imported-start, 'firstPaint': time.perf_counter()-start}, f)
+        TTkHelper.paintAll = paintAll
+        TTkHelper.quit()
+TTkHelper.paintAll = _paintAll
+
+root = TTk(layout=TTkGridLayout())
+root.layout().addWidget(ttkeditor.app.TTkEditorApp(files=[sys.argv[1]]))
+root.mainloop()
+'''
+
+
+def startup(filePath, pathCfg):
+    # Seconds to import ttkeditor.app, to the first frame and of the whole process
+    with tempfile.NamedTemporaryFile(suffix='.json') as result:
+        master, slave = pty.openpty()
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack('HHHH', 40, 120, 0, 0))
+        t = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, '-c', CHILD, filePath, pathCfg, result.name],
+            stdin=slave, stdout=slave, stderr=slave, close_fds=True)
+        os.close(slave)
+        # The terminal output is discarded
+        try:
+            while os.read(master, 65536):
+                pass
+        except OSError:
+            pass
+        proc.wait()
+        total = time.perf_counter() - t
+        os.close(master)
+        data = json.load(result)
+    return data['import'], data['firstPaint'], total
+
+
+def run():
+    filePath = sys.argv[1] if len(sys.argv) > 1 else 'ttkeditor/app.py'
+    with tempfile.TemporaryDirectory() as pathCfg:
+        runs = [startup(filePath, pathCfg) for _ in range(RUNS)]
+    print(f"{filePath}: median of {RUNS} runs")
+    for name, values in zip(('import ttkeditor.app', 'first paint', 'process (with exit)'), zip(*runs)):
+        print(f"{name:>22}{statistics.median(values)*1000:10.1f} ms")
+
+
+if __name__ == "__main__":
+    run()
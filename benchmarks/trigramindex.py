@@ -0,0 +1,91 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Build the TTKEditorTrigramIndex of a folder and compare the queries
+# (candidate files) with the search of all the files
+#
+# Run from the project root:
+#   python -m benchmarks.trigramindex [folder]
+
+import os
+import re
+import sys
+import time
+import tempfile
+
+from ttkeditor.config import TTKEditorConfig
+from ttkeditor.findinfiles import TTKEditorSearchWorker, walkFiles, searchFiles
+from ttkeditor.trigramindex import TTKEditorTrigramIndex
+
+PATTERNS = (
+    ('import os', False),
+    ('TODO', False),
+    (r'def \w+_cache\(', True),
+    ('NotImplementedError', False),
+    (r'class \w+Error\(', True),
+)
+
+
+def run(root):
+    TTKEditorConfig.pathCfg = tempfile.mkdtemp()
+    try:
+        index = TTKEditorTrigramIndex(root)
+        t = time.perf_counter()
+        index.rebuild()
+        build = time.perf_counter() - t
+        t = time.perf_counter()
+        index.update()
+        update = time.perf_counter() - t
+        # As before each search, the folder is not walked again
+        t = time.perf_counter()
+        index.update(maxAge=TTKEditorConfig.indexMaxAge)
+        recent = time.perf_counter() - t
+        t = time.perf_counter()
+        TTKEditorTrigramIndex(root)
+        load = time.perf_counter() - t
+        # The index keeps the real paths
+        files = list(walkFiles(os.path.realpath(root)))
+        print(f"{index.fileCount()} files, index {os.path.getsize(index.indexPath())/1024/1024:.1f} MB, "
+              f"{sum(map(len, index._postings.values()))} postings")
+        print(f"build {build:.2f}s, update (no changes) {update:.2f}s, "
+              f"update (within indexMaxAge) {recent*1000:.3f}ms, load {load:.2f}s")
+        print(f"{'':30}{'candidates':>12}{'query ms':>10}{'indexed s':>10}{'all s':>10}")
+        for pattern, regex in PATTERNS:
+            pattern = pattern if regex else re.escape(pattern)
+            t = time.perf_counter()
+            candidates = index.candidates(pattern, re.IGNORECASE)
+            query = time.perf_counter() - t
+            t = time.perf_counter()
+            found = searchFiles(candidates, pattern, re.IGNORECASE, True, TTKEditorConfig.largeFileSize)
+            indexed = time.perf_counter() - t
+            t = time.perf_counter()
+            expected = searchFiles(files, pattern, re.IGNORECASE, True, TTKEditorConfig.largeFileSize)
+            full = time.perf_counter() - t
+            assert sorted(found) == sorted(expected)
+            print(f"{pattern:30}{len(candidates):12}{query*1000:10.1f}{indexed:10.2f}{full:10.2f}")
+    finally:
+        TTKEditorSearchWorker.shutdown()
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else '.')
@@ -0,0 +1,95 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Memory and time of the undo history of a TTKEditorTextDocument,
+# compared with the slices kept by the TTkTextDocument snapshots
+#
+# Run from the project root:
+#   python -m benchmarks.undo [lines]
+
+import sys
+import time
+
+from TermTk import TTkHelper, TTkTextCursor
+
+from ttkeditor.textdocument import TTKEditorTextDocument
+from ttkeditor.undo import _size
+
+
+def document(size):
+    doc = TTKEditorTextDocument(text='\n'.join(f"line {i} of the text used for the benchmark" for i in range(size)))
+    doc.unloadHighlight()
+    return doc
+
+
+def snapshotSize(doc, a, b, c):
+    # The TTkTextDocument snapshots keep the removed and the added lines
+    return sum(map(_size, doc._lastSnap[a:a+b])) + sum(map(_size, doc._dataLines[a:a+c]))
+
+
+def paste(size):
+    doc = document(size)
+    cursor = TTkTextCursor(document=doc)
+    cursor.setPosition(size//2, 0)
+    cursor.insertText('\n'.join(f"pasted line {i}" for i in range(10000)))
+    snapshot = snapshotSize(doc, *doc._snapChanged)
+    t = time.perf_counter()
+    doc.saveSnapshot(cursor.copy())
+    saved = time.perf_counter() - t
+    t = time.perf_counter()
+    doc.restoreSnapshotPrev()
+    undone = time.perf_counter() - t
+    t = time.perf_counter()
+    doc.restoreSnapshotNext()
+    redone = time.perf_counter() - t
+    history = doc.undoHistory()
+    print(f"paste 10000 lines in {size} lines")
+    print(f"{'save':>12}{saved*1000:10.1f} ms")
+    print(f"{'undo':>12}{undone*1000:10.1f} ms")
+    print(f"{'redo':>12}{redone*1000:10.1f} ms")
+    print(f"{'history':>12}{history.size()/1024:10.1f} KB, snapshots {snapshot/1024:.0f} KB")
+
+
+def typing(size, words=2000):
+    # A snapshot at each space as in TTkTextEditView.keyEvent
+    doc = document(size)
+    cursor = TTkTextCursor(document=doc)
+    snapshot = 0
+    pos = 0
+    for i in range(words):
+        cursor.setPosition(size//2, pos)
+        cursor.insertText(f"word{i%10} ")
+        pos += 6
+        snapshot += snapshotSize(doc, *doc._snapChanged)
+        doc.saveSnapshot(cursor.copy())
+    history = doc.undoHistory()
+    print(f"typing {words} words in a line")
+    print(f"{'entries':>12}{history.entries():10}, snapshots {words}")
+    print(f"{'history':>12}{history.size()/1024:10.1f} KB, snapshots {snapshot/1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    try:
+        size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+        paste(size)
+        typing(size)
+    finally:
+        TTkHelper.quitEvent.emit()
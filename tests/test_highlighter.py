@@ -0,0 +1,103 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# The highlight updated after the edits must match the highlight
+# of the same text done from scratch
+#
+# Run from the project root (in a terminal):
+#   python -m unittest discover tests
+
+import time
+import unittest
+
+from TermTk import TTkString
+from TermTk import TTkTextCursor
+
+from ttkeditor.textdocument import TTKEditorTextDocument
+from ttkeditor.highlighter import supportsCheckpoints
+
+RUBY = '''\
+class Greeter
+  def initialize(name)
+    @name = name
+  end
+
+  # Say hello
+  def hello(count)
+    text = <<~EOS
+      Hello #{@name}
+    EOS
+    count.times { |i| puts "#{i}: #{text}" }
+  end
+end
+
+'''
+
+
+def highlighted(document, timeout=10):
+    # Wait for the background refresh to highlight all the lines
+    status = (document.HL_DIRTY, document.HL_STALE, document.HL_PROVISIONAL)
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        with document.getLock():
+            if document._highlightJob is None and document._findStatus(status) < 0:
+                return list(document._spans)
+        time.sleep(0.01)
+    raise TimeoutError("highlight not completed")
+
+
+class TestIncrementalHighlight(unittest.TestCase):
+    def _compare(self, filePath, text, edits):
+        document = TTKEditorTextDocument(text=text, filePath=filePath)
+        try:
+            highlighted(document)
+            cursor = TTkTextCursor(document=document)
+            for line, value in edits:
+                document.replaceLines(line, 1, [TTkString(value)], cursor)
+                highlighted(document)
+            spans = highlighted(document)
+            text = '\n'.join(l._text for l in document._dataLines)
+        finally:
+            document.close()
+        fresh = TTKEditorTextDocument(text=text, filePath=filePath)
+        try:
+            self.assertEqual(spans, highlighted(fresh))
+        finally:
+            fresh.close()
+        return document
+
+    def test_nonRegexLexer(self):
+        # A quote opening a string changes the highlight of all the lines below
+        text = RUBY*20
+        document = self._compare(
+            'test.rb', text, [(i*15+7, '  def hello(count) "') for i in range(5)])
+        self.assertFalse(supportsCheckpoints(document.lexer()))
+
+    def test_regexLexer(self):
+        text = 'def f():\n    return 1\n\n'*100
+        document = self._compare(
+            'test.py', text, [(i*30+1, '    return """') for i in range(5)])
+        self.assertTrue(supportsCheckpoints(document.lexer()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -22,16 +22,20 @@
 
 
 import os
+import re
+from threading import Thread
+from collections import deque
 
 from TermTk import TTkK
+from TermTk import TTkLog
 from TermTk import TTkCfg
 from TermTk import TTkColor
 from TermTk import TTkHelper
+from TermTk import TTkTimer
 from TermTk import TTkString
 from TermTk import TTkKodeTab
 from TermTk import TTkAbout
 from TermTk import TTkFileDialogPicker
-from TermTk import TTkFileTree
 from TermTk import TTkTextEdit
 from TermTk import TTkShortcut
 from TermTk import TTkGridLayout
@@ -47,46 +51,75 @@ from TermTk import TTkTerminalHelper
 from TermTk import TTkSplitter
 from TermTk import TTkList
 from TermTk import TTkAbstractListItem
+from TermTk import TTkMessageBox
 
-from ttkeditor.about import TTKEditorAbout
+from ttkeditor.config import TTKEditorConfig
+from ttkeditor.encoding import detectEncoding
 from ttkeditor.exceptions import TTkEditorNYIError
+from ttkeditor.filetree import TTkEditorFileTree
 from ttkeditor.kodetab import TTkEditorKodeTab
+from ttkeditor.loader import TTKEditorFileLoader
+from ttkeditor.saver import TTKEditorFileSaver
+from ttkeditor.watcher import TTKEditorFileWatcher
+from ttkeditor.reloader import reloadDocument
 from ttkeditor.logviewer import TTkEditorLogRepository, TTkEditorLogViewer
+from ttkeditor.searchbar import TTkEditorSearchBar
+from ttkeditor.session import TTKEditorSession
 from ttkeditor.texteditview import TTKEditorTextEditView
 from ttkeditor.textdocument import TTKEditorTextDocument
 
 
 class TTkEditorApp(TTkAppTemplate):
+    _newlineNames = {'\n': 'LF', '\r\n': 'CRLF', '\r': 'CR'}
+
     __slots__ = (
-        '_modified', '_codeView', '_documents',
-        '_cursorPositionStatus', '_encodingStatus', '_languageStatus'
+        '_codeView', '_documents',
+        '_cursorPositionStatus', '_encodingStatus', '_languageStatus',
+        '_loadingStatus', '_loaders', '_savingStatus', '_savers',
+        '_currentEditor', '_searchBar', '_watcher', '_followTailToggler',
+        '_toolsView', '_fileTree', '_fileTreeTimer', '_editorItems',
+        '_posted', '_postedTimer'
     )
 
-    def __init__(self, files=None, border=False, *args, **kwargs):
+    def __init__(self, files=None, border=False, session=False, *args, **kwargs):
         self._documents = {}
-        self._modified = False
+        # Editor -> item of the open editors list
+        self._editorItems = {}
+        self._loaders = []
+        self._savers = []
+        self._currentEditor = None
+        self._searchBar = None
+        # Built on first use (see _toolsPanel and _showFileTree)
+        self._toolsView = None
+        self._fileTree = None
 
         super().__init__(border=border, **kwargs)
 
         self._logRepository = TTkEditorLogRepository()
 
+        # The notifications of the loaders, savers and watcher threads (see _post)
+        self._posted = deque()
+        self._postedTimer = TTkTimer()
+        self._postedTimer.timeout.connect(self._runPosted)
+
+        # The open files changed on disk are reloaded
+        self._watcher = TTKEditorFileWatcher()
+        self._watcher.fileChanged.connect(lambda filePath: self._post(self._fileChanged, filePath))
+
         self._sidePanel = TTkSplitter(orientation=TTkK.VERTICAL)
         self._openEditors = TTkList()
         self._openEditors.itemClicked.connect(self._openEditorsItemClicked)
         self._sidePanel.addWidget(self._openEditors, 5)
-        fileTree = TTkFileTree(path='.')
-        fileTree.fileActivated.connect(lambda x: self._openFileTab(x.path()))
-        self._sidePanel.addWidget(fileTree)
+        # The file tree is added after the first frame
+        self._fileTreeTimer = TTkTimer()
+        self._fileTreeTimer.timeout.connect(self._showFileTree)
 
         self._codeView = TTkEditorKodeTab(border=False, closable=True)
         self._codeView.currentChanged.connect(self._currentTabChanged)
         self._codeView.tabCloseRequested.connect(self._tabCloseRequested)
 
-        self._toolsView = TTkKodeTab(border=False, closable=True)
-
         self.setWidget(self._sidePanel, TTkAppTemplate.LEFT, 20)
         self.setWidget(self._codeView)
-        self.setWidget(self._toolsView, TTkAppTemplate.BOTTOM, 10)
 
         menuBar = TTkMenuBarLayout()
         self.setMenuBar(menuBar, TTkAppTemplate.HEADER)
@@ -96,27 +129,37 @@ class TTkEditorApp(TTkAppTemplate):
         fileMenu = menuBar.addMenu("&File")
         fileMenu.addMenu("Open").menuButtonClicked.connect(
             self._showFileDialog)
+        fileMenu.addMenu("Save Ctrl+S").menuButtonClicked.connect(self._saveFile)
+        TTkShortcut(TTkK.CTRL | TTkK.Key_S).activated.connect(self._saveFile)
+        fileMenu.addMenu("Save all").menuButtonClicked.connect(self._saveAll)
         fileMenu.addMenu("Close").menuButtonClicked.connect(self._closeFile)
         fileMenu.addMenu("E&xit Alt+X").menuButtonClicked.connect(self._quit)
         TTkShortcut(TTkK.ALT | TTkK.Key_X).activated.connect(self._quit)
 
         editMenu = menuBar.addMenu("&Edit")
-        editMenu.addMenu("Search")
-        editMenu.addMenu("Replace")
+        editMenu.addMenu("Search").menuButtonClicked.connect(
+            self._openSearchTab)
+        editMenu.addMenu("Replace").menuButtonClicked.connect(
+            self._openReplaceTab)
 
         toolsMenu = menuBar.addMenu("&Tools")
         toolsMenu.addMenu("Logs").menuButtonClicked.connect(
             self._openLogViewerTab)
         toolsMenu.addMenu("Terminal").menuButtonClicked.connect(
             self._openTerminalTab)
+        toolsMenu.addMenu("Find in files").menuButtonClicked.connect(
+            self._openFindInFilesTab)
+        toolsMenu.addMenu("Rebuild search index").menuButtonClicked.connect(
+            self._rebuildSearchIndex)
+        self._followTailToggler = toolsMenu.addMenu("Follow tail", checkable=True, checked=False)
+        self._followTailToggler.toggled.connect(self._setFollowTail)
 
         panelsMenu = menuBar.addMenu("&Panels", alignment=TTkK.RIGHT_ALIGN)
         self._sidePanelToggler = panelsMenu.addMenu("Side panel", checkable=True, checked=True)
-        self._sidePanelToggler.toggled.connect(self._sidePanel.setVisible)
+        self._sidePanelToggler.toggled.connect(self._setSidePanelVisible)
 
         self._toolsViewToggler = panelsMenu.addMenu("Tools panel", checkable=True, checked=False)
-        self._toolsViewToggler.toggled.connect(self._toolsView.setVisible)
-        self._toolsView.setVisible(False)
+        self._toolsViewToggler.toggled.connect(self._setToolsPanelVisible)
 
         helpMenu = menuBar.addMenu(
             "&Help", alignment=TTkK.RIGHT_ALIGN)
@@ -137,24 +180,81 @@ class TTkEditorApp(TTkAppTemplate):
         self._languageStatus = self._statusBar.addMenu(
             "", alignment=TTkK.RIGHT_ALIGN)
         self._languageStatus.setVisible(False)
+        self._loadingStatus = self._statusBar.addMenu(
+            "", alignment=TTkK.RIGHT_ALIGN)
+        self._loadingStatus.menuButtonClicked.connect(self._cancelLoading)
+        self._loadingStatus.setVisible(False)
+        self._savingStatus = self._statusBar.addMenu(
+            "", alignment=TTkK.RIGHT_ALIGN)
+        self._savingStatus.setVisible(False)
 
         nf_cod_bell = ""
         nf_cod_bell_dot = ""
         self._notificationStatus = self._statusBar.addMenu(
             nf_cod_bell, alignment=TTkK.RIGHT_ALIGN).menuButtonClicked.connect(self._showNotificationsDialog)
 
-        if files is not None:
+        if files:
             for file in files:
                 self._openFileTab(file)
+        elif session:
+            # The session is not replaced by the files opened from the command line
+            self._restoreSession()
+            TTkHelper.quitEvent.connect(self._saveSession)
+
+    def _post(self, cb, *args):
+        # cb is called from the app timer and not from the worker thread
+        # notifying it, the widgets are not changed by the workers
+        self._posted.append((cb, args))
+        self._postedTimer.start(0)
+
+    @pyTTkSlot()
+    def _runPosted(self):
+        while self._posted:
+            cb, args = self._posted.popleft()
+            cb(*args)
+
+    def paintEvent(self, canvas):
+        super().paintEvent(canvas)
+        if self._fileTree is None and self._sidePanel.isVisible():
+            self._fileTreeTimer.start(0)
+
+    @pyTTkSlot()
+    def _showFileTree(self):
+        if self._fileTree is not None:
+            return
+        self._fileTree = TTkEditorFileTree(path='.')
+        self._fileTree.fileActivated.connect(self._openFileTab)
+        self._sidePanel.addWidget(self._fileTree)
+
+    @pyTTkSlot(bool)
+    def _setSidePanelVisible(self, visible):
+        self._sidePanel.setVisible(visible)
+        if visible:
+            self._showFileTree()
+
+    def _toolsPanel(self):
+        if self._toolsView is None:
+            self._toolsView = TTkKodeTab(border=False, closable=True)
+            self._toolsView.tabCloseRequested.connect(self._tabCloseRequested)
+            self.setWidget(self._toolsView, TTkAppTemplate.BOTTOM, 10)
+            self._toolsView.setVisible(self._toolsViewToggler.isChecked())
+        return self._toolsView
+
+    @pyTTkSlot(bool)
+    def _setToolsPanelVisible(self, visible):
+        if visible or self._toolsView is not None:
+            self._toolsPanel().setVisible(visible)
 
     pyTTkSlot()
 
     def _closeFile(self):
-        if self._codeView.lastUsed:
-            if (index := self._codeView.lastUsed.currentIndex()) >= 0:
-                self._codeView.lastUsed.removeTab(index)
+        if self._currentEditor is None:
+            return
+        if (kodetab := self._codeView.kodeTab(self._currentEditor)) is not None:
+            kodetab.removeTab(kodetab.currentIndex())
 
     def _showAboutDialog(self, btn):
+        from ttkeditor.about import TTKEditorAbout
         TTkHelper.overlay(None, TTKEditorAbout(), 30, 10)
 
     def _showAboutTTkDialog(self, btn):
@@ -165,18 +265,181 @@ class TTkEditorApp(TTkAppTemplate):
                                         flags=TTkK.WindowFlag.WindowMaximizeButtonHint | TTkK.WindowFlag.WindowCloseButtonHint)
         logViewer = TTkEditorLogViewer(self._logRepository, follow=True)
         notificationsWindow.layout().addWidget(logViewer)
+        notificationsWindow.closed.connect(lambda _: logViewer.close())
         TTkHelper.overlay(None, notificationsWindow, 10, 5)
 
     def _openLogViewerTab(self, btn):
         logViewer = TTkEditorLogViewer(self._logRepository, follow=True)
-        self._toolsView.addTab(logViewer, "Logs")
-        self._toolsView.setCurrentWidget(logViewer)
+        self._toolsPanel().addTab(logViewer, "Logs")
+        self._toolsPanel().setCurrentWidget(logViewer)
         self._toolsViewToggler.setChecked(True)
 
+    def _openSearchTab(self):
+        if self._searchBar is None:
+            self._searchBar = TTkEditorSearchBar()
+            self._searchBar.patternChanged.connect(self._searchPatternChanged)
+            self._searchBar.findNext.connect(self._searchNext)
+            self._searchBar.findPrevious.connect(self._searchPrevious)
+            self._searchBar.replaceAll.connect(self._searchReplaceAll)
+        if self._searchBar.parentWidget() is None:
+            self._toolsPanel().addTab(self._searchBar, "Search")
+        self._toolsPanel().setCurrentWidget(self._searchBar)
+        self._toolsViewToggler.setChecked(True)
+        self._searchBar.setFocus()
+
+    def _openReplaceTab(self):
+        self._openSearchTab()
+        self._searchBar.setReplaceFocus()
+
+    def _currentSearch(self):
+        if self._currentEditor is None:
+            return None
+        return self._currentEditor.textEditView().document().search()
+
+    @pyTTkSlot(str, bool, bool)
+    def _searchPatternChanged(self, pattern, regex, caseSensitive):
+        if (search := self._currentSearch()) is None:
+            return
+        try:
+            search.setPattern(pattern, regex, caseSensitive)
+        except re.error:
+            self._searchBar.setCount("Invalid pattern")
+            return
+        # Move to the first match from the current one while typing
+        tview = self._currentEditor.textEditView()
+        selSt = tview.textCursor()._properties[0].selectionStart()
+        self._selectMatch(search.next(selSt.line, selSt.pos))
+
+    @pyTTkSlot()
+    def _searchNext(self):
+        if (search := self._currentSearch()) is None:
+            return
+        p = self._currentEditor.textEditView().textCursor().position()
+        self._selectMatch(search.next(p.line, p.pos))
+
+    @pyTTkSlot()
+    def _searchPrevious(self):
+        if (search := self._currentSearch()) is None:
+            return
+        selSt = self._currentEditor.textEditView().textCursor()._properties[0].selectionStart()
+        self._selectMatch(search.previous(selSt.line, selSt.pos))
+
+    @pyTTkSlot(str)
+    def _searchReplaceAll(self, replacement):
+        if (search := self._currentSearch()) is None:
+            return
+        tview = self._currentEditor.textEditView()
+        if tview.isReadOnly():
+            return
+        try:
+            count = search.replaceAll(replacement, tview.textCursor().copy())
+        except re.error:
+            self._searchBar.setCount("Invalid replacement")
+            return
+        TTkLog.info(f"Replaced {count} matches")
+        tview.update()
+
+    def _selectMatch(self, match, tview=None):
+        if match is None:
+            return
+        line, start, end = match
+        tview = tview or self._currentEditor.textEditView()
+        cursor = tview.textCursor()
+        cursor.setPosition(line, start)
+        cursor.setPosition(line, end, moveMode=TTkTextCursor.KeepAnchor)
+        tview._scrolToInclude(*tview._textWrap.dataToScreenPosition(line, end))
+        tview.update()
+
+    @pyTTkSlot(int, int)
+    def _searchUpdated(self, fr, to):
+        if self._searchBar is None or (search := self._currentSearch()) is None:
+            return
+        if search.pattern() is None:
+            self._searchBar.setCount("")
+            return
+        count, complete = search.count()
+        self._searchBar.setCount(f"{count}{'' if complete else '+'} matches")
+
+    def _openFindInFilesTab(self):
+        from ttkeditor.findinfilesview import TTkEditorFindInFilesView
+        findInFiles = TTkEditorFindInFilesView(root='.')
+        findInFiles.matchActivated.connect(self._openFindInFilesMatch)
+        self._toolsPanel().addTab(findInFiles, "Find in files")
+        self._toolsPanel().setCurrentWidget(findInFiles)
+        self._toolsViewToggler.setChecked(True)
+        findInFiles.setFocus()
+
+    def _rebuildSearchIndex(self):
+        from ttkeditor.trigramindex import TTKEditorTrigramIndex
+        index = TTKEditorTrigramIndex.forRoot('.')
+        Thread(target=index.rebuild, name='TTKEditorTrigramIndex', daemon=True).start()
+
+    @pyTTkSlot(str, int, int, int)
+    def _openFindInFilesMatch(self, filePath, line, start, end):
+        # Select the tab of the file if already opened
+        if tabs := self._documents.get(os.path.realpath(filePath), {}).get('tabs'):
+            tedit = tabs[0]
+            self._codeView.setCurrentWidget(tedit)
+        else:
+            tedit = self._openFileTab(filePath)
+        tview = tedit.textEditView()
+        def _select(cancelled=False):
+            # The file may be changed since the search
+            if line < tview.document().lineCount():
+                self._selectMatch((line, start, end), tview)
+        # The line may be not loaded yet
+        self._whenLoaded(tview, _select)
+
+    def _whenLoaded(self, tview, cb):
+        # cb is called once the document of the view is loaded
+        loader = self._documents[tview.document().filePath()]['loader']
+        if loader is not None and tview.document().isLoading():
+            loader.finished.connect(cb)
+        else:
+            cb()
+
+    @pyTTkSlot()
+    def _saveSession(self):
+        def _tabState(widget):
+            if not isinstance(widget, TTkTextEdit):
+                return None
+            tview = widget.textEditView()
+            cursor = tview.textCursor().position()
+            return {
+                'path': tview.document().filePath(),
+                'cursor': [cursor.line, cursor.pos],
+                'scroll': list(tview.getViewOffsets())}
+        TTKEditorSession.save({'layout': self._codeView.saveLayout(_tabState)})
+
+    def _restoreSession(self):
+        if (session := TTKEditorSession.load()) is None:
+            return
+        def _openTab(state):
+            if not os.path.isfile(state['path']):
+                return None
+            tview = (tedit := self._openFileTab(state['path'])).textEditView()
+            def _restore(cancelled=False):
+                line, pos = state['cursor']
+                if line < (doc := tview.document()).lineCount():
+                    tview.textCursor().setPosition(line, min(pos, len(doc._dataLines[line])))
+                tview.viewMoveTo(*state['scroll'])
+            self._whenLoaded(tview, _restore)
+            return tedit
+        try:
+            widget = self._codeView.restoreLayout(session['layout'], _openTab)
+        except (KeyError, TypeError, ValueError, OSError) as e:
+            TTkLog.error(f"Error restoring the session: {e}")
+            return
+        # Not notified if already the current tab of its tab widget
+        if (item := self._editorItems.get(widget)) is not None:
+            kodetab = self._codeView.kodeTab(widget)
+            self._currentTabChanged(kodetab, kodetab.currentIndex(), widget)
+            self._openEditors.setCurrentItem(item)
+
     def _openTerminalTab(self):
         term = TTkTerminal()
-        self._toolsView.addTab(term, f"Terminal")
-        self._toolsView.setCurrentWidget(term)
+        self._toolsPanel().addTab(term, f"Terminal")
+        self._toolsPanel().setCurrentWidget(term)
         self._toolsViewToggler.setChecked(True)
         th = TTkTerminalHelper(term=term)
         th.runShell()
@@ -188,22 +451,45 @@ class TTkEditorApp(TTkAppTemplate):
         TTkHelper.overlay(None, filePicker, 20, 5, True)
 
     def _openFileTab(self, filePath):
-        encoding = TTKEditorTextDocument.DEFAULT_ENCODING
         filePath = os.path.realpath(filePath)
         if filePath in self._documents:
             doc = self._documents[filePath]['doc']
         else:
-            with open(filePath, 'r', encoding=encoding) as f:
-                content = f.read()
-            doc = TTKEditorTextDocument(
-                text=content, filePath=filePath, encoding=encoding)
-            self._documents[filePath] = {'doc': doc, 'tabs': [], }
-        tview = TTKEditorTextEditView(document=doc, readOnly=False)
+            doc = loader = None
+            # Detected from the beginning and some samples of the file
+            encoding, bom, newline = detectEncoding(filePath)
+            if os.path.getsize(filePath) > TTKEditorConfig.largeFileSize:
+                try:
+                    doc = TTKEditorTextDocument(
+                        text="", filePath=filePath, encoding=encoding, bom=bom, newline=newline, mapped=True,
+                        logRepository=self._logRepository)
+                except ValueError as e:
+                    TTkLog.warn(f"{filePath}: {e}")
+            if doc is None:
+                # The file is loaded in background,
+                # the lines already read are shown while loading
+                doc = TTKEditorTextDocument(
+                    text="", filePath=filePath, encoding=encoding, bom=bom, newline=newline,
+                    logRepository=self._logRepository)
+                loader = TTKEditorFileLoader(doc, filePath, encoding, post=self._post)
+                loader.progress.connect(self._loadingProgress)
+                loader.finished.connect(lambda cancelled: self._loadingFinished(loader, cancelled))
+                self._loaders.append(loader)
+                loader.start()
+            doc.modificationChanged.connect(lambda modified: self._documentModified(doc, modified))
+            doc.lexerNameChanged.connect(lambda lexerName: self._lexerNameChanged(doc, lexerName))
+            self._documents[filePath] = {'doc': doc, 'tabs': [], 'loader': loader, 'saver': None}
+            self._watcher.addPath(filePath)
+        tview = TTKEditorTextEditView(document=doc, readOnly=True)
         tedit = TTkTextEdit(textEditView=tview,
                             lineNumber=True, lineNumberStarting=1)
+        self._documents[filePath]['tabs'].append(tedit)
+        # Editable once loaded (see _loadingFinished),
+        # the memory mapped documents are read only
+        loader = self._documents[filePath]['loader']
+        tview.setReadOnly(doc.isMapped() or doc.isLoading() or loader.isCancelled())
+        # The views are painted again by the document when highlighted
         doc.cursorPositionChanged.connect(self._cursorChanged)
-        doc.kodeHighlightUpdate.connect(tedit.update)
-        doc.lexerNameChanged.connect(self._lexerNameChanged)
         label = TTkString(TTkCfg.theme.fileIcon.getIcon(
             filePath), TTkCfg.theme.fileIconColor) + TTkColor.RST + " " + os.path.basename(filePath)
 
@@ -211,28 +497,185 @@ class TTkEditorApp(TTkAppTemplate):
         self._codeView.setCurrentWidget(tedit)
 
         self._openEditors.addItem(li := TTkAbstractListItem(text=label, data=tedit))
-        self._openEditors.setCurrentItem(li)                  
+        self._openEditors.setCurrentItem(li)
+        self._editorItems[tedit] = li
+        self._documents[filePath]['label'] = label
+        self._documentModified(doc, doc.isModified())
+        return tedit
+
+    def _documentModified(self, doc, modified):
+        # Mark the open editors of the modified documents
+        if (document := self._documents.get(doc.filePath())) is None:
+            return
+        label = document['label']
+        for tedit in document['tabs']:
+            if (item := self._editorItems.get(tedit)) is not None:
+                item.setText(TTkString("● ")+label if modified else label)
+
+    @pyTTkSlot()
+    def _saveFile(self):
+        if self._currentEditor is not None:
+            self._saveDocument(self._currentEditor.textEditView())
+
+    @pyTTkSlot()
+    def _saveAll(self):
+        for document in list(self._documents.values()):
+            if document['doc'].isModified():
+                self._saveDocument(document['tabs'][0].textEditView() if document['tabs'] else None, document['doc'])
+
+    def _saveDocument(self, tview, doc=None):
+        doc = doc or tview.document()
+        document = self._documents[doc.filePath()]
+        if doc.isMapped() or doc.isLoading() or (document['saver'] and document['saver'].isRunning()):
+            return
+        # The lines are copied, the edits can continue while saving
+        cursor = tview.textCursor().copy() if tview else doc._lastCursor
+        document['saver'] = saver = TTKEditorFileSaver(doc, cursor)
+        saver.progress.connect(lambda written, lines: self._post(self._savingProgress, written, lines))
+        saver.finished.connect(lambda failed: self._post(self._savingFinished, saver, failed))
+        self._savers.append(saver)
+        saver.start()
+
+    @pyTTkSlot(int, int)
+    def _savingProgress(self, written, lines):
+        if not self._savers:
+            return
+        saver = self._savers[-1]
+        percent = 100*saver.linesWritten()//saver.lineCount() if saver.lineCount() else 100
+        self._savingStatus.setText(TTkString(
+            f"Saving {os.path.basename(saver.filePath())} {percent}%"))
+        # FIXME: We just need to resize, anyway
+        self._savingStatus.setVisible(True)
+        self._savingStatus.setCheckable(False)
+        self._statusBar.update()
+
+    def _savingFinished(self, saver, failed):
+        if saver in self._savers:
+            self._savers.remove(saver)
+        if not failed:
+            saver.document().setSaved(saver.snapId())
+        if failed:
+            TTkHelper.overlay(None, TTkMessageBox(
+                text=TTkString(f"Error saving {saver.filePath()}", TTkColor.BOLD),
+                icon=TTkMessageBox.Icon.Critical), 5, 5, True)
+        if self._savers:
+            self._savingProgress(0, 0)
+        else:
+            self._savingStatus.setVisible(False)
+            self._statusBar.update()
  
+    @pyTTkSlot(str)
+    def _fileChanged(self, filePath):
+        if (document := self._documents.get(filePath)) is None:
+            return
+        doc = document['doc']
+        if doc.isLoading() or (document['saver'] and document['saver'].isRunning()):
+            return
+        if reloadDocument(doc):
+            for tedit in document['tabs']:
+                tedit.textEditView().update()
+
+    @pyTTkSlot(bool)
+    def _setFollowTail(self, follow):
+        if self._currentEditor is not None:
+            self._currentEditor.textEditView().setFollow(follow)
+
+    @pyTTkSlot(int, int)
+    def _loadingProgress(self, read, size):
+        if not self._loaders:
+            return
+        loader = self._loaders[-1]
+        percent = 100*loader.bytesRead()//loader.size() if loader.size() else 100
+        self._loadingStatus.setText(TTkString(
+            f"Loading {os.path.basename(loader.filePath())} {percent}% ✕"))
+        # FIXME: We just need to resize, anyway
+        self._loadingStatus.setVisible(True)
+        self._loadingStatus.setCheckable(False)
+        self._statusBar.update()
+
+    def _loadingFinished(self, loader, cancelled):
+        if loader in self._loaders:
+            self._loaders.remove(loader)
+        doc = loader.document()
+        if doc.filePath() in self._documents:
+            # A partially loaded document cannot be edited
+            for tedit in self._documents[doc.filePath()]['tabs']:
+                tedit.textEditView().setReadOnly(cancelled)
+        if self._loaders:
+            self._loadingProgress(0, 0)
+        else:
+            self._loadingStatus.setVisible(False)
+            self._statusBar.update()
+
+    def _cancelLoading(self):
+        if self._loaders:
+            self._loaders[-1].cancel()
+
+    def _closeEditor(self, tedit):
+        doc = tedit.textEditView().document()
+        filePath = doc.filePath() if doc is not None else None
+        if (document := self._documents.get(filePath)) is None or tedit not in document['tabs']:
+            return
+        document['tabs'].remove(tedit)
+        if tedit is self._currentEditor:
+            self._setCurrentEditor(None)
+        # Unregister the view, the document unloads
+        # the highlight once it has no views
+        tedit.textEditView().setDocument(None)
+        if document['tabs']:
+            return
+        if document['loader'] and document['loader'].isRunning():
+            document['loader'].cancel()
+        doc.cursorPositionChanged.disconnect(self._cursorChanged)
+        # The modified documents are kept to be reopened with their changes
+        if not (doc.isModified() or (document['saver'] and document['saver'].isRunning())):
+            doc.close()
+            del self._documents[filePath]
+            self._watcher.removePath(filePath)
+
     def _openEditorsItemClicked(self, item):
         self._codeView.setCurrentWidget(item.data())
 
     def modified(self):
-        return self._modified
-
-    def setModified(self, modified):
-        # if self._modified == modified: return
-        self._modified = modified
-        if modified:
-            self._fileNameLabel.setText(f"( ● {self._fileName} )")
-        else:
-            self._fileNameLabel.setText(f"( {self._fileName} )")
-            self._snapSaved = self._snapId
+        return any(document['doc'].isModified() for document in self._documents.values())
+
+    def askToSave(self, text, cb):
+        '''Ask to save all the modified documents, cb is called
+        once saved (if no errors) or if the changes are discarded'''
+        @pyTTkSlot(TTkMessageBox.StandardButton)
+        def _buttonSelected(btn):
+            if btn == TTkMessageBox.StandardButton.Discard:
+                cb()
+            elif btn == TTkMessageBox.StandardButton.SaveAll:
+                self._saveAll()
+                savers = list(self._savers)
+                pending = set(savers)
+                def _saved(saver):
+                    if saver not in pending:
+                        return
+                    pending.discard(saver)
+                    if not pending and not any(s.isFailed() for s in savers):
+                        cb()
+                for saver in savers:
+                    saver.finished.connect(lambda failed, saver=saver: self._post(_saved, saver))
+                # Some may be already saved
+                for saver in savers:
+                    if not saver.isRunning():
+                        _saved(saver)
+                if not savers:
+                    cb()
+        messageBox = TTkMessageBox(
+            text=text,
+            icon=TTkMessageBox.Icon.Warning,
+            standardButtons=TTkMessageBox.StandardButton.Discard|TTkMessageBox.StandardButton.SaveAll|TTkMessageBox.StandardButton.Cancel)
+        messageBox.buttonSelected.connect(_buttonSelected)
+        TTkHelper.overlay(None, messageBox, 5, 5, True)
 
     def _quit(self):
         if self.modified():
             self.askToSave(
                 TTkString(
-                    f'Do you want to save the changes to this document before closing?\nIf you don\'t save, your changes will be lost.', TTkColor.BOLD),
+                    f'Do you want to save the changes to the documents before closing?\nIf you don\'t save, your changes will be lost.', TTkColor.BOLD),
                 cb=TTkHelper.quit)
         else:
             TTkHelper.quit()
@@ -242,9 +685,10 @@ class TTkEditorApp(TTkAppTemplate):
         cP = cursor.position()
         self._setCursorPositionStatus(f"Ln {cP.line+1}, Col {cP.pos+1}")
 
-    @pyTTkSlot(str)
-    def _lexerNameChanged(self, lexerName):
-        self._setLanguageStatus(lexerName)
+    def _lexerNameChanged(self, doc, lexerName):
+        # Only the language of the current editor is shown
+        if self._currentEditor is not None and self._currentEditor.textEditView().document() is doc:
+            self._setLanguageStatus(lexerName)
 
     def _setCursorPositionStatus(self, text):
         self._cursorPositionStatus.setText(TTkString(text))
@@ -261,24 +705,46 @@ class TTkEditorApp(TTkAppTemplate):
         self._statusBar.update()
 
     def _setLanguageStatus(self, language):
+        if self._languageStatus.isVisible() and self._languageStatus.text() == language:
+            return
         self._languageStatus.setText(TTkString(language))
         # FIXME: We just need to resize, anyway
         self._languageStatus.setVisible(True)
         self._languageStatus.setCheckable(False)
         self._statusBar.update()
 
+    def _setCurrentEditor(self, tedit):
+        if tedit is self._currentEditor:
+            return
+        if (search := self._currentSearch()) is not None:
+            search.searchUpdated.disconnect(self._searchUpdated)
+        self._currentEditor = tedit
+        if (search := self._currentSearch()) is not None:
+            search.searchUpdated.connect(self._searchUpdated)
+            # The search follows the current editor
+            if self._searchBar is not None and (pattern := self._searchBar.pattern()) != search.pattern():
+                try:
+                    search.setPattern(*pattern)
+                except re.error:
+                    pass
+            self._searchUpdated(0, 0)
+
     @pyTTkSlot(TTkTabWidget, int, TTkWidget, object)
     def _currentTabChanged(self, tabWidget, index, tview):
+        if isinstance(tview, TTkTextEdit):
+            self._setCurrentEditor(tview)
         if tview is None or not isinstance(tview, TTkTextEdit):
             self._cursorPositionStatus.setVisible(False)
             self._encodingStatus.setVisible(False)
             self._languageStatus.setVisible(False)
             return
         tedit = tview.textEditView()
+        self._followTailToggler.setChecked(tedit.follow())
         self._cursorChanged(tedit.textCursor())
         doc = tedit.document()
         tedit.setFocus()
-        self._setEncodingStatus(doc.encoding())
+        newline = self._newlineNames.get(doc.newline(), 'LF')
+        self._setEncodingStatus(f"{doc.encoding()}{' with BOM' if doc.bom() else ''} {newline}")
         lexer = doc.lexer()
         if lexer is None:
             self._languageStatus.setVisible(False)
@@ -287,7 +753,15 @@ class TTkEditorApp(TTkAppTemplate):
 
     @pyTTkSlot(TTkTabWidget, int)
     def _tabCloseRequested(self, tabWidget, index):
+        # Emitted also when a tab is dragged to another tab widget
+        # or split, the widget is added again once dropped
+        if TTkHelper.isDnD():
+            return
         widget = tabWidget.widget(index)
-        for index, item in enumerate(self._openEditors.items()):
-            if item.data() == widget:
-                self._openEditors.removeAt(index)
+        if isinstance(widget, TTkTextEdit):
+            self._closeEditor(widget)
+        elif isinstance(widget, TTkEditorLogViewer):
+            # Its repaint timer is stopped
+            widget.close()
+        if (item := self._editorItems.pop(widget, None)) is not None:
+            self._openEditors.removeItem(item)
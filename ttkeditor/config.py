@@ -23,7 +23,6 @@
 
 
 import os
-import yaml
 from ttkeditor.version import __version__, NAME
 
 class TTKEditorConfig:
@@ -33,6 +32,24 @@ class TTKEditorConfig:
     pathCfg="."
     options={}
     maxsearches=200
+    # Files bigger than this (bytes) are opened read only and memory mapped
+    largeFileSize=64*1024*1024
+    # Messages kept by the log viewer and the lowest level kept (debug, info, warning, error)
+    logCapacity=10000
+    logLevel='info'
+    # Size of the rotating files of the messages evicted from the log viewer, 0 to discard them
+    logFileSize=0
+    logFiles=3
+    # Memory (bytes) of the undo history of each document, the oldest changes
+    # beyond it are spilled to a temporary file if undoSpill, dropped otherwise
+    undoMemory=64*1024*1024
+    undoSpill=False
+    # Files whose highlight is kept in the highlight cache
+    highlightCacheFiles=200
+    # Seconds a search uses the trigram index before walking the folder again for the changed files
+    indexMaxAge=30
+    # Files and folders skipped by the find in files and the file tree
+    ignoredFiles=['.git', '.hg', '.svn', '__pycache__', '*.pyc', '*.pyo', '*.so', '*.o', 'node_modules', 'venv', '.venv', 'build', 'dist', '*.egg-info']
 
     @staticmethod
     def save(searches=True, filters=True, colors=True, options=True):
@@ -40,6 +57,7 @@ class TTKEditorConfig:
         optionsPath  = os.path.join(TTKEditorConfig.pathCfg,'options.yaml')
 
         def writeCfg(path, cfg):
+            import yaml
             fullCfg = {
                 'version':TTKEditorConfig.cfgVersion,
                 'cfg':cfg }
@@ -53,5 +71,16 @@ class TTKEditorConfig:
         optionsPath  = os.path.join(TTKEditorConfig.pathCfg,'options.yaml')
 
         if os.path.exists(optionsPath):
+            import yaml
             with open(optionsPath) as f:
                 TTKEditorConfig.options = yaml.load(f, Loader=yaml.SafeLoader)['cfg']
+        TTKEditorConfig.largeFileSize = TTKEditorConfig.options.get('largeFileSize', TTKEditorConfig.largeFileSize)
+        TTKEditorConfig.ignoredFiles = TTKEditorConfig.options.get('ignoredFiles', TTKEditorConfig.ignoredFiles)
+        TTKEditorConfig.highlightCacheFiles = TTKEditorConfig.options.get('highlightCacheFiles', TTKEditorConfig.highlightCacheFiles)
+        TTKEditorConfig.indexMaxAge = TTKEditorConfig.options.get('indexMaxAge', TTKEditorConfig.indexMaxAge)
+        TTKEditorConfig.undoMemory = TTKEditorConfig.options.get('undoMemory', TTKEditorConfig.undoMemory)
+        TTKEditorConfig.undoSpill = TTKEditorConfig.options.get('undoSpill', TTKEditorConfig.undoSpill)
+        TTKEditorConfig.logCapacity = TTKEditorConfig.options.get('logCapacity', TTKEditorConfig.logCapacity)
+        TTKEditorConfig.logLevel = TTKEditorConfig.options.get('logLevel', TTKEditorConfig.logLevel)
+        TTKEditorConfig.logFileSize = TTKEditorConfig.options.get('logFileSize', TTKEditorConfig.logFileSize)
+        TTKEditorConfig.logFiles = TTKEditorConfig.options.get('logFiles', TTKEditorConfig.logFiles)
@@ -0,0 +1,114 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import re
+import codecs
+
+
+# Bytes read from the beginning of the file
+_headSize = 64*1024
+# Bytes read from each of the samples spread over the rest of the file, up to the end
+_sampleSize = 16*1024
+_samples = 4
+
+# Longest first, the UTF-32 LE BOM begins with the UTF-16 LE one
+_boms = (
+    (codecs.BOM_UTF32_LE, 'UTF-32-LE'),
+    (codecs.BOM_UTF32_BE, 'UTF-32-BE'),
+    (codecs.BOM_UTF8, 'UTF-8'),
+    (codecs.BOM_UTF16_LE, 'UTF-16-LE'),
+    (codecs.BOM_UTF16_BE, 'UTF-16-BE'),
+)
+
+
+def _readSamples(filePath):
+    # The head of the file and the samples after it
+    with open(filePath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        head = f.read(_headSize)
+        samples = []
+        if size > _headSize:
+            # The last sample is the end of the file
+            step = max(0, size-_headSize-_sampleSize)//(_samples-1)
+            for i in range(_samples):
+                f.seek(_headSize+i*step)
+                samples.append(f.read(_sampleSize))
+    return head, samples
+
+
+def _utf16(data):
+    # The ASCII text in UTF-16 has a zero in every other byte
+    if len(data) < 4:
+        return None
+    data = data[:len(data)//2*2]
+    even, odd = data[0::2].count(0), data[1::2].count(0)
+    half = len(data)//2
+    if odd > half*0.3 and even < half*0.05:
+        return 'UTF-16-LE'
+    if even > half*0.3 and odd < half*0.05:
+        return 'UTF-16-BE'
+    return None
+
+
+def _isUtf8(data, sample):
+    if sample:
+        # A sample may begin in the middle of a character
+        data = data.lstrip(bytes(range(0x80, 0xc0)))
+    try:
+        # The end may be a truncated character
+        codecs.getincrementaldecoder('utf-8')().decode(data)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _newline(data, encoding):
+    # The most used line ending
+    cr, lf = '\r'.encode(encoding), '\n'.encode(encoding)
+    crlf = data.count(cr+lf)
+    counts = {'\r\n': crlf, '\n': data.count(lf)-crlf, '\r': data.count(cr)-crlf}
+    newline = max(counts, key=counts.get)
+    return newline if counts[newline] else '\n'
+
+
+def detectEncoding(filePath):
+    '''Return the (encoding, bom, newline) of the file,
+    reading only its beginning and some samples of the rest.
+    The BOM is not part of the encoding, bom is True if the file begins with it'''
+    head, samples = _readSamples(filePath)
+    for bom, encoding in _boms:
+        if head.startswith(bom):
+            return encoding, True, _newline(head[len(bom):], encoding)
+    if encoding := _utf16(head):
+        return encoding, False, _newline(head, encoding)
+    if _isUtf8(head, False) and all(_isUtf8(s, True) for s in samples):
+        encoding = 'UTF-8'
+    elif any(re.search(rb'[\x81\x8d\x8f\x90\x9d]', d) for d in (head, *samples)):
+        # Not defined in CP1252
+        encoding = 'ISO-8859-1'
+    elif any(re.search(rb'[\x80-\x9f]', d) for d in (head, *samples)):
+        # Control characters in ISO-8859-1, most likely CP1252 punctuation
+        encoding = 'CP1252'
+    else:
+        encoding = 'ISO-8859-1'
+    return encoding, False, _newline(head, encoding)
@@ -0,0 +1,434 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+from threading import Lock
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from TermTk import TTkK
+from TermTk import TTkLog
+from TermTk import TTkCfg
+from TermTk import TTkColor
+from TermTk import TTkString
+from TermTk import TTkTimer
+from TermTk import TTkHelper
+from TermTk import pyTTkSlot, pyTTkSignal
+from TermTk import TTkAbstractScrollArea
+from TermTk import TTkAbstractScrollView
+
+from .config import TTKEditorConfig
+from .ignore import gitIgnore, ignoreMatcher, ignorePattern
+
+
+class TTKEditorDirectoryCache():
+    '''Process wide cache of the folders listed by the file trees.
+
+    The entries of a folder are (name, path, isDir, isLink) sorted
+    with the folders first, a folder is listed again only when
+    its inode or its mtime changes'''
+    _maxFolders = 1000
+
+    _mutex = Lock()
+    # path -> ((inode, mtime), entries), the least recently used first
+    _folders = OrderedDict()
+
+    @staticmethod
+    def listDir(path):
+        '''Return the entries of the folder, the cached ones if not changed,
+        raise OSError if the folder cannot be read'''
+        st = os.stat(path)
+        stamp = (st.st_ino, st.st_mtime_ns)
+        folders = TTKEditorDirectoryCache._folders
+        with TTKEditorDirectoryCache._mutex:
+            if (cached := folders.get(path)) and cached[0] == stamp:
+                folders.move_to_end(path)
+                return cached[1]
+        # The type of the entries is read with the names (d_type),
+        # only the links and the unknown types are stat
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    entries.append((entry.name, entry.path, entry.is_dir(), entry.is_symlink()))
+                except OSError:
+                    entries.append((entry.name, entry.path, False, False))
+        entries.sort(key=lambda e: (not e[2], e[0].lower(), e[0]))
+        with TTKEditorDirectoryCache._mutex:
+            folders[path] = (stamp, entries)
+            folders.move_to_end(path)
+            while len(folders) > TTKEditorDirectoryCache._maxFolders:
+                folders.popitem(last=False)
+        return entries
+
+    @staticmethod
+    def invalidate(path=None):
+        '''Drop the cached entries of the folder, of all the folders if None'''
+        with TTKEditorDirectoryCache._mutex:
+            if path is None:
+                TTKEditorDirectoryCache._folders.clear()
+            else:
+                TTKEditorDirectoryCache._folders.pop(path, None)
+
+
+class TTKEditorFileTreeWorker():
+    '''Process wide worker listing the folders of the file trees'''
+    _executor = None
+
+    @staticmethod
+    def submit(fn, *args):
+        if not TTKEditorFileTreeWorker._executor:
+            TTKEditorFileTreeWorker._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='TTKEditorFileTree')
+            TTkHelper.quitEvent.connect(TTKEditorFileTreeWorker.shutdown)
+        try:
+            return TTKEditorFileTreeWorker._executor.submit(fn, *args)
+        except RuntimeError:
+            # The worker is shutting down
+            return None
+
+    @staticmethod
+    def shutdown():
+        if TTKEditorFileTreeWorker._executor:
+            TTKEditorFileTreeWorker._executor.shutdown(wait=False, cancel_futures=True)
+            TTKEditorFileTreeWorker._executor = None
+
+
+class _TTKEditorFileNode():
+    __slots__ = (
+        'name', 'path', 'relPath', 'isDir', 'isLink', 'depth', 'parent',
+        # Folders: None if not listed yet, the listed entries,
+        # the ignore patterns of the parent, the max width of the children rows
+        'children', 'entries', 'patterns', 'width', 'expanded', 'loading',
+        # Last row of the node, checked against the rows shown (see _rowOf)
+        'row')
+
+    def __init__(self, name, path, relPath, isDir, isLink, parent, patterns=None):
+        self.name = name
+        self.path = path
+        self.relPath = relPath
+        self.isDir = isDir
+        self.isLink = isLink
+        self.parent = parent
+        self.depth = parent.depth+1 if parent else -1
+        self.children = None
+        self.entries = None
+        self.patterns = patterns
+        self.width = 0
+        self.expanded = False
+        self.loading = False
+        self.row = None
+
+
+class _TTkEditorFileTreeView(TTkAbstractScrollView):
+    '''The rows shown are kept in a flat list, a folder is listed in background
+    when expanded and its rows are inserted after it from the view timer,
+    only the visible rows are drawn'''
+    _selectedColor = TTkColor.fg('#ffff88')+TTkColor.bg('#000066')+TTkColor.BOLD
+    _loadingColor = TTkColor.fg('#888888')
+
+    __slots__ = (
+        '_root', '_rows', '_numbered', '_mutex', '_selected', '_width',
+        '_listed', '_timerListed', 'fileActivated')
+    def __init__(self, *args, **kwargs):
+        self.fileActivated = pyTTkSignal(str)
+        TTkAbstractScrollView.__init__(self, *args, **kwargs)
+        self.setFocusPolicy(TTkK.ClickFocus)
+        self._mutex = Lock()
+        self._rows = []
+        # The rows before this one have their node row up to date
+        self._numbered = 0
+        self._selected = None
+        self._width = 0
+        self._root = None
+        # (node, entries, children, width) listed by the worker
+        self._listed = deque()
+        self._timerListed = TTkTimer()
+        self._timerListed.timeout.connect(self._applyListed)
+        self.openPath(kwargs.get('path', '.'))
+
+    def openPath(self, path):
+        path = os.path.abspath(path)
+        with self._mutex:
+            self._root = _TTKEditorFileNode(
+                os.path.basename(path), path, '', True, False, None,
+                [ignorePattern(p) for p in TTKEditorConfig.ignoredFiles])
+            self._rows = []
+            self._numbered = 0
+            self._selected = None
+            self._width = 0
+        self._setExpanded(self._root, True)
+
+    def getOpenPath(self):
+        return self._root.path
+
+    def _rowOf(self, node):
+        # Row of the node, -1 for the root, None if not shown
+        if node is self._root:
+            return -1
+        rows = self._rows
+        if (row := node.row) is None or row >= self._numbered or rows[row] is not node:
+            # The rows after the first inserted or removed are numbered again,
+            # the ones before keep their row
+            if self._numbered == len(rows):
+                return None
+            for r in range(self._numbered, len(rows)):
+                rows[r].row = r
+            self._numbered = len(rows)
+            if (row := node.row) is None or row >= len(rows) or rows[row] is not node:
+                return None
+        return row
+
+    def _showChildren(self, node):
+        if (i := self._rowOf(node)) is None or not node.children:
+            return
+        # The rows shown under the node and their width,
+        # the children of the expanded folders are walked
+        width = node.width
+        if any(n.expanded for n in node.children):
+            rows = []
+            stack = list(reversed(node.children))
+            while stack:
+                rows.append(n := stack.pop())
+                if n.expanded and n.children:
+                    width = max(width, n.width)
+                    stack.extend(reversed(n.children))
+        else:
+            rows = node.children
+        self._rows[i+1:i+1] = rows
+        self._numbered = min(self._numbered, i+1)
+        self._width = max(self._width, width)
+
+    def _hideChildren(self, node):
+        if (i := self._rowOf(node)) is None:
+            return
+        rows = self._rows
+        j = i+1
+        while j < len(rows) and rows[j].depth > node.depth:
+            j += 1
+        del rows[i+1:j]
+        self._numbered = min(self._numbered, i+1)
+
+    def _changed(self):
+        self.viewChanged.emit()
+        self.update()
+
+    def _setExpanded(self, node, expanded):
+        with self._mutex:
+            if not node.isDir or node.expanded == expanded:
+                return
+            node.expanded = expanded
+            if expanded:
+                self._showChildren(node)
+            else:
+                self._hideChildren(node)
+            # Listed again in background, the cached entries are used if not changed
+            if expanded and not node.loading:
+                node.loading = node.children is None
+                TTKEditorFileTreeWorker.submit(self._list, node)
+        self._changed()
+
+    def _list(self, node):
+        try:
+            entries = TTKEditorDirectoryCache.listDir(node.path)
+        except OSError as e:
+            TTkLog.error(f"Error listing {node.path}: {e}")
+            entries = []
+        if entries is node.entries:
+            return
+        # The ignored files and folders are skipped with all their content
+        patterns = node.patterns + gitIgnore(node.path, node.relPath)
+        ignored = ignoreMatcher(patterns)
+        old = {n.path: n for n in node.children or ()}
+        children = []
+        for name, path, isDir, isLink in entries:
+            relPath = f"{node.relPath}/{name}" if node.relPath else name
+            if ignored(name, relPath, isDir):
+                continue
+            if (n := old.get(path)) is None or n.isDir != isDir:
+                n = _TTKEditorFileNode(name, path, relPath, isDir, isLink, node, patterns)
+            children.append(n)
+        width = max(map(self._rowWidth, children), default=0)
+        # The rows are changed and the view updated only from the view timer
+        self._listed.append((node, entries, children, width))
+        self._timerListed.start(0)
+
+    @pyTTkSlot()
+    def _applyListed(self):
+        with self._mutex:
+            while self._listed:
+                node, entries, children, width = self._listed.popleft()
+                if node.expanded:
+                    self._hideChildren(node)
+                node.children = children
+                node.entries = entries
+                node.width = width
+                node.loading = False
+                if node.expanded:
+                    self._showChildren(node)
+            if self._selected is not None and self._rowOf(self._selected) is None:
+                self._selected = None
+        self._changed()
+
+    @staticmethod
+    def _rowWidth(node):
+        name = node.name
+        return 2*node.depth + 4 + (len(name) if name.isascii() else TTkString(name).termWidth())
+
+    @staticmethod
+    def _rowText(node):
+        theme = TTkCfg.theme
+        if node.isDir:
+            iconColor, icon = theme.folderIconColor, theme.fileIcon.folderOpen if node.expanded else theme.fileIcon.folderClose
+            color, name = theme.folderNameColor, node.name + '/'
+        else:
+            iconColor, icon = theme.fileIconColor, theme.fileIcon.getIcon(node.name)
+            color, name = theme.fileNameColor, node.name
+        if node.isLink:
+            color = theme.linkNameColor
+        text = TTkString('  '*node.depth) + iconColor + icon + TTkColor.RST + ' ' + color + name
+        if node.loading:
+            text += TTkString(' …', _TTkEditorFileTreeView._loadingColor)
+        return text
+
+    def viewFullAreaSize(self) -> tuple[int, int]:
+        return self._width, len(self._rows)
+
+    def viewDisplayedSize(self) -> tuple[int, int]:
+        return self.size()
+
+    def paintEvent(self, canvas):
+        ox, oy = self.getViewOffsets()
+        w, h = self.size()
+        with self._mutex:
+            rows = self._rows[oy:oy+h]
+            selected = self._selected
+        for y, node in enumerate(rows):
+            text = self._rowText(node)
+            if node is selected:
+                canvas.fill(pos=(0, y), size=(w, 1), color=self._selectedColor)
+                text = text.completeColor(self._selectedColor)
+            canvas.drawTTkString(pos=(-ox, y), text=text)
+
+    def _select(self, row):
+        with self._mutex:
+            if not self._rows:
+                return
+            row = max(0, min(row, len(self._rows)-1))
+            self._selected = self._rows[row]
+        # Scroll to the selected row
+        ox, oy = self.getViewOffsets()
+        _, h = self.size()
+        if row < oy:
+            self.viewMoveTo(ox, row)
+        elif row >= oy+h:
+            self.viewMoveTo(ox, row-h+1)
+        self.update()
+
+    def _activate(self, node):
+        if node.isDir:
+            self._setExpanded(node, not node.expanded)
+        else:
+            self.fileActivated.emit(node.path)
+
+    def _nodeAt(self, evt):
+        # The node at the mouse position and if the icon is pointed
+        ox, oy = self.getViewOffsets()
+        with self._mutex:
+            if not 0 <= (row := evt.y+oy) < len(self._rows):
+                return None, False
+            node = self._rows[row]
+        return node, 2*node.depth <= evt.x+ox < 2*node.depth+2
+
+    def mousePressEvent(self, evt) -> bool:
+        node, onIcon = self._nodeAt(evt)
+        if node is None:
+            return True
+        with self._mutex:
+            self._selected = node
+        if onIcon:
+            self._setExpanded(node, not node.expanded)
+        self.update()
+        return True
+
+    def mouseDoubleClickEvent(self, evt) -> bool:
+        node, onIcon = self._nodeAt(evt)
+        if node is not None and not onIcon:
+            self._activate(node)
+        return True
+
+    def keyEvent(self, evt) -> bool:
+        if evt.type != TTkK.SpecialKey:
+            return False
+        with self._mutex:
+            node = self._selected
+            row = self._rowOf(node) if node else -1
+        _, h = self.size()
+        if evt.key == TTkK.Key_Up:
+            self._select(row-1)
+        elif evt.key == TTkK.Key_Down:
+            self._select(row+1)
+        elif evt.key == TTkK.Key_PageUp:
+            self._select(row-h)
+        elif evt.key == TTkK.Key_PageDown:
+            self._select(row+h)
+        elif evt.key == TTkK.Key_Home:
+            self._select(0)
+        elif evt.key == TTkK.Key_End:
+            self._select(len(self._rows)-1)
+        elif node is None:
+            return False
+        elif evt.key == TTkK.Key_Right:
+            if node.isDir and not node.expanded:
+                self._setExpanded(node, True)
+            elif node.isDir and node.children:
+                self._select(row+1)
+        elif evt.key == TTkK.Key_Left:
+            if node.isDir and node.expanded:
+                self._setExpanded(node, False)
+            elif node.parent is not self._root:
+                self._select(self._rowOf(node.parent))
+        elif evt.key in (TTkK.Key_Enter, TTkK.Key_Return):
+            self._activate(node)
+        else:
+            return False
+        return True
+
+
+class TTkEditorFileTree(TTkAbstractScrollArea):
+    '''File tree of a folder for large workspaces.
+
+    The folders are listed in background (see TTKEditorDirectoryCache)
+    when expanded, the ignored files and folders
+    (TTKEditorConfig.ignoredFiles and the .gitignore files) are not listed'''
+    __slots__ = ('_fileTreeView', 'fileActivated', 'openPath', 'getOpenPath')
+    def __init__(self, *args, **kwargs):
+        TTkAbstractScrollArea.__init__(self, *args, **kwargs)
+        kwargs.pop('parent',None)
+        kwargs.pop('visible',None)
+        self._fileTreeView = _TTkEditorFileTreeView(*args, **kwargs)
+        self.setFocusPolicy(TTkK.ClickFocus)
+        self.setViewport(self._fileTreeView)
+        self.fileActivated = self._fileTreeView.fileActivated
+        self.openPath = self._fileTreeView.openPath
+        self.getOpenPath = self._fileTreeView.getOpenPath
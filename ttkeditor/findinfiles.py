@@ -0,0 +1,256 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import re
+import multiprocessing
+from threading import Thread, Event, Lock
+from concurrent.futures import ProcessPoolExecutor
+
+from TermTk import TTkHelper, TTkLog
+from TermTk import pyTTkSlot, pyTTkSignal
+
+from .config import TTKEditorConfig
+from .ignore import gitIgnore, ignoreMatcher, ignorePattern
+
+
+def searchFiles(paths, pattern, flags, prefilter, maxSize):
+    '''Search the pattern in each line of the files,
+    return the (path, line, start, end, text) of the matches.
+    The binary files and the files bigger than maxSize are skipped'''
+    regex = re.compile(pattern, flags)
+    joined = re.compile(pattern, flags | re.MULTILINE) if prefilter else None
+    ret = []
+    for path in paths:
+        try:
+            if os.path.getsize(path) > maxSize:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        if b'\0' in data[:8192]:
+            continue
+        text = data.decode('utf-8', errors='replace')
+        if joined is None:
+            lines = enumerate(text.split('\n'))
+        else:
+            lines = _candidateLines(joined, text)
+        for n, line in lines:
+            line = line.rstrip('\r')
+            for m in regex.finditer(line):
+                if m.end() > m.start():
+                    ret.append((path, n, m.start(), m.end(), line))
+    return ret
+
+
+def _candidateLines(joined, text):
+    # The lines where the joined text has a match,
+    # the search restarts from the line after the match
+    n = pos = 0
+    while m := joined.search(text, pos):
+        n += text.count('\n', pos, m.start())
+        start = text.rfind('\n', 0, m.start())+1
+        if (end := text.find('\n', m.start())) < 0:
+            end = len(text)
+        yield n, text[start:end]
+        if end == len(text):
+            return
+        pos = end+1
+        n += text.count('\n', m.start(), pos)
+
+
+def walkFiles(root, cancel=None):
+    '''Yield the files under root, skipping the ignored ones
+    (TTKEditorConfig.ignoredFiles) and the ones in the .gitignore files'''
+    stack = [(root, '', [ignorePattern(p) for p in TTKEditorConfig.ignoredFiles])]
+    while stack and not (cancel and cancel.is_set()):
+        path, relPath, patterns = stack.pop()
+        patterns = patterns + gitIgnore(path, relPath)
+        ignored = ignoreMatcher(patterns)
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+        except OSError:
+            continue
+        dirs = []
+        for entry in entries:
+            entryRelPath = f"{relPath}/{entry.name}" if relPath else entry.name
+            try:
+                isDir = entry.is_dir(follow_symlinks=False)
+                if ignored(entry.name, entryRelPath, isDir):
+                    continue
+                if isDir:
+                    dirs.append((entry.path, entryRelPath, patterns))
+                elif entry.is_file():
+                    yield entry.path
+            except OSError:
+                continue
+        stack += reversed(dirs)
+
+
+class TTKEditorSearchWorker():
+    '''Process wide pool searching and indexing the files,
+    one process for each core'''
+    _executor = None
+
+    @staticmethod
+    def submit(fn, *args):
+        if not TTKEditorSearchWorker._executor:
+            # The processes are not forked from the UI process and its threads,
+            # a lock held by one of them would be held forever in the child
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context('spawn')
+            TTKEditorSearchWorker._executor = ProcessPoolExecutor(mp_context=context)
+            TTkHelper.quitEvent.connect(TTKEditorSearchWorker.shutdown)
+        return TTKEditorSearchWorker._executor.submit(fn, *args)
+
+    @staticmethod
+    def shutdown():
+        if TTKEditorSearchWorker._executor:
+            TTKEditorSearchWorker._executor.shutdown(wait=False, cancel_futures=True)
+            TTKEditorSearchWorker._executor = None
+
+
+class TTKEditorFindInFiles():
+    '''Search a pattern in the files under a folder.
+
+    The folder is walked in a thread (or only the candidates
+    of the index are listed) and the files are searched
+    in batches by a process pool, the matches of each batch
+    are signaled as soon as the batch is done'''
+    _batchSize = 64
+
+    __slots__ = (
+        '_root', '_pattern', '_flags', '_prefilter', '_index',
+        '_thread', '_cancel', '_mutex', '_futures', '_walked',
+        '_files', '_searched', '_matches',
+        'found', 'progress', 'finished')
+
+    def __init__(self, root, pattern, regex=False, caseSensitive=False, index=None):
+        '''Raise re.error if the pattern is not valid,
+        the index (TTKEditorTrigramIndex) is updated before the search
+        if older than TTKEditorConfig.indexMaxAge'''
+        # (path, line, start, end, text) matches of a batch
+        self.found = pyTTkSignal(list)
+        # files searched, files found
+        self.progress = pyTTkSignal(int, int)
+        # cancelled
+        self.finished = pyTTkSignal(bool)
+        self._root = root
+        self._index = index
+        self._pattern = pattern if regex else re.escape(pattern)
+        self._flags = 0 if caseSensitive else re.IGNORECASE
+        re.compile(self._pattern, self._flags)
+        # The string anchors cannot be used in the joined lines
+        self._prefilter = not (regex and re.search(r'\\[AZ]', pattern))
+        self._cancel = Event()
+        self._mutex = Lock()
+        # running batch -> files in the batch
+        self._futures = {}
+        self._walked = False
+        self._files = 0
+        self._searched = 0
+        self._matches = 0
+        self._thread = Thread(target=self._walk, name='TTKEditorFindInFiles', daemon=True)
+
+    def root(self):
+        return self._root
+
+    def matches(self):
+        return self._matches
+
+    def isRunning(self):
+        with self._mutex:
+            return self._thread.is_alive() or bool(self._futures)
+
+    def isCancelled(self):
+        return self._cancel.is_set()
+
+    def start(self):
+        self._thread.start()
+
+    @pyTTkSlot()
+    def cancel(self):
+        self._cancel.set()
+        with self._mutex:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+
+    def _walk(self):
+        batch = []
+        try:
+            if self._index is None:
+                paths = walkFiles(self._root, self._cancel)
+            else:
+                self._index.update(self._cancel, TTKEditorConfig.indexMaxAge)
+                paths = self._index.candidates(self._pattern, self._flags)
+            for path in paths:
+                if self._cancel.is_set():
+                    break
+                self._files += 1
+                batch.append(path)
+                if len(batch) >= self._batchSize:
+                    self._searchBatch(batch)
+                    batch = []
+            if batch and not self._cancel.is_set():
+                self._searchBatch(batch)
+        except RuntimeError:
+            # The pool is shutting down
+            self._cancel.set()
+        with self._mutex:
+            self._walked = True
+            done = not self._futures
+        if done:
+            self._finish()
+
+    def _searchBatch(self, paths):
+        future = TTKEditorSearchWorker.submit(
+            searchFiles, paths, self._pattern, self._flags,
+            self._prefilter, TTKEditorConfig.largeFileSize)
+        with self._mutex:
+            self._futures[future] = len(paths)
+        future.add_done_callback(self._batchDone)
+
+    def _batchDone(self, future):
+        with self._mutex:
+            self._searched += self._futures.pop(future)
+            done = self._walked and not self._futures
+        if not future.cancelled() and not self._cancel.is_set():
+            try:
+                if matches := future.result():
+                    self._matches += len(matches)
+                    self.found.emit(matches)
+            except Exception as e:
+                TTkLog.error(f"Find in files error: {e}")
+        self.progress.emit(self._searched, self._files)
+        if done:
+            self._finish()
+
+    def _finish(self):
+        if self._cancel.is_set():
+            TTkLog.warn(f"Find in files cancelled: {self._searched}/{self._files} files")
+        self.finished.emit(self._cancel.is_set())
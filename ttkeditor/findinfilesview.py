@@ -0,0 +1,156 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import re
+
+from TermTk import TTkLog
+from TermTk import TTkColor
+from TermTk import TTkString
+from TermTk import pyTTkSlot, pyTTkSignal
+from TermTk import TTkContainer
+from TermTk import TTkGridLayout
+from TermTk import TTkLineEdit
+from TermTk import TTkCheckbox
+from TermTk import TTkButton
+from TermTk import TTkLabel
+from TermTk import TTkList
+from TermTk import TTkAbstractListItem
+
+from .findinfiles import TTKEditorFindInFiles
+from .trigramindex import TTKEditorTrigramIndex
+
+
+class TTkEditorFindInFilesView(TTkContainer):
+    # Max matches listed
+    _maxResults = 10000
+    # Max chars of the matching line listed
+    _maxLineSize = 200
+    _pathColor = TTkColor.fg('#888888')
+    _matchColor = TTkColor.fg('#ffff00') + TTkColor.BOLD
+
+    __slots__ = (
+        '_root', '_search', '_findEdit', '_regexCheck', '_caseCheck', '_indexCheck',
+        '_statusLabel', '_results',
+        'matchActivated')
+
+    def __init__(self, *args, root='.', **kwargs):
+        # path, line, start, end
+        self.matchActivated = pyTTkSignal(str, int, int, int)
+        self._root = root
+        self._search = None
+        super().__init__(*args, **kwargs)
+        self.setLayout(layout := TTkGridLayout())
+
+        layout.addWidget(TTkLabel(text="Find:", maxWidth=6), 0, 0)
+        layout.addWidget(findEdit := TTkLineEdit(), 0, 1)
+        layout.addWidget(regexCheck := TTkCheckbox(text="Regex", maxWidth=9), 0, 2)
+        layout.addWidget(caseCheck := TTkCheckbox(text="Case", maxWidth=8), 0, 3)
+        layout.addWidget(indexCheck := TTkCheckbox(text="Index", maxWidth=9, checked=True), 0, 4)
+        layout.addWidget(findButton := TTkButton(text="Find", maxWidth=6), 0, 5)
+        layout.addWidget(stopButton := TTkButton(text="Stop", maxWidth=6), 0, 6)
+        layout.addWidget(statusLabel := TTkLabel(text="", maxWidth=24, minWidth=24), 0, 7)
+        layout.addWidget(results := TTkList(), 1, 0, 1, 8)
+        self._findEdit = findEdit
+        self._regexCheck = regexCheck
+        self._caseCheck = caseCheck
+        self._indexCheck = indexCheck
+        self._statusLabel = statusLabel
+        self._results = results
+
+        findEdit.returnPressed.connect(self.find)
+        findButton.clicked.connect(self.find)
+        stopButton.clicked.connect(self.stop)
+        results.itemClicked.connect(self._resultClicked)
+
+    @pyTTkSlot()
+    def find(self):
+        self.cancel()
+        self._results.removeItems(self._results.items().copy())
+        if not (pattern := str(self._findEdit.text())):
+            self._statusLabel.setText("")
+            return
+        try:
+            self._search = search = TTKEditorFindInFiles(
+                self._root, pattern,
+                self._regexCheck.isChecked(), self._caseCheck.isChecked(),
+                # Only the files with the trigrams of the pattern are searched
+                TTKEditorTrigramIndex.forRoot(self._root) if self._indexCheck.isChecked() else None)
+        except re.error:
+            self._statusLabel.setText("Invalid pattern")
+            return
+        search.found.connect(self._found)
+        search.progress.connect(self._progress)
+        search.finished.connect(self._finished)
+        search.start()
+
+    @pyTTkSlot()
+    def stop(self):
+        if self._search is not None:
+            self._search.cancel()
+
+    @pyTTkSlot()
+    def cancel(self):
+        '''Cancel the search, ignoring its results'''
+        if self._search is not None:
+            self._search.found.disconnect(self._found)
+            self._search.progress.disconnect(self._progress)
+            self._search.finished.disconnect(self._finished)
+            self._search.cancel()
+            self._search = None
+
+    def _resultItem(self, path, line, start, end, text):
+        # path:line: text, with the match highlighted
+        text = text[:self._maxLineSize].rstrip()
+        strip = len(text) - len(text.lstrip())
+        text = TTkString(text[strip:].replace('\t', ' '))
+        text = text.setColor(self._matchColor, posFrom=start-strip, posTo=end-strip)
+        prefix = TTkString(f"{os.path.relpath(path, self._root)}:{line+1}: ", self._pathColor)
+        return TTkAbstractListItem(text=prefix+TTkColor.RST+text, data=(path, line, start, end))
+
+    def _found(self, matches):
+        # Called by the search when a batch of files is done
+        # One placement of the list items for each batch
+        if (free := self._maxResults - (listed := len(self._results.items()))) > 0:
+            self._results.addItemsAt([self._resultItem(*m) for m in matches[:free]], listed)
+
+    @pyTTkSlot(int, int)
+    def _progress(self, searched, files):
+        if self._search is not None:
+            self._statusLabel.setText(f"{self._search.matches()} matches {searched}/{files}")
+
+    @pyTTkSlot(bool)
+    def _finished(self, cancelled):
+        if (search := self._search) is None:
+            return
+        self._statusLabel.setText(f"{search.matches()} matches{' (stopped)' if cancelled else ''}")
+        if search.matches() > self._maxResults:
+            TTkLog.info(f"Find in files: {search.matches()} matches, the first {self._maxResults} are listed")
+
+    def _resultClicked(self, item):
+        self.matchActivated.emit(*item.data())
+
+    @pyTTkSlot()
+    def setFocus(self):
+        self._findEdit.setFocus()
@@ -22,123 +22,134 @@
 # SOFTWARE.
 
 
+from array import array
+from threading import Lock
+
 from pygments.formatter import Formatter
-from pygments.token import Keyword, Name, Comment, String, Error, \
-    Number, Operator, Generic, Token, Whitespace
-
-from TermTk import TTkString, TTkColor, TTkLog
-
-#: Map token types to a tuple of color values for light and dark
-#: backgrounds.
-TTKEDIT_COLORS = {
-    Token:              TTkColor.RST, # ('',            ''),
-
-    Whitespace:         TTkColor.fg('#888888') , # ('gray',   'brightblack'),
-    Comment:            TTkColor.fg('#888888') , # ('gray',   'brightblack'),
-    Comment.Preproc:    TTkColor.fg('#00FFFF') , # ('cyan',        'brightcyan'),
-    Keyword:            TTkColor.fg('#0000FF') , # ('blue',    'brightblue'),
-    Keyword.Type:       TTkColor.fg('#00FFFF') , # ('cyan',        'brightcyan'),
-    Operator.Word:      TTkColor.fg('#FF8800') , # ('magenta',      'brightmagenta'),
-    Name.Builtin:       TTkColor.fg('#00FFFF') , # ('cyan',        'brightcyan'),
-    Name.Function:      TTkColor.fg('#00FF00') , # ('green',   'brightgreen'),
-    Name.Namespace:     TTkColor.fg('#00FFFF') , # ('_cyan_',      '_brightcyan_'),
-    Name.Class:         TTkColor.fg('#00FF00') , # ('_green_', '_brightgreen_'),
-    Name.Exception:     TTkColor.fg('#00FFFF') , # ('cyan',        'brightcyan'),
-    Name.Decorator:     TTkColor.fg('#888888') , # ('brightblack',    'gray'),
-    Name.Variable:      TTkColor.fg('#888888') , # ('red',     'brightred'),
-    Name.Constant:      TTkColor.fg('#888888') , # ('red',     'brightred'),
-    Name.Attribute:     TTkColor.fg('#00FFFF') , # ('cyan',        'brightcyan'),
-    Name.Tag:           TTkColor.fg('#0000FF') , # ('brightblue',        'brightblue'),
-    String:             TTkColor.fg('#FFFF00') , # ('yellow',       'yellow'),
-    Number:             TTkColor.fg('#0000FF') , # ('blue',    'brightblue'),
-
-    Generic.Deleted:    TTkColor.fg('#FF0000') , # ('brightred',        'brightred'),
-    Generic.Inserted:   TTkColor.fg('#00FF00') , # ('green',  'brightgreen'),
-    Generic.Heading:    TTkColor.fg('#888888') , # ('**',         '**'),
-    Generic.Subheading: TTkColor.fg('#FF8800') , # ('*magenta*',   '*brightmagenta*'),
-    Generic.Prompt:     TTkColor.fg('#888888') , # ('**',         '**'),
-    Generic.Error:      TTkColor.fg('#FF0000') , # ('brightred',        'brightred'),
-
-    Error:              TTkColor.fg('#FF0000') , # ('_brightred_',      '_brightred_'),
-}
+
+from TermTk import TTkString, TTkColor
+
+
+class _TTKEditorStyleIds(dict):
+    # token type -> style id of a single style,
+    # the token types not defined in the style inherit the parent one
+    __slots__ = ()
+    def __missing__(self, ttype):
+        sid = self[ttype.parent]
+        self[ttype] = sid
+        return sid
+
+
+class TTKEditorStyles():
+    '''Process wide registry of the pygments styles converted to TTkColors,
+    shared by all the formatters'''
+    _mutex = Lock()
+    # pygments style -> _TTKEditorStyleIds
+    _styles = {}
+    # style id -> TTkColor, a single TTkColor is created for each distinct style definition
+    _colors = []
+    _colorIds = {}
+
+    @staticmethod
+    def styleIds(style):
+        if (ret := TTKEditorStyles._styles.get(style)) is not None:
+            return ret
+        with TTKEditorStyles._mutex:
+            if style not in TTKEditorStyles._styles:
+                ret = _TTKEditorStyleIds()
+                for token, definition in style:
+                    ret[token] = TTKEditorStyles._colorId(definition)
+                TTKEditorStyles._styles[style] = ret
+            return TTKEditorStyles._styles[style]
+
+    @staticmethod
+    def color(sid):
+        return TTKEditorStyles._colors[sid]
+
+    @staticmethod
+    def colors():
+        return TTKEditorStyles._colors
+
+    @staticmethod
+    def keys():
+        '''Return the (color, bgcolor, bold, italic, underline) definition of each style id,
+        the ids depend on the order the styles are loaded'''
+        return list(TTKEditorStyles._colorIds)
+
+    @staticmethod
+    def keyId(key):
+        '''Return the style id of a (color, bgcolor, bold, italic, underline) definition'''
+        if (sid := TTKEditorStyles._colorIds.get(key)) is not None:
+            return sid
+        with TTKEditorStyles._mutex:
+            return TTKEditorStyles._keyId(key)
+
+    @staticmethod
+    def _colorId(style):
+        # style = {
+        #   'color': '6272a4',
+        #   'bgcolor': None,
+        #   'bold': False, 'italic': False, 'underline': False,
+        #   'border': None,
+        #   'roman': None, 'sans': None, 'mono': None,
+        #   'ansicolor': None, 'bgansicolor': None}
+        return TTKEditorStyles._keyId((style['color'], style['bgcolor'], style['bold'], style['italic'], style['underline']))
+
+    @staticmethod
+    def _keyId(key):
+        if (sid := TTKEditorStyles._colorIds.get(key)) is not None:
+            return sid
+        fg, bg, bold, italic, underline = key
+        color = TTkColor.RST
+        if fg:
+            color += TTkColor.fg(f"#{fg}")
+        if bg:
+            color += TTkColor.bg(f"#{bg}")
+        if bold:
+            color += TTkColor.BOLD
+        if italic:
+            color += TTkColor.ITALIC
+        if underline:
+            color += TTkColor.UNDERLINE
+        sid = len(TTKEditorStyles._colors)
+        TTKEditorStyles._colors.append(color)
+        TTKEditorStyles._colorIds[key] = sid
+        return sid
+
 
 class TTKEditorFormatter(Formatter):
-    class Data():
-        __slots__=('lines', 'block', 'error', 'multiline')
-        def __init__(self, lines, block):
-            self.lines = lines
-            self.block = block
-            self.error = None
-            self.multiline = False
-
-    __slots__ = ('_dl', '_blockNum', '_kodeStyles')
+    '''Convert the tokens of a line to highlight runs (see formatSpans),
+    applied to the lines only when painted (see colorize)'''
+    __slots__ = ('_styleIds',)
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._kodeStyles = {}
-        self._blockNum = 1
-        for token, style in self.style:
-            # Token = Token.Comment.PreprocFile
-            # style = {
-            #   'color': '6272a4',
-            #   'bgcolor': None,
-            #   'bold': False, 'italic': False, 'underline': False,
-            #   'border': None,
-            #   'roman': None, 'sans': None, 'mono': None,
-            #   'ansicolor': None, 'bgansicolor': None}
-
-            # TTkLog.debug(f"{token=} {style=}")
-            color = TTkColor.RST
-            if style['color']:
-                color += TTkColor.fg(f"#{style['color']}")
-            if style['bgcolor']:
-                color += TTkColor.bg(f"#{style['bgcolor']}")
-            if style['bold']:
-                color += TTkColor.BOLD
-            if style['italic']:
-                color += TTkColor.ITALIC
-            if style['underline']:
-                color += TTkColor.UNDERLINE
-            self._kodeStyles[token] = color
-
-        super().__init__(*args, **kwargs)
-
-    def setDl(self,dl):
-        self._dl = dl
-
-    def format(self, tokensource, _):
-        multiline = False
-        multilineId = 0
-        for ttype, value in tokensource:
-            if ttype == Error and self._dl.error is None:
-                self._dl.error = len(self._dl.lines)-1
-            # self._dl.multiline = ttype == Comment.Multiline
-            multiline = ttype == Comment.Multiline
-
-            while ttype not in self._kodeStyles:
-                ttype = ttype.parent
-            # TTkLog.debug (f"{ttype=}")
-            # TTkLog.debug (f"{value=}")
-            color = self._kodeStyles[ttype]
-
-            values = value.split('\n')
-
-            self._dl.lines[-1] += TTkString(values[0],color)
-            self._dl.lines += [TTkString(t,color) for t in values[1:]]
-            self._dl.block[-1] = self._blockNum
-            self._dl.block += [self._blockNum]*(len(values)-1)
-
-            # self._dl.lines += [TTkString(t) for t in value.split('\n')]
-
-            # multiline = len(values)>1 if self._dl.lines[-1]._text == values[-1] else self._dl.multiline
-            # if self._dl.lines[-1]._text == '' or not multiline:
-            #     self._blockNum += 1
-            #     multilineId = len(self._dl.lines)
-
-            if multiline:
-                multilineId += len(values)
+        self._styleIds = TTKEditorStyles.styleIds(self.style)
+
+    def styleId(self, ttype):
+        return self._styleIds[ttype]
+
+    def formatSpans(self, tokens):
+        '''Return the highlight of a single line from its (tokentype, value) list
+        as a flat array of (start, length, style id) runs'''
+        ret = array('I')
+        pos = 0
+        styleIds = self._styleIds
+        for ttype, value in tokens:
+            sid = styleIds[ttype]
+            if ret and ret[-1] == sid:
+                ret[-2] += len(value)
             else:
-                multilineId = 0
-                self._blockNum += 1
-
-        if multiline:
-            self._dl.multiline = multilineId
+                ret.extend((pos, len(value), sid))
+            pos += len(value)
+        return ret
+
+    def colorize(self, line, spans):
+        '''Return the TTkString line colored with the highlight runs'''
+        colors = line._colors.copy()
+        styleColors = TTKEditorStyles.colors()
+        for i in range(0, len(spans), 3):
+            start, length, sid = spans[i:i+3]
+            colors[start:start+length] = [styleColors[sid]]*length
+        # The line may be shorter than the highlight
+        del colors[len(line):]
+        return TTkString._importString1(line._text, colors)
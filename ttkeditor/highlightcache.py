@@ -0,0 +1,144 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import glob
+import marshal
+import hashlib
+from array import array
+
+import pygments
+
+from TermTk import TTkLog
+
+from .config import TTKEditorConfig
+
+
+class TTKEditorHighlightCache():
+    '''Highlight of the files saved in TTKEditorConfig.pathCfg.
+
+    Each file keeps the lexer, the status, the end states and the highlight
+    runs of the lines of a document, named by its path, mtime and size:
+    a file changed on disk has no cached highlight.
+    The runs of all the lines are a single array and the states an index
+    in the table of the distinct ones'''
+    _version = 1
+
+    @staticmethod
+    def _folder():
+        return os.path.join(TTKEditorConfig.pathCfg, 'highlight')
+
+    @staticmethod
+    def _prefix(filePath):
+        return hashlib.sha1(os.path.realpath(filePath).encode(errors='replace')).hexdigest()[:16]
+
+    @staticmethod
+    def cachePath(filePath, mtime, size):
+        return os.path.join(TTKEditorHighlightCache._folder(), f"{TTKEditorHighlightCache._prefix(filePath)}.{mtime}.{size}.hl")
+
+    @staticmethod
+    def isCached(filePath):
+        '''True if the file as it is on disk has a cached highlight'''
+        try:
+            st = os.stat(filePath)
+        except OSError:
+            return False
+        return os.path.exists(TTKEditorHighlightCache.cachePath(filePath, st.st_mtime_ns, st.st_size))
+
+    @staticmethod
+    def save(filePath, mtime, size, lexerName, status, states, spans):
+        '''Save the highlight of the file with this mtime and size,
+        the spans and the states of the lines not highlighted are None'''
+        from .formatter import TTKEditorStyles
+        stateIds = {None: 0}
+        ids = array('I', [stateIds.setdefault(s, len(stateIds)) for s in states])
+        flat = array('I')
+        ends = array('I')
+        for s in spans:
+            if s:
+                flat.extend(s)
+            ends.append(len(flat))
+        path = TTKEditorHighlightCache.cachePath(filePath, mtime, size)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmpPath := f"{path}.tmp", 'wb') as f:
+                marshal.dump({
+                    'version': (TTKEditorHighlightCache._version, pygments.__version__),
+                    'lexer': lexerName,
+                    'styles': TTKEditorStyles.keys(),
+                    'status': bytes(status),
+                    'states': list(stateIds)[1:],
+                    'stateIds': ids.tobytes(),
+                    'spans': flat.tobytes(),
+                    'ends': ends.tobytes()}, f)
+            os.replace(tmpPath, path)
+        except OSError as e:
+            TTkLog.error(f"Error saving the highlight cache {path}: {e}")
+            return
+        TTKEditorHighlightCache._prune(filePath, path)
+
+    @staticmethod
+    def _prune(filePath, keep):
+        # The previous versions of the file and the oldest files are removed
+        folder = TTKEditorHighlightCache._folder()
+        for path in glob.glob(os.path.join(folder, f"{TTKEditorHighlightCache._prefix(filePath)}.*.hl")):
+            if path != keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        try:
+            entries = [e for e in os.scandir(folder) if e.name.endswith('.hl')]
+            if len(entries) <= TTKEditorConfig.highlightCacheFiles:
+                return
+            entries.sort(key=lambda e: e.stat().st_mtime_ns)
+            for e in entries[:len(entries)-TTKEditorConfig.highlightCacheFiles]:
+                os.remove(e.path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def load(filePath, mtime, size, lines):
+        '''Return the (lexer name, status, states, spans) of the file with this mtime,
+        size and number of lines, None if not cached'''
+        from .formatter import TTKEditorStyles
+        path = TTKEditorHighlightCache.cachePath(filePath, mtime, size)
+        try:
+            with open(path, 'rb') as f:
+                data = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if (data.get('version') != (TTKEditorHighlightCache._version, pygments.__version__) or
+                len(data['status']) != lines):
+            return None
+        flat = array('I', data['spans'])
+        # The style ids of this process may differ from the saved ones
+        ids = [TTKEditorStyles.keyId(tuple(k)) for k in data['styles']]
+        if ids != list(range(len(ids))):
+            flat[2::3] = array('I', map(ids.__getitem__, flat[2::3]))
+        ends = array('I', data['ends'])
+        spans = [flat[a:b] for a, b in zip((0, *ends), ends)]
+        stateTable = [None, *data['states']]
+        states = [stateTable[i] for i in array('I', data['stateIds'])]
+        return data['lexer'], bytearray(data['status']), states, spans
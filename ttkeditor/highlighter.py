@@ -0,0 +1,184 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from concurrent.futures import ThreadPoolExecutor
+
+from pygments.token import Error, Whitespace, _TokenType
+
+from TermTk import TTkHelper
+
+# Line end state of a line where a token continues in the next one
+# or of any line if the lexer does not expose its state,
+# the lexer cannot be restarted from there
+NO_CHECKPOINT = ()
+# Line end state of a line where the lexer is reset to root
+ROOT_CHECKPOINT = ('root',)
+
+# Most of the lines share few states, store a single copy of each
+_states = {}
+
+
+def supportsCheckpoints(lexer):
+    '''True if the lexer can be restarted from the state at the end of a line,
+    the other lexers are run again from the beginning of the text'''
+    from pygments.lexer import RegexLexer
+    return (isinstance(lexer, RegexLexer) and
+            type(lexer).get_tokens_unprocessed is RegexLexer.get_tokens_unprocessed)
+
+
+def lexLines(lexer, stack, text):
+    '''Lex text (new line terminated) starting from the lexer state stack,
+    yield for each line the list of (tokentype, value) and the lexer state
+    at the end of the line (NO_CHECKPOINT if not available)'''
+    if supportsCheckpoints(lexer):
+        yield from _lexRegexLines(lexer, stack, text)
+    else:
+        yield from _lexGenericLines(lexer, text)
+
+
+def highlightLines(lexer, formatter, stack, texts, oldStates, oldStatus, comparable, cancelled=None):
+    '''Lex and format texts starting from the lexer state stack,
+    stop at the first line with a comparable status ending with its old state
+    (never for the lexers without checkpoints) or when cancelled() is True.
+
+    Return the highlight runs of the lines, their end states and if the old state was matched'''
+    spans = []
+    states = []
+    rawt = ''.join(t+'\n' for t in texts)
+    for (tokens, state), oldState, status in zip(lexLines(lexer, stack, rawt), oldStates, oldStatus):
+        if cancelled and cancelled():
+            break
+        spans.append(formatter.formatSpans(tokens))
+        states.append(state)
+        if state and state == oldState and status in comparable:
+            return spans, states, True
+    return spans, states, False
+
+
+class TTKEditorHighlightWorker():
+    '''Process wide worker running the lexers and the formatters
+    out of the UI thread and the document locks.
+
+    A thread and not a process: the lexer, the formatter and the results
+    would be pickled for each chunk of lines, costing more than lexing them'''
+    _executor = None
+
+    @staticmethod
+    def submit(fn, *args):
+        if not TTKEditorHighlightWorker._executor:
+            TTKEditorHighlightWorker._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='TTKEditorHighlight')
+            TTkHelper.quitEvent.connect(TTKEditorHighlightWorker.shutdown)
+        try:
+            return TTKEditorHighlightWorker._executor.submit(fn, *args)
+        except RuntimeError:
+            # The worker is shutting down
+            return None
+
+    @staticmethod
+    def shutdown():
+        if TTKEditorHighlightWorker._executor:
+            TTKEditorHighlightWorker._executor.shutdown(wait=False, cancel_futures=True)
+            TTKEditorHighlightWorker._executor = None
+
+
+def _splitToken(line, done, ttype, value):
+    values = value.split('\n')
+    if values[0]:
+        line.append((ttype, values[0]))
+    for v in values[1:]:
+        done.append([line, NO_CHECKPOINT])
+        line = [(ttype, v)] if v else []
+    return line
+
+
+def _lexGenericLines(lexer, text):
+    # The state of these lexers is unknown, no line is a checkpoint
+    line = []
+    done = []
+    for _, ttype, value in lexer.get_tokens_unprocessed(text):
+        line = _splitToken(line, done, ttype, value)
+        yield from done
+        done.clear()
+
+
+def _lexRegexLines(lexer, stack, text):
+    # This is RegexLexer.get_tokens_unprocessed
+    # rearranged to track the state stack at the end of each line
+    pos = 0
+    tokendefs = lexer._tokens
+    statestack = list(stack)
+    statetokens = tokendefs[statestack[-1]]
+    line = []
+    done = []
+    while 1:
+        for rexmatch, action, new_state in statetokens:
+            m = rexmatch(text, pos)
+            if m:
+                if action is not None:
+                    if type(action) is _TokenType:
+                        line = _splitToken(line, done, action, m.group())
+                    else:
+                        for _, ttype, value in action(lexer, m):
+                            line = _splitToken(line, done, ttype, value)
+                pos = m.end()
+                if new_state is not None:
+                    # state transition
+                    if isinstance(new_state, tuple):
+                        for state in new_state:
+                            if state == '#pop':
+                                if len(statestack) > 1:
+                                    statestack.pop()
+                            elif state == '#push':
+                                statestack.append(statestack[-1])
+                            else:
+                                statestack.append(state)
+                    elif isinstance(new_state, int):
+                        # pop, but keep at least one state on the stack
+                        if abs(new_state) >= len(statestack):
+                            del statestack[1:]
+                        else:
+                            del statestack[new_state:]
+                    elif new_state == '#push':
+                        statestack.append(statestack[-1])
+                    statetokens = tokendefs[statestack[-1]]
+                # The line ends with this match,
+                # the state after the transition is a valid checkpoint
+                if done and text[pos-1] == '\n':
+                    state = tuple(statestack)
+                    done[-1][1] = _states.setdefault(state, state)
+                break
+        else:
+            if pos >= len(text):
+                break
+            if text[pos] == '\n':
+                # at EOL, reset state to "root"
+                statestack = ['root']
+                statetokens = tokendefs['root']
+                line = _splitToken(line, done, Whitespace, '\n')
+                done[-1][1] = ROOT_CHECKPOINT
+            else:
+                line = _splitToken(line, done, Error, text[pos])
+            pos += 1
+        yield from done
+        done.clear()
@@ -0,0 +1,65 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import re
+from fnmatch import translate
+
+
+def ignorePattern(pattern, relPath=''):
+    '''Return the (regex, anchored, dirOnly) of a gitignore pattern
+    of the folder at relPath (relative to the root):
+    the patterns with a slash, but the trailing one, are anchored to the folder
+    and matched against the path, the others match the name at any depth'''
+    dirOnly = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    if '/' not in pattern:
+        return translate(pattern), False, dirOnly
+    prefix = re.escape(f"{relPath}/") if relPath else ''
+    return prefix + translate(pattern.lstrip('/')), True, dirOnly
+
+
+def gitIgnore(path, relPath=''):
+    '''Return the patterns (see ignorePattern) of the .gitignore in the folder path,
+    relPath is the folder relative to the root. The negated patterns are not supported'''
+    try:
+        with open(os.path.join(path, '.gitignore'), encoding='utf-8', errors='replace') as f:
+            lines = [l.rstrip() for l in f]
+    except OSError:
+        return []
+    return [ignorePattern(l, relPath) for l in lines if l and not l.startswith(('#', '!'))]
+
+
+def ignoreMatcher(patterns):
+    '''Return a function telling if a file or a folder, from its name and
+    its path relative to the root, matches one of the patterns (see ignorePattern),
+    all of them checked by few regexes'''
+    def _compile(anchored, isDir):
+        regexes = [r for r, a, d in patterns if a == anchored and (isDir or not d)]
+        return re.compile('|'.join(regexes)).match if regexes else lambda _: None
+    # isDir -> (name match, path match)
+    matches = {isDir: (_compile(False, isDir), _compile(True, isDir)) for isDir in (False, True)}
+    def _ignored(name, relPath, isDir):
+        matchName, matchPath = matches[isDir]
+        return matchName(name) is not None or matchPath(relPath) is not None
+    return _ignored
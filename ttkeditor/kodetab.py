@@ -20,31 +20,88 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from TermTk import TTkKodeTab
+from TermTk import TTkK
+from TermTk import TTkKodeTab, TTkSplitter
 from TermTk import pyTTkSlot
 from TermTk import TTkWidget
 from TermTk.TTkWidgets.kodetab import _TTkKodeTab
 
 
-def findWidgetOwner(kodetab, widget):
-    for w in kodetab._tabWidgets:
-        if w == widget:
-            return kodetab
-    for w in kodetab.layout().iterWidgets():
-        if type(w) is _TTkKodeTab:
-            child = findWidgetOwner(w, widget)
-            if child is not None:
-                return child
-    return None
-
 class TTkEditorKodeTab(TTkKodeTab):
+    '''TTkKodeTab finding the tab widget of a widget in O(1).
+
+    The widgets of the tabs are children of their _TTkKodeTab,
+    the parent is updated by TermTk when the tabs are added,
+    moved, split and closed, the nested splitters are not walked'''
+
+    def kodeTab(self, widget):
+        '''Return the _TTkKodeTab showing the widget, None if not in a tab'''
+        kodetab = widget.parentWidget()
+        if type(kodetab) is _TTkKodeTab and kodetab._baseWidget is self:
+            return kodetab
+        return None
 
     @pyTTkSlot(TTkWidget)
     def setCurrentWidget(self, widget):
-        for w in self.layout().iterWidgets():
-            if type(w) is _TTkKodeTab:
-                kodetab = findWidgetOwner(w, widget)
-                if kodetab is not None: 
-                    self._lastKodeTabWidget = kodetab
-                    kodetab.setFocus()
-                    return super().setCurrentWidget(widget)
+        if (kodetab := self.kodeTab(widget)) is not None:
+            self._lastKodeTabWidget = kodetab
+            kodetab.setFocus()
+            return super().setCurrentWidget(widget)
+
+    def saveLayout(self, tabState):
+        '''Return the tree of the splitters and the tabs,
+        tabState(widget) returns the state saved for a tab, None to skip it'''
+        return self._saveNode(self, tabState)
+
+    def _saveNode(self, widget, tabState):
+        if type(widget) is _TTkKodeTab:
+            tabs, current = [], None
+            for i, w in enumerate(widget._tabWidgets):
+                if (state := tabState(w)) is not None:
+                    if i == widget.currentIndex():
+                        current = len(tabs)
+                    tabs.append(state)
+            return {'tabs': tabs, 'current': current, 'focus': widget is self._lastKodeTabWidget}
+        vertical = widget.orientation() == TTkK.VERTICAL
+        return {
+            'orientation': int(widget.orientation()),
+            'sizes': [w.height() if vertical else w.width() for w in map(widget.widget, range(widget.count()))],
+            'children': [self._saveNode(widget.widget(i), tabState) for i in range(widget.count())]}
+
+    def restoreLayout(self, layout, openTab):
+        '''Rebuild the splitters and the tabs returned by saveLayout,
+        openTab(state) adds the tab of a state to the current tab widget
+        and returns its widget, None if not available.
+        Return the current widget of the focused tab widget'''
+        first = self._lastKodeTabWidget
+        panes = []
+        self.removeWidget(first)
+        self.setOrientation(layout['orientation'])
+        self._restoreSplitter(self, layout, openTab, first, panes)
+        # The empty panes are removed with their splitters
+        focus = next((kt for kt, f in panes if f and kt._tabWidgets), None)
+        for kt, _ in panes:
+            if not kt._tabWidgets and kt.parentWidget() is not None:
+                kt._kodeTabClosed()
+        if not self.count():
+            self.addWidget(first)
+        self._lastKodeTabWidget = focus or self._getFirstWidget()
+        if (widget := self._lastKodeTabWidget.currentWidget()) is not None:
+            self.setCurrentWidget(widget)
+        return widget
+
+    def _restoreSplitter(self, splitter, node, openTab, first, panes):
+        for child in node['children']:
+            if 'tabs' not in child:
+                splitter.addWidget(childSplitter := TTkSplitter(orientation=child['orientation']))
+                self._restoreSplitter(childSplitter, child, openTab, first, panes)
+                continue
+            splitter.addWidget(kt := _TTkKodeTab(baseWidget=self, border=first.border(), closable=first.tabsClosable()))
+            self._lastKodeTabWidget = kt
+            widgets = [openTab(state) for state in child['tabs']]
+            if child['current'] is not None and (widget := widgets[child['current']]) is not None:
+                kt.setCurrentWidget(widget)
+            panes.append((kt, child['focus']))
+        # Not laid out yet when saved
+        if all(size > 0 for size in node['sizes']):
+            splitter.setSizes(node['sizes'])
@@ -0,0 +1,194 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import marshal
+import hashlib
+from fnmatch import fnmatch
+from threading import Lock
+
+import pygments
+
+from TermTk import TTkLog
+
+from .config import TTKEditorConfig
+
+
+class TTKEditorLexerCache():
+    '''Process wide cache of the lexers chosen for the files.
+
+    A file name matched by a single lexer (file names or alias file names,
+    as done by pygments guess_lexer_for_filename) gets it without looking at the text,
+    the others are guessed from the text by the lexers (analyse_text)
+    and the result is kept by extension, shebang and a fingerprint
+    of the beginning of the text, saved in TTKEditorConfig.pathCfg.
+
+    The lexers are imported on the first use, not at startup'''
+    _version = 2
+    _maxGuesses = 1000
+    # Chars of the text hashed in the fingerprint
+    _fingerprintSize = 1024
+
+    _mutex = Lock()
+    # extension -> lexer names and (pattern, lexer name) of the other file name patterns
+    _extensions = None
+    _patterns = None
+    # (extension, shebang, fingerprint) -> lexer name
+    _guesses = None
+    # (pattern, lexer name) of the alias file names, not in the pygments mapping,
+    # read once from the lexers and kept in the cache
+    _aliasFilenames = None
+
+    @staticmethod
+    def cachePath():
+        return os.path.join(TTKEditorConfig.pathCfg, 'lexers.cache')
+
+    @staticmethod
+    def _readAliasFilenames():
+        # All the lexers are imported, only if not cached for this pygments version
+        from pygments.lexers._mapping import LEXERS
+        from pygments.lexers import find_lexer_class
+        return [(pattern, name) for _, name, _, _, _ in LEXERS.values()
+                for pattern in find_lexer_class(name).alias_filenames]
+
+    @staticmethod
+    def _index():
+        # The file name patterns of the lexers, the mapping is read without importing them
+        from pygments.lexers._mapping import LEXERS
+        with TTKEditorLexerCache._mutex:
+            if TTKEditorLexerCache._guesses is None:
+                TTKEditorLexerCache.load()
+            if TTKEditorLexerCache._aliasFilenames is None:
+                TTKEditorLexerCache._aliasFilenames = TTKEditorLexerCache._readAliasFilenames()
+                TTKEditorLexerCache.save()
+            aliasFilenames = TTKEditorLexerCache._aliasFilenames
+        extensions = {}
+        patterns = []
+        filenames = [(pattern, name) for _, name, _, filenames, _ in LEXERS.values() for pattern in filenames]
+        for pattern, name in filenames + aliasFilenames:
+            ext = pattern[1:]
+            if pattern.startswith('*.') and not any(c in ext for c in '*?['):
+                extensions.setdefault(ext, []).append(name)
+            else:
+                patterns.append((pattern, name))
+        TTKEditorLexerCache._extensions = extensions
+        TTKEditorLexerCache._patterns = patterns
+
+    @staticmethod
+    def candidates(filePath):
+        '''Return the names of the lexers with a file name or alias file name pattern matching the file'''
+        if TTKEditorLexerCache._extensions is None:
+            TTKEditorLexerCache._index()
+        name = os.path.basename(filePath)
+        ret = set()
+        # Each suffix may be an extension (.tar.gz, .gz)
+        pos = name.find('.', 1)
+        while pos >= 0:
+            ret.update(TTKEditorLexerCache._extensions.get(name[pos:], ()))
+            pos = name.find('.', pos+1)
+        ret.update(n for p, n in TTKEditorLexerCache._patterns if fnmatch(name, p))
+        return sorted(ret)
+
+    @staticmethod
+    def load():
+        TTKEditorLexerCache._guesses = {}
+        TTKEditorLexerCache._aliasFilenames = None
+        try:
+            with open(TTKEditorLexerCache.cachePath(), 'rb') as f:
+                data = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return
+        # The guesses may change with the lexers
+        if data.get('version') == (TTKEditorLexerCache._version, pygments.__version__):
+            TTKEditorLexerCache._guesses = data['guesses']
+            TTKEditorLexerCache._aliasFilenames = data['aliasFilenames']
+
+    @staticmethod
+    def save():
+        path = TTKEditorLexerCache.cachePath()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmpPath := f"{path}.tmp", 'wb') as f:
+                marshal.dump({
+                    'version': (TTKEditorLexerCache._version, pygments.__version__),
+                    'guesses': TTKEditorLexerCache._guesses,
+                    'aliasFilenames': TTKEditorLexerCache._aliasFilenames}, f)
+            os.replace(tmpPath, path)
+        except OSError as e:
+            TTkLog.error(f"Error saving the lexers cache {path}: {e}")
+
+    @staticmethod
+    def textLexer(**options):
+        '''Return the lexer of the plain text'''
+        from pygments.lexers.special import TextLexer
+        return TextLexer(**options)
+
+    @staticmethod
+    def lexerByName(name, **options):
+        '''Return the lexer with this name, None if not found'''
+        from pygments.lexers import find_lexer_class
+        if (cls := find_lexer_class(name)) is None:
+            return None
+        return cls(**options)
+
+    @staticmethod
+    def _guess(filePath, text, shebang, candidates):
+        from pygments.util import ClassNotFound
+        from pygments.lexers import guess_lexer, guess_lexer_for_filename
+        try:
+            if not candidates and shebang:
+                # Recognized by the interpreter
+                return guess_lexer(text)
+            return guess_lexer_for_filename(filePath, text)
+        except ClassNotFound:
+            return TTKEditorLexerCache.textLexer()
+
+    @staticmethod
+    def lexer(filePath, text, **options):
+        '''Return the lexer for the file beginning with text'''
+        from pygments.lexers import find_lexer_class
+        candidates = TTKEditorLexerCache.candidates(filePath)
+        if len(candidates) == 1:
+            return find_lexer_class(candidates[0])(**options)
+        firstLine = text.split('\n', 1)[0]
+        shebang = firstLine if firstLine.startswith('#!') else ''
+        if not candidates and not shebang:
+            return TTKEditorLexerCache.textLexer(**options)
+        key = (
+            os.path.splitext(filePath)[1] or os.path.basename(filePath), shebang,
+            hashlib.sha1(text[:TTKEditorLexerCache._fingerprintSize].encode(errors='replace')).hexdigest()[:16])
+        with TTKEditorLexerCache._mutex:
+            if TTKEditorLexerCache._guesses is None:
+                TTKEditorLexerCache.load()
+            name = TTKEditorLexerCache._guesses.get(key)
+        if name is not None and (cls := find_lexer_class(name)) is not None:
+            return cls(**options)
+        lexer = TTKEditorLexerCache._guess(filePath, text, shebang, candidates)
+        TTkLog.debug(f"Lexer {lexer.name} guessed for {filePath}")
+        with TTKEditorLexerCache._mutex:
+            guesses = TTKEditorLexerCache._guesses
+            guesses[key] = lexer.name
+            # The oldest guesses are dropped
+            while len(guesses) > TTKEditorLexerCache._maxGuesses:
+                del guesses[next(iter(guesses))]
+            TTKEditorLexerCache.save()
+        return type(lexer)(**options)
@@ -0,0 +1,405 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import mmap
+from array import array
+from itertools import accumulate, islice
+from collections import OrderedDict
+from threading import Lock
+
+from TermTk import TTkString, TTkColor
+
+
+def plainLine(text):
+    '''Same as TTkString(text) for a text without escapes,
+    skipping the escapes and the wide chars checks'''
+    ret = TTkString()
+    ret._text = text
+    ret._colors = [TTkColor.RST]*len(text)
+    ret._hasTab = '\t' in text
+    return ret
+
+
+class _TTKEditorLeaf():
+    # Never modified once created, the stores share them
+    __slots__ = ('items', 'size', 'height')
+
+    def __init__(self, items):
+        self.items = items
+        self.size = len(items)
+        self.height = 0
+
+
+class _TTKEditorNode():
+    __slots__ = ('left', 'right', 'size', 'height')
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.size = left.size + right.size
+        self.height = max(left.height, right.height) + 1
+
+
+_EMPTY = _TTKEditorLeaf([])
+
+
+def _node(left, right):
+    # Node of left and right rotated to be AVL balanced,
+    # the heights of left and right differ by 2 at most
+    if left.height > right.height+1:
+        if left.left.height >= left.right.height:
+            return _TTKEditorNode(left.left, _TTKEditorNode(left.right, right))
+        return _TTKEditorNode(
+            _TTKEditorNode(left.left, left.right.left),
+            _TTKEditorNode(left.right.right, right))
+    if right.height > left.height+1:
+        if right.right.height >= right.left.height:
+            return _TTKEditorNode(_TTKEditorNode(left, right.left), right.right)
+        return _TTKEditorNode(
+            _TTKEditorNode(left, right.left.left),
+            _TTKEditorNode(right.left.right, right.right))
+    return _TTKEditorNode(left, right)
+
+
+def _concat(left, right):
+    # AVL join, the shorter tree is joined down the side of the taller one
+    # and the nodes are rotated on the way back
+    if not left.size:
+        return right
+    if not right.size:
+        return left
+    if not left.height and not right.height and left.size+right.size <= TTKEditorLineStore._leafSize:
+        return _TTKEditorLeaf(left.items+right.items)
+    if left.height > right.height+1:
+        return _node(left.left, _concat(left.right, right))
+    if right.height > left.height+1:
+        return _node(_concat(left, right.left), right.right)
+    return _TTKEditorNode(left, right)
+
+
+def _split(node, i):
+    # Return the nodes with the first i items and the remaining ones
+    if i <= 0:
+        return _EMPTY, node
+    if i >= node.size:
+        return node, _EMPTY
+    if not node.height:
+        return _TTKEditorLeaf(node.items[:i]), _TTKEditorLeaf(node.items[i:])
+    if i < node.left.size:
+        left, right = _split(node.left, i)
+        return left, _concat(right, node.right)
+    left, right = _split(node.right, i-node.left.size)
+    return _concat(node.left, left), right
+
+
+def _build(items):
+    size = TTKEditorLineStore._leafSize
+    leaves = [_TTKEditorLeaf(items[i:i+size]) for i in range(0, len(items), size)]
+    if not leaves:
+        return _EMPTY
+
+    # The leaves are split in halves, the heights of the two sides differ by 1 at most
+    def build(a, b):
+        if b-a == 1:
+            return leaves[a]
+        m = (a+b)//2
+        return _TTKEditorNode(build(a, m), build(m, b))
+    return build(0, len(leaves))
+
+
+class TTKEditorLineStore():
+    '''List like sequence stored in a balanced tree of small lists (rope).
+
+    Insert, remove, slice and concatenation are O(log n),
+    the tree is never modified in place so copy is O(1)'''
+    _leafSize = 256
+
+    __slots__ = ('_root',)
+
+    def __init__(self, items=()):
+        if isinstance(items, TTKEditorLineStore):
+            self._root = items._root
+        else:
+            self._root = _build(list(items))
+
+    @staticmethod
+    def repeat(value, n):
+        '''Return a store of n times value in O(log n), the nodes are shared'''
+        size = TTKEditorLineStore._leafSize
+        full, rest = divmod(n, size)
+        root = _TTKEditorLeaf([value]*rest)
+        block = _TTKEditorLeaf([value]*size)
+        while full:
+            if full & 1:
+                root = _concat(block, root)
+            block = _TTKEditorNode(block, block)
+            full >>= 1
+        return TTKEditorLineStore._fromRoot(root)
+
+    @staticmethod
+    def _fromRoot(root):
+        ret = TTKEditorLineStore()
+        ret._root = root
+        return ret
+
+    def _index(self, i):
+        if i < 0:
+            i += self._root.size
+        if not 0 <= i < self._root.size:
+            raise IndexError('list index out of range')
+        return i
+
+    def __len__(self):
+        return self._root.size
+
+    def __iter__(self):
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node.height:
+                stack.append(node.right)
+                stack.append(node.left)
+            else:
+                yield from node.items
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            a, b, step = i.indices(self._root.size)
+            if step != 1:
+                return list(self)[i]
+            if a >= b:
+                return TTKEditorLineStore()
+            return TTKEditorLineStore._fromRoot(_split(_split(self._root, b)[0], a)[1])
+        i = self._index(i)
+        node = self._root
+        while node.height:
+            if i < node.left.size:
+                node = node.left
+            else:
+                i -= node.left.size
+                node = node.right
+        return node.items[i]
+
+    def __setitem__(self, i, value):
+        if isinstance(i, slice):
+            a, b, step = i.indices(self._root.size)
+            if step != 1:
+                raise ValueError('extended slices are not supported')
+            b = max(a, b)
+            if not isinstance(value, TTKEditorLineStore):
+                value = TTKEditorLineStore(value)
+            left, right = _split(self._root, a)
+            right = _split(right, b-a)[1]
+            self._root = _concat(_concat(left, value._root), right)
+            return
+        i = self._index(i)
+        left, right = _split(self._root, i)
+        self._root = _concat(_concat(left, _TTKEditorLeaf([value])), _split(right, 1)[1])
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            self[i] = ()
+        else:
+            i = self._index(i)
+            self[i:i+1] = ()
+
+    def __add__(self, other):
+        if not isinstance(other, TTKEditorLineStore):
+            other = TTKEditorLineStore(other)
+        return TTKEditorLineStore._fromRoot(_concat(self._root, other._root))
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __eq__(self, other):
+        if isinstance(other, (TTKEditorLineStore, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TTKEditorLineStore({list(self)})"
+
+    def insert(self, i, value):
+        i = min(max(0, i + self._root.size if i < 0 else i), self._root.size)
+        self[i:i] = (value,)
+
+    def append(self, value):
+        self.insert(self._root.size, value)
+
+    def extend(self, values):
+        self[self._root.size:] = values
+
+    def pop(self, i=-1):
+        i = self._index(i)
+        ret = self[i]
+        del self[i]
+        return ret
+
+    def copy(self):
+        return TTKEditorLineStore._fromRoot(self._root)
+
+
+class TTKEditorMappedLines():
+    '''Read only list of the lines of a memory mapped file,
+    only the offsets of the lines are kept,
+    the TTkString lines are created when requested'''
+    _cacheSize = 4096
+    _scanSize = 16*1024*1024
+
+    __slots__ = ('_file', '_mmap', '_encoding', '_offsets', '_cache', '_mutex', '_maxSize')
+
+    def __init__(self, filePath, encoding):
+        if '\n'.encode(encoding) != b'\n':
+            raise ValueError(f"Encoding not supported for memory mapped files: {encoding}")
+        self._encoding = encoding
+        self._cache = OrderedDict()
+        self._mutex = Lock()
+        self._file = open(filePath, 'rb')
+        if os.fstat(self._file.fileno()).st_size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # An empty file cannot be mapped
+            self._mmap = b''
+        self._offsets, self._maxSize = self._scanLines(self._mmap)
+
+    @staticmethod
+    def _scanLines(data, pos=0):
+        # Offset of the beginning of each line from pos, the data is split in chunks
+        # to let the bytes be scanned by split instead of a python loop
+        offsets = array('Q', [pos])
+        maxSize = 0
+        size = len(data)
+        while pos < size:
+            chunk = data[pos:pos+TTKEditorMappedLines._scanSize]
+            lines = chunk.split(b'\n')
+            # The last one is not terminated by a newline in this chunk
+            lines.pop()
+            sizes = list(map(len, lines))
+            n = len(offsets)
+            offsets.extend(islice(accumulate(map((1).__add__, sizes), initial=pos), 1, None))
+            if sizes:
+                # The first line may begin in the previous chunk
+                maxSize = max(maxSize, max(sizes), offsets[n]-offsets[n-1]-1)
+            pos += len(chunk)
+        # The end of the last line
+        offsets.append(size+1)
+        maxSize = max(maxSize, offsets[-1]-offsets[-2]-1)
+        return offsets, maxSize
+
+    def grow(self):
+        '''Map the bytes appended to the file, only the last line and the new ones
+        are scanned. Return the (line, removed, added) lines changed'''
+        lines = len(self)
+        if (size := os.fstat(self._file.fileno()).st_size) <= len(self._mmap):
+            return lines, 0, 0
+        # The old map is released once not used
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        offsets, maxSize = self._scanLines(self._mmap, self._offsets[-2])
+        # Updated in place, the offsets are always valid for the new map
+        self._offsets[-1] = offsets[1]
+        self._offsets.extend(offsets[2:])
+        self._maxSize = max(self._maxSize, maxSize)
+        with self._mutex:
+            self._cache.pop(lines-1, None)
+        return lines-1, 1, len(self)-lines+1
+
+    def size(self):
+        '''Size in bytes of the mapped file'''
+        return len(self._mmap)
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self._offsets)-1
+
+    def lineSize(self, i):
+        '''Size in bytes of the line, without the newline'''
+        return self._offsets[i+1]-self._offsets[i]-1
+
+    def maxLineSize(self):
+        return self._maxSize
+
+    def _line(self, i):
+        with self._mutex:
+            if (line := self._cache.get(i)) is not None:
+                self._cache.move_to_end(i)
+                return line
+        text = self._mmap[self._offsets[i]:self._offsets[i+1]-1].decode(self._encoding, errors='replace')
+        if not i and text.startswith('\ufeff'):
+            text = text[1:]
+        line = TTkString(text[:-1] if text.endswith('\r') else text)
+        with self._mutex:
+            self._cache[i] = line
+            if len(self._cache) > TTKEditorMappedLines._cacheSize:
+                self._cache.popitem(last=False)
+        return line
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._line(n) for n in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('line index out of range')
+        return self._line(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._line(i)
+
+    def copy(self):
+        # Read only, no need to copy it
+        return self
+
+    def wrapLines(self):
+        return _TTKEditorMappedWrapLines(self)
+
+
+class _TTKEditorMappedWrapLines():
+    # Same as TTkTextWrap._lines of the not wrapped lines,
+    # (line, (0, size+1)) for each line, without storing them
+    __slots__ = ('_lines',)
+
+    def __init__(self, lines):
+        self._lines = lines
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [(n, (0, self._lines.lineSize(n)+1)) for n in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('line index out of range')
+        return (i, (0, self._lines.lineSize(i)+1))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,140 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import time
+from threading import Thread, Event
+
+from TermTk import TTkLog, TTkString
+from TermTk import pyTTkSlot, pyTTkSignal
+
+from .reloader import fileState
+
+
+def readLines(filePath, encoding, chunkSize, bom=False):
+    '''Read the file in chunks of chunkSize characters, yield the lines
+    of each chunk and the bytes read so far.
+    All the yielded lines joined match the whole text split by newline,
+    without the BOM if bom'''
+    with open(filePath, 'r', encoding=encoding) as f:
+        tail = ''
+        if bom and f.read(1) != '\ufeff':
+            f.seek(0)
+        while chunk := f.read(chunkSize):
+            lines = (tail + chunk).split('\n')
+            # The last line may continue in the next chunk
+            tail = lines.pop()
+            yield lines, f.buffer.tell()
+        yield [tail], f.buffer.tell()
+
+
+class TTKEditorFileLoader():
+    '''Load a file in a TTKEditorTextDocument from a background thread,
+    the lines already read are appended to the document while loading.
+
+    The thread only reads the file, the document changes and the signals
+    are passed to post(cb, *args) to be run out of the thread'''
+    _chunkSize = 1024*1024
+    # Min time between two updates of the document
+    _flushInterval = 0.1
+
+    __slots__ = (
+        '_document', '_filePath', '_encoding', '_size', '_read', '_post',
+        '_thread', '_cancel', '_cancelled',
+        'progress', 'finished')
+
+    def __init__(self, document, filePath, encoding, post=None):
+        # bytes read, file size
+        self.progress = pyTTkSignal(int, int)
+        # cancelled
+        self.finished = pyTTkSignal(bool)
+        self._document = document
+        self._filePath = filePath
+        self._encoding = encoding
+        self._size = os.path.getsize(filePath)
+        self._read = 0
+        self._post = post or (lambda cb, *args: cb(*args))
+        self._cancel = Event()
+        self._cancelled = False
+        self._thread = Thread(target=self._run, name='TTKEditorFileLoader', daemon=True)
+
+    def document(self):
+        return self._document
+
+    def filePath(self):
+        return self._filePath
+
+    def size(self):
+        return self._size
+
+    def bytesRead(self):
+        return self._read
+
+    def isRunning(self):
+        return self._thread.is_alive()
+
+    def isCancelled(self):
+        return self._cancelled
+
+    def start(self):
+        self._document.setLoading(True)
+        self._thread.start()
+
+    @pyTTkSlot()
+    def cancel(self):
+        self._cancel.set()
+
+    def _run(self):
+        lines = []
+        first = True
+        lastFlush = 0
+        try:
+            for chunk, self._read in readLines(self._filePath, self._encoding, self._chunkSize, self._document.bom()):
+                if self._cancel.is_set():
+                    self._cancelled = True
+                    break
+                lines += [TTkString(l) for l in chunk]
+                # The first lines are shown as soon as possible,
+                # the others are appended in batches
+                if first or time.monotonic()-lastFlush >= self._flushInterval:
+                    self._post(self._document.appendLines, lines, first)
+                    self._post(self.progress.emit, self._read, self._size)
+                    lines = []
+                    first = False
+                    lastFlush = time.monotonic()
+            if lines and not self._cancelled:
+                self._post(self._document.appendLines, lines, first)
+            if not self._cancelled:
+                # The changes on disk after the bytes read are reloaded
+                self._post(self._document.setFileState, fileState(self._filePath, self._read))
+        except (OSError, UnicodeDecodeError) as e:
+            TTkLog.error(f"Error loading {self._filePath}: {e}")
+            self._cancelled = True
+        if self._cancelled:
+            TTkLog.warn(f"Loading cancelled {self._filePath}: {self._read}/{self._size} bytes")
+        self._post(self._finish, self._read, self._cancelled)
+
+    def _finish(self, read, cancelled):
+        self._document.setLoading(False)
+        self.progress.emit(read, self._size)
+        self.finished.emit(cancelled)
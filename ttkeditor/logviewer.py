@@ -24,71 +24,181 @@
 __all__ = ['TTkLogViewer']
 
 import os
+import logging
+from threading import Lock
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
 import TermTk as TTkK
 from TermTk import TTkLog
 from TermTk import TTkColor
 from TermTk import TTkString
+from TermTk import TTkTimer
+from TermTk import TTkHelper
 from TermTk import pyTTkSlot
 from TermTk import pyTTkSignal
 from TermTk import TTkAbstractScrollArea
 from TermTk import TTkAbstractScrollView
 
+from .config import TTKEditorConfig
+
 class TTkEditorLogRepository:
-    __slots__ = ('_messages', '_cwd', '_follow', 'messageAdded')
-    def __init__(self):
-        self._messages = [TTkString()]
+    '''Ring buffer of the last log messages.
+
+    The messages below the log level are dropped when received,
+    the others are kept as (mode, text) and colored only when shown.
+    The count and the max width are updated on each message,
+    they do not depend on the messages kept.
+    The evicted messages are written in rotating files in the config folder
+    if TTKEditorConfig.logFileSize is set'''
+    _labels = {
+        TTkLog.InfoMsg:     TTkString("INFO "   ,TTkColor.fg("#00ff00")),
+        TTkLog.DebugMsg:    TTkString("DEBUG"   ,TTkColor.fg("#00ffff")),
+        TTkLog.ErrorMsg:    TTkString("ERROR"   ,TTkColor.fg("#ff0000")),
+        TTkLog.FatalMsg:    TTkString("FATAL"   ,TTkColor.fg("#ff0000")),
+        TTkLog.WarningMsg:  TTkString("WARNING ",TTkColor.fg("#ff0000")),
+        TTkLog.CriticalMsg: TTkString("CRITICAL",TTkColor.fg("#ff0000"))}
+    _none = TTkString("NONE ")
+    _severe = TTkLog.ErrorMsg | TTkLog.CriticalMsg | TTkLog.FatalMsg
+    # level -> modes received
+    _levels = {
+        'debug':   TTkLog.DebugMsg | TTkLog.InfoMsg | TTkLog.WarningMsg | _severe,
+        'info':    TTkLog.InfoMsg | TTkLog.WarningMsg | _severe,
+        'warning': TTkLog.WarningMsg | _severe,
+        'error':   _severe}
+    _loggingLevels = {
+        TTkLog.DebugMsg: logging.DEBUG, TTkLog.InfoMsg: logging.INFO,
+        TTkLog.WarningMsg: logging.WARNING, TTkLog.ErrorMsg: logging.ERROR,
+        TTkLog.CriticalMsg: logging.CRITICAL, TTkLog.FatalMsg: logging.CRITICAL}
+
+    __slots__ = (
+        '_entries', '_start', '_count', '_added', '_widths',
+        '_mutex', '_modes', '_cwd', '_spill', 'messageAdded')
+    def __init__(self, capacity=None, level=None):
+        capacity = capacity or TTKEditorConfig.logCapacity
+        self._entries = [None]*capacity
+        self._start = 0
+        self._count = 0
+        # Messages received, the sequence number of the next one
+        self._added = 0
+        # (sequence number, width) of the messages wider than all the following ones,
+        # the first one is the widest message kept
+        self._widths = deque()
+        self._mutex = Lock()
+        self._modes = TTkEditorLogRepository._levels[level or TTKEditorConfig.logLevel]
         self._cwd = os.getcwd()
+        self._spill = None
+        if TTKEditorConfig.logFileSize:
+            os.makedirs(folder := os.path.join(TTKEditorConfig.pathCfg, 'logs'), exist_ok=True)
+            handler = RotatingFileHandler(
+                os.path.join(folder, 'ttkeditor.log'), delay=True,
+                maxBytes=TTKEditorConfig.logFileSize, backupCount=TTKEditorConfig.logFiles)
+            handler.setFormatter(logging.Formatter('%(levelname)s%(message)s'))
+            self._spill = logging.getLogger('ttkeditor.log')
+            self._spill.propagate = False
+            self._spill.setLevel(logging.DEBUG)
+            self._spill.addHandler(handler)
         self.messageAdded = pyTTkSignal(str)
         TTkLog.installMessageHandler(self.loggingCallback)
 
+    def isEnabled(self, mode):
+        '''True if the messages of this mode are kept by this repository,
+        the debug messages may be skipped before being composed'''
+        return bool(self._modes & mode)
+
     def loggingCallback(self, mode, context, message):
-        logType = "NONE"
-        if mode == TTkLog.InfoMsg:       logType = TTkString("INFO "   ,TTkColor.fg("#00ff00"))
-        elif mode == TTkLog.DebugMsg:    logType = TTkString("DEBUG"   ,TTkColor.fg("#00ffff"))
-        elif mode == TTkLog.ErrorMsg:    logType = TTkString("ERROR"   ,TTkColor.fg("#ff0000"))
-        elif mode == TTkLog.FatalMsg:    logType = TTkString("FATAL"   ,TTkColor.fg("#ff0000"))
-        elif mode == TTkLog.WarningMsg:  logType = TTkString("WARNING ",TTkColor.fg("#ff0000"))
-        elif mode == TTkLog.CriticalMsg: logType = TTkString("CRITICAL",TTkColor.fg("#ff0000"))
+        if not mode & self._modes:
+            return
         message = f": {context.file}:{context.line} {message}".replace(self._cwd,"_")
-        self._messages.append(logType+TTkString(message))
+        width = self._labels.get(mode, self._none).termWidth() + (
+            len(message) if message.isascii() else TTkString(message).termWidth())
+        with self._mutex:
+            capacity = len(self._entries)
+            evicted = self._entries[self._start] if self._count == capacity else None
+            self._entries[(self._start+self._count) % capacity] = (mode, message)
+            if evicted:
+                self._start = (self._start+1) % capacity
+            else:
+                self._count += 1
+            seq = self._added
+            self._added += 1
+            widths = self._widths
+            while widths and widths[-1][1] <= width:
+                widths.pop()
+            widths.append((seq, width))
+            if widths[0][0] <= seq-capacity:
+                widths.popleft()
+        if evicted and self._spill:
+            self._spill.log(self._loggingLevels.get(evicted[0], logging.DEBUG), evicted[1])
         self.messageAdded.emit(message)
 
-    def messages(self):
-        return self._messages
+    def count(self):
+        return self._count
+
+    def width(self):
+        '''Width of the longest message'''
+        with self._mutex:
+            return self._widths[0][1] if self._widths else 0
+
+    def capacity(self):
+        return len(self._entries)
+
+    def messages(self, fr=0, to=None):
+        '''Return the colored messages from fr to to (excluded)'''
+        with self._mutex:
+            to = self._count if to is None else min(to, self._count)
+            capacity = len(self._entries)
+            entries = [self._entries[(self._start+i) % capacity] for i in range(fr, to)]
+        return [self._labels.get(mode, self._none) + TTkString(text) for mode, text in entries]
 
 
 class _TTkEditorLogViewer(TTkAbstractScrollView):
-    __slots__ = ('_messages', '_cwd', '_follow')
+    # The messages received within this time are shown in a single update
+    _frameTime = 1/30
+
+    __slots__ = ('_logRepository', '_follow', '_timerUpdate', '_pending')
     def __init__(self, logRepository, *args, **kwargs):
         TTkAbstractScrollView.__init__(self, *args, **kwargs)
         self._follow = kwargs.get('follow' , False )
         self._logRepository = logRepository
-        self._logRepository.messageAdded.connect(self._viewChangedHandler)
+        self._pending = False
+        self._timerUpdate = TTkTimer()
+        self._timerUpdate.timeout.connect(self._viewChangedHandler)
+        self._logRepository.messageAdded.connect(self._messageAdded)
+
+    def close(self):
+        self._logRepository.messageAdded.disconnect(self._messageAdded)
+        TTkHelper.quitEvent.disconnect(self._timerUpdate.quit)
+        self._timerUpdate.quit()
+        super().close()
+
+    @pyTTkSlot(str)
+    def _messageAdded(self, message):
+        if not self._pending:
+            self._pending = True
+            self._timerUpdate.start(self._frameTime)
 
     @pyTTkSlot()
     def _viewChangedHandler(self):
-        messages = self._logRepository.messages()
+        self._pending = False
+        count = self._logRepository.count()
         offx, offy = self.getViewOffsets()
         _,h = self.size()
-        if self._follow or offy == len(messages)-h-1:
-            offy = len(messages)-h
+        if self._follow or offy == count-h-1:
+            offy = count-h
         self.viewMoveTo(offx, offy)
         self.update()
 
     def viewFullAreaSize(self) -> tuple[int, int]:
-        messages = self._logRepository.messages()
-        w = max( m.termWidth() for m in messages)
-        h = len(messages)
-        return w , h
+        return self._logRepository.width(), self._logRepository.count()
 
     def viewDisplayedSize(self) -> tuple[int, int]:
         return self.size()
 
     def paintEvent(self, canvas):
-        messages = self._logRepository.messages()
         ox,oy = self.getViewOffsets()
         _,h = self.size()
-        for y, message in enumerate(messages[oy:oy+h]):
+        for y, message in enumerate(self._logRepository.messages(oy, oy+h)):
             canvas.drawTTkString(pos=(-ox,y),text=message)
 
 class TTkEditorLogViewer(TTkAbstractScrollArea):
@@ -100,3 +210,8 @@ class TTkEditorLogViewer(TTkAbstractScrollArea):
         self._logView = _TTkEditorLogViewer(logRepository, *args, **kwargs)
         self.setFocusPolicy(TTkK.TTkConstant.ClickFocus)
         self.setViewport(self._logView)
+
+    def close(self):
+        '''Stop the updates of the view'''
+        self._logView.close()
+        super().close()
@@ -38,6 +38,12 @@ def main():
     # parser.add_argument('-f', help='Full Screen', action='store_true')
     parser.add_argument(
         '-c', help=f'config folder (default: "{TTKEditorConfig.pathCfg}")', default=TTKEditorConfig.pathCfg)
+    parser.add_argument(
+        '-l', help='open read only the files bigger than this size in MB', type=int, default=None)
+    parser.add_argument(
+        '--log-level', help='lowest level of the messages kept in the logs', choices=['debug', 'info', 'warning', 'error'], default=None)
+    parser.add_argument(
+        '--rebuild-index', help='rebuild the search index of the current folder and exit', action='store_true')
     parser.add_argument('filename', type=str, nargs='*',
                         help='the filename/s')
     args = parser.parse_args()
@@ -48,6 +54,19 @@ def main():
     TTkLog.debug(f"Config Path: {TTKEditorConfig.pathCfg}")
 
     TTKEditorConfig.load()
+    if args.l is not None:
+        TTKEditorConfig.largeFileSize = args.l*1024*1024
+    if args.log_level is not None:
+        TTKEditorConfig.logLevel = args.log_level
+
+    if args.rebuild_index:
+        from .findinfiles import TTKEditorSearchWorker
+        from .trigramindex import TTKEditorTrigramIndex
+        index = TTKEditorTrigramIndex.forRoot('.')
+        index.rebuild()
+        TTKEditorSearchWorker.shutdown()
+        print(f"{index.fileCount()} files indexed in {index.indexPath()}")
+        return
 
     # if 'theme' not in TTKEditorConfig.options:
     #     TTKEditorConfig.options['theme'] = 'NERD'
@@ -66,7 +85,7 @@ def main():
                 )
             )
 
-    root.layout().addWidget(_d:=TTkEditorApp(files=args.filename))
+    root.layout().addWidget(_d:=TTkEditorApp(files=args.filename, session=True))
 
     # if args.showkeys:
     #     _d.setWidget(widget=TTkKeyPressView(maxHeight=3), position=_d.FOOTER, size=3)
@@ -0,0 +1,130 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import codecs
+from difflib import SequenceMatcher
+
+from TermTk import TTkLog, TTkString
+
+
+# Size of the end of the file compared to detect the appended content
+_tailSize = 4096
+# Max lines compared line by line, bigger changes replace the whole changed block
+_diffLines = 10000
+
+
+def fileState(filePath, size=None):
+    '''Return the (inode, size, mtime, tail) of the file,
+    the tail are the last bytes before size (the end of the file by default)'''
+    with open(filePath, 'rb') as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size if size is None else size
+        f.seek(max(0, size-_tailSize))
+        tail = f.read(size-max(0, size-_tailSize))
+    return st.st_ino, size, st.st_mtime_ns, tail
+
+
+def diffLines(old, new):
+    '''Return the (line, removed lines, added lines) changes
+    from the old to the new texts'''
+    size = min(len(old), len(new))
+    a = 0
+    while a < size and old[a] == new[a]:
+        a += 1
+    b = 0
+    while b < size-a and old[-1-b] == new[-1-b]:
+        b += 1
+    old, new = old[a:len(old)-b], new[a:len(new)-b]
+    if not old and not new:
+        return []
+    if len(old) > _diffLines or len(new) > _diffLines:
+        return [(a, len(old), new)]
+    return [
+        (a+i1, i2-i1, new[j1:j2])
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, old, new, autojunk=False).get_opcodes()
+        if tag != 'equal']
+
+
+def _readFile(filePath, encoding, offset=0, tail=b'', bom=False):
+    # Decode the bytes after offset, an incomplete character (or a \r
+    # that may be followed by \n) is left to the next read.
+    # Return the text and the state of the file at the end of the text
+    with open(filePath, 'rb') as f:
+        st = os.fstat(f.fileno())
+        f.seek(offset)
+        data = f.read()
+    decoder = codecs.getincrementaldecoder(encoding)()
+    text = decoder.decode(data)
+    size = len(data)-len(decoder.getstate()[0])
+    if text.endswith('\r'):
+        text = text[:-1]
+        size -= len('\r'.encode(encoding))
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    if bom and not offset and text.startswith('\ufeff'):
+        text = text[1:]
+    return text, (st.st_ino, offset+size, st.st_mtime_ns, (tail+data[:size])[-_tailSize:])
+
+
+def reloadDocument(document):
+    '''Update the document changed on disk, only the new lines are appended
+    if the file grew and the previous content is unchanged, the changed lines
+    are replaced otherwise. The documents with unsaved changes are not reloaded.
+    Return True if the document is updated'''
+    filePath = document.filePath()
+    # Not loaded from the file
+    if (old := document.fileState()) is None:
+        return False
+    try:
+        st = os.stat(filePath)
+    except FileNotFoundError:
+        TTkLog.warn(f"Removed on disk: {filePath}")
+        return False
+    if (st.st_ino, st.st_size, st.st_mtime_ns) == old[:3]:
+        return False
+    snapId = document.snapshootId()
+    if document.isModified():
+        TTkLog.warn(f"Changed on disk, the unsaved changes are kept: {filePath}")
+        return False
+    try:
+        appended = (
+            st.st_ino == old[0] and st.st_size > old[1] and
+            fileState(filePath, old[1])[3] == old[3])
+        if document.isMapped():
+            return document.reloadMapped(appended)
+        if appended:
+            text, state = _readFile(filePath, document.encoding(), old[1], old[3])
+            texts = text.split('\n')
+            # The text continues the last line
+            texts[0] = document._dataLines[-1]._text + texts[0]
+            hunks = [(document.lineCount()-1, 1, [TTkString(t) for t in texts])]
+            TTkLog.debug(f"Appended {state[1]-old[1]} bytes: {filePath}")
+        else:
+            text, state = _readFile(filePath, document.encoding(), bom=document.bom())
+            with document.getLock():
+                current = [l._text for l in document._dataLines]
+            hunks = [(a, b, [TTkString(t) for t in c]) for a, b, c in diffLines(current, text.split('\n'))]
+            TTkLog.debug(f"Reloaded {len(hunks)} changes: {filePath}")
+    except (OSError, UnicodeDecodeError) as e:
+        TTkLog.error(f"Error reloading {filePath}: {e}")
+        return False
+    return document.reloadLines(hunks, snapId, state)
@@ -0,0 +1,146 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import time
+import shutil
+import tempfile
+from itertools import islice
+from threading import Thread
+
+from TermTk import TTkLog
+from TermTk import pyTTkSignal
+
+from .reloader import fileState
+
+
+class TTKEditorFileSaver():
+    '''Save a TTKEditorTextDocument from a background thread.
+
+    The lines are copied (a snapshot is saved) when the saver is created,
+    written in chunks to a temporary file in the same folder,
+    synced and renamed over the file, so the file is never truncated.
+
+    The document is not changed by the thread, once finished the caller
+    marks the snapshot saved (see snapId)'''
+    _chunkLines = 10000
+    # Min time between two progress updates
+    _flushInterval = 0.1
+
+    __slots__ = (
+        '_document', '_filePath', '_encoding', '_bom', '_newline', '_lines', '_snapId',
+        '_written', '_thread', '_failed',
+        'progress', 'finished')
+
+    def __init__(self, document, cursor, filePath=None, encoding=None):
+        # lines written, lines
+        self.progress = pyTTkSignal(int, int)
+        # failed
+        self.finished = pyTTkSignal(bool)
+        self._document = document
+        self._filePath = filePath or document.filePath()
+        self._encoding = encoding or document.encoding()
+        self._bom = document.bom()
+        self._newline = document.newline()
+        self._lines, self._snapId = document.savePoint(cursor)
+        self._written = 0
+        self._failed = False
+        self._thread = Thread(target=self._run, name='TTKEditorFileSaver', daemon=True)
+
+    def document(self):
+        return self._document
+
+    def filePath(self):
+        return self._filePath
+
+    def snapId(self):
+        '''Id of the snapshot saved'''
+        return self._snapId
+
+    def lineCount(self):
+        return len(self._lines)
+
+    def linesWritten(self):
+        return self._written
+
+    def isRunning(self):
+        return self._thread.is_alive()
+
+    def isFailed(self):
+        return self._failed
+
+    def start(self):
+        self._thread.start()
+
+    def _write(self, f):
+        lines = iter(self._lines)
+        lastFlush = 0
+        while chunk := [l._text for l in islice(lines, self._chunkLines)]:
+            if self._written:
+                f.write('\n')
+            f.write('\n'.join(chunk))
+            self._written += len(chunk)
+            if time.monotonic()-lastFlush >= self._flushInterval:
+                self.progress.emit(self._written, len(self._lines))
+                lastFlush = time.monotonic()
+
+    def _run(self):
+        folder, name = os.path.split(self._filePath)
+        tmpPath = None
+        try:
+            fd, tmpPath = tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp', dir=folder)
+            # The lines are joined by \n, written as the document newline
+            with open(fd, 'w', encoding=self._encoding, newline=self._newline) as f:
+                if self._bom:
+                    f.write('\ufeff')
+                self._write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self._filePath):
+                shutil.copymode(self._filePath, tmpPath)
+            os.replace(tmpPath, self._filePath)
+            tmpPath = None
+            if self._filePath == self._document.filePath():
+                # Not reloaded as changed on disk
+                self._document.setFileState(fileState(self._filePath))
+            # Persist the rename
+            if hasattr(os, 'O_DIRECTORY'):
+                dirFd = os.open(folder or '.', os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(dirFd)
+                finally:
+                    os.close(dirFd)
+        except (OSError, UnicodeEncodeError) as e:
+            TTkLog.error(f"Error saving {self._filePath}: {e}")
+            self._failed = True
+        finally:
+            if tmpPath is not None:
+                try:
+                    os.remove(tmpPath)
+                except OSError:
+                    pass
+        if not self._failed:
+            TTkLog.info(f"Saved {self._filePath}: {len(self._lines)} lines")
+        self.progress.emit(self._written, len(self._lines))
+        self.finished.emit(self._failed)
@@ -0,0 +1,269 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import re
+from bisect import bisect_right
+from itertools import accumulate
+
+from TermTk import TTkTimer, TTkHelper, TTkString
+from TermTk import pyTTkSlot, pyTTkSignal
+
+from .linestore import TTKEditorLineStore, plainLine
+
+
+class TTKEditorSearch():
+    '''Search the matches of a pattern in the lines of a TTKEditorTextDocument.
+
+    The lines are scanned when required (the visible ones, next and previous)
+    and in background, the matches of each line are kept and updated
+    only for the lines changed'''
+    _linesScanned = 5000
+
+    # Scan status of each line
+    NOT_SCANNED = 0
+    NO_MATCH = 1
+    MATCH = 2
+
+    __slots__ = (
+        '_document', '_pattern', '_regex', '_prefilter',
+        '_status', '_matches', '_count', '_timerScan',
+        'searchUpdated')
+
+    def __init__(self, document):
+        # First and last line scanned
+        self.searchUpdated = pyTTkSignal(int, int)
+        self._document = document
+        self._pattern = None
+        self._regex = None
+        self._prefilter = None
+        self._status = bytearray()
+        self._matches = TTKEditorLineStore()
+        self._count = 0
+        self._timerScan = TTkTimer()
+        self._timerScan.timeout.connect(self._scanEvent)
+        document.contentsChange.connect(self._contentsChange)
+
+    def pattern(self):
+        return self._pattern
+
+    def setPattern(self, pattern, regex=False, caseSensitive=False):
+        '''Start a new search, raise re.error if the pattern is not valid'''
+        if not pattern:
+            return self.clear()
+        flags = 0 if caseSensitive else re.IGNORECASE
+        compiled = re.compile(pattern if regex else re.escape(pattern), flags)
+        with self._document.getLock():
+            self._pattern = (pattern, regex, caseSensitive)
+            self._regex = compiled
+            # Used to skip in one pass the chunks without matches,
+            # the string anchors cannot be used in the joined lines
+            if regex and re.search(r'\\[AZ]', pattern):
+                self._prefilter = None
+            else:
+                self._prefilter = re.compile(compiled.pattern, flags | re.MULTILINE)
+            lines = len(self._document._dataLines)
+            self._status = bytearray([self.NOT_SCANNED])*lines
+            self._matches = TTKEditorLineStore.repeat(None, lines)
+            self._count = 0
+        self._timerScan.start(0.05)
+        self.searchUpdated.emit(0, lines-1)
+
+    def clear(self):
+        with self._document.getLock():
+            lines = len(self._status)
+            self._pattern = self._regex = self._prefilter = None
+            self._status = bytearray()
+            self._matches = TTKEditorLineStore()
+            self._count = 0
+        self._timerScan.stop()
+        self.searchUpdated.emit(0, lines-1)
+
+    def close(self):
+        self.clear()
+        self._document.contentsChange.disconnect(self._contentsChange)
+        TTkHelper.quitEvent.disconnect(self._timerScan.quit)
+        self._timerScan.quit()
+
+    @pyTTkSlot(int, int, int)
+    def _contentsChange(self, a, b, c):
+        # Called with the document locked,
+        # only the changed lines need to be scanned again
+        if not self._regex:
+            return
+        self._count -= sum(len(m) for m in self._matches[a:a+b] if m)
+        self._status[a:a+b] = bytes([self.NOT_SCANNED])*c
+        self._matches[a:a+b] = TTKEditorLineStore.repeat(None, c)
+        self._timerScan.start(0.05)
+
+    def _scan(self, a, b):
+        # Scan the not scanned lines from a to b (excluded),
+        # the document must be locked
+        status = self._status
+        b = min(b, len(status))
+        if (a := status.find(self.NOT_SCANNED, a, b)) < 0:
+            return
+        lines = self._document._dataLines[a:b]
+        texts = [l._text for l in lines]
+        if self._prefilter:
+            # Scan only the lines where the joined text has a match,
+            # a match may cover more lines
+            starts = list(accumulate(map((1).__add__, map(len, texts)), initial=0))
+            candidates = set()
+            for m in self._prefilter.finditer('\n'.join(texts)):
+                candidates.update(range(
+                    bisect_right(starts, m.start())-1,
+                    bisect_right(starts, max(m.start(), m.end()-1))))
+            candidates = sorted(candidates)
+        else:
+            candidates = range(len(texts))
+        finditer = self._regex.finditer
+        matches = None
+        for i in candidates:
+            if status[a+i] != self.NOT_SCANNED:
+                continue
+            # Empty matches are not shown
+            if m := tuple(m.span() for m in finditer(texts[i]) if m.end() > m.start()):
+                if matches is None:
+                    matches = list(self._matches[a:b])
+                matches[i] = m
+                self._count += len(m)
+                status[a+i] = self.MATCH
+        if matches is not None:
+            self._matches[a:b] = matches
+        # The remaining lines have no matches
+        status[a:b] = status[a:b].replace(bytes([self.NOT_SCANNED]), bytes([self.NO_MATCH]))
+
+    @pyTTkSlot()
+    def _scanEvent(self):
+        with self._document.getLock():
+            if not self._regex:
+                return
+            if (a := self._status.find(self.NOT_SCANNED)) < 0:
+                return
+            b = a + TTKEditorSearch._linesScanned
+            self._scan(a, b)
+            more = self._status.find(self.NOT_SCANNED, b) >= 0
+        if more:
+            self._timerScan.start(0.01)
+        self.searchUpdated.emit(a, b-1)
+
+    def count(self):
+        '''Return the matches found and if all the lines are scanned'''
+        return self._count, self._status.find(self.NOT_SCANNED) < 0
+
+    def matches(self, fr, to):
+        '''Return the (start, end) matches of each line from fr to to (included)'''
+        with self._document.getLock():
+            if not self._regex:
+                return [()]*(to-fr+1)
+            self._scan(fr, to+1)
+            return [m or () for m in self._matches[fr:to+1]]
+
+    def replaceAll(self, replacement, cursor):
+        '''Replace all the matches with the replacement (a template for the regex patterns)
+        in a single change and undo step, return the number of matches replaced'''
+        with self._document.getLock():
+            if not self._regex or not (lines := len(self._status)):
+                return 0
+            self._scan(0, lines)
+            status = self._status
+            if (first := status.find(self.MATCH)) < 0:
+                return 0
+            last = status.rfind(self.MATCH)
+            # Only the matches shown are replaced, the empty ones are kept
+            template = replacement if self._pattern[1] else replacement.replace('\\', r'\\')
+            sub = lambda m: m.expand(template) if m.end() > m.start() else m.group()
+            subn = self._regex.subn
+            # The replaced lines are as plain as the original ones
+            plain = template.isascii() and '\033' not in template
+            count = 0
+            newLines = []
+            i = first
+            for n, l in enumerate(self._document._dataLines[first:last+1], first):
+                if n != i:
+                    newLines.append(l)
+                    continue
+                matches = len(self._matches[n])
+                text, m = subn(template, l._text)
+                if m != matches:
+                    # There are empty matches in the line
+                    text = subn(sub, l._text)[0]
+                count += matches
+                if plain and l._hasSpecialWidth is None and '\033' not in text:
+                    newLines.extend(plainLine(t) for t in text.split('\n'))
+                else:
+                    newLines.extend(TTkString(t) for t in text.split('\n'))
+                i = status.find(self.MATCH, i+1)
+        self._document.replaceLines(first, last+1-first, newLines, cursor)
+        return count
+
+    def _findLine(self, fr, to, step):
+        # First line with matches from fr to to (included) in the step direction
+        status = self._status
+        while True:
+            if step > 0:
+                m = status.find(self.MATCH, fr, to+1)
+                n = status.find(self.NOT_SCANNED, fr, to+1)
+                if n < 0 or 0 <= m < n:
+                    return m
+                self._scan(n, n+TTKEditorSearch._linesScanned)
+                fr = n
+            else:
+                m = status.rfind(self.MATCH, to, fr+1)
+                n = status.rfind(self.NOT_SCANNED, to, fr+1)
+                if n < 0 or m > n:
+                    return m
+                self._scan(max(to, n-TTKEditorSearch._linesScanned+1), n+1)
+                fr = n
+
+    def next(self, line, pos):
+        '''Return the (line, start, end) of the first match after the position,
+        searching from the beginning when the end is reached'''
+        with self._document.getLock():
+            if not self._regex or not (lines := len(self._status)):
+                return None
+            self._scan(line, line+1)
+            for s, e in self._matches[line] or ():
+                if s >= pos:
+                    return line, s, e
+            for fr, to in ((line+1, lines-1), (0, line)):
+                if fr <= to and (i := self._findLine(fr, to, 1)) >= 0:
+                    s, e = self._matches[i][0]
+                    return i, s, e
+        return None
+
+    def previous(self, line, pos):
+        '''Return the (line, start, end) of the last match ending before the position,
+        searching from the end when the beginning is reached'''
+        with self._document.getLock():
+            if not self._regex or not (lines := len(self._status)):
+                return None
+            self._scan(line, line+1)
+            for s, e in reversed(self._matches[line] or ()):
+                if e <= pos:
+                    return line, s, e
+            for fr, to in ((line-1, 0), (lines-1, line)):
+                if fr >= to and (i := self._findLine(fr, to, -1)) >= 0:
+                    s, e = self._matches[i][-1]
+                    return i, s, e
+        return None
@@ -0,0 +1,97 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from TermTk import TTkK
+from TermTk import pyTTkSlot, pyTTkSignal
+from TermTk import TTkContainer
+from TermTk import TTkGridLayout
+from TermTk import TTkLineEdit
+from TermTk import TTkCheckbox
+from TermTk import TTkButton
+from TermTk import TTkLabel
+
+
+class TTkEditorSearchBar(TTkContainer):
+    __slots__ = (
+        '_searchEdit', '_replaceEdit', '_regexCheck', '_caseCheck', '_countLabel',
+        'patternChanged', 'findNext', 'findPrevious', 'replaceAll')
+
+    def __init__(self, *args, **kwargs):
+        # pattern, regex, case sensitive
+        self.patternChanged = pyTTkSignal(str, bool, bool)
+        self.findNext = pyTTkSignal()
+        self.findPrevious = pyTTkSignal()
+        # replacement
+        self.replaceAll = pyTTkSignal(str)
+        super().__init__(*args, **kwargs)
+        self.setLayout(layout := TTkGridLayout())
+
+        layout.addWidget(TTkLabel(text="Search:", maxWidth=8), 0, 0)
+        layout.addWidget(searchEdit := TTkLineEdit(), 0, 1)
+        layout.addWidget(regexCheck := TTkCheckbox(text="Regex", maxWidth=9), 0, 2)
+        layout.addWidget(caseCheck := TTkCheckbox(text="Case", maxWidth=8), 0, 3)
+        layout.addWidget(prevButton := TTkButton(text="<", maxWidth=3), 0, 4)
+        layout.addWidget(nextButton := TTkButton(text=">", maxWidth=3), 0, 5)
+        layout.addWidget(countLabel := TTkLabel(text="", maxWidth=16, minWidth=16), 0, 6)
+        layout.addWidget(TTkLabel(text="Replace:", maxWidth=8), 1, 0)
+        layout.addWidget(replaceEdit := TTkLineEdit(), 1, 1)
+        layout.addWidget(replaceButton := TTkButton(text="Replace all", maxWidth=13), 1, 2, 1, 2)
+        self._searchEdit = searchEdit
+        self._replaceEdit = replaceEdit
+        self._regexCheck = regexCheck
+        self._caseCheck = caseCheck
+        self._countLabel = countLabel
+
+        # Search as the user types
+        searchEdit.textEdited.connect(self._patternChanged)
+        regexCheck.toggled.connect(self._patternChanged)
+        caseCheck.toggled.connect(self._patternChanged)
+        searchEdit.returnPressed.connect(self.findNext.emit)
+        nextButton.clicked.connect(self.findNext.emit)
+        prevButton.clicked.connect(self.findPrevious.emit)
+        replaceEdit.returnPressed.connect(self._replaceAll)
+        replaceButton.clicked.connect(self._replaceAll)
+
+    def pattern(self):
+        return (str(self._searchEdit.text()),
+                self._regexCheck.isChecked(),
+                self._caseCheck.isChecked())
+
+    @pyTTkSlot()
+    def _patternChanged(self):
+        self.patternChanged.emit(*self.pattern())
+
+    @pyTTkSlot()
+    def _replaceAll(self):
+        self.replaceAll.emit(str(self._replaceEdit.text()))
+
+    def setCount(self, text):
+        self._countLabel.setText(text)
+
+    @pyTTkSlot()
+    def setFocus(self):
+        self._searchEdit.setFocus()
+
+    @pyTTkSlot()
+    def setReplaceFocus(self):
+        self._replaceEdit.setFocus()
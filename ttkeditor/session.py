@@ -0,0 +1,75 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+
+from TermTk import TTkLog
+
+from .config import TTKEditorConfig
+
+
+class TTKEditorSession():
+    '''Open files, split layout, cursors and scroll positions
+    of the editor saved as yaml in TTKEditorConfig.pathCfg'''
+    _version = 2
+
+    @staticmethod
+    def sessionPath():
+        return os.path.join(TTKEditorConfig.pathCfg, 'session.yaml')
+
+    @staticmethod
+    def load():
+        '''Return the saved session, None if not available or not valid'''
+        import yaml
+        try:
+            with open(TTKEditorSession.sessionPath(), encoding='utf-8') as f:
+                data = yaml.safe_load(f)
+        except (OSError, UnicodeDecodeError, yaml.YAMLError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != TTKEditorSession._version:
+            return None
+        if not isinstance(session := data.get('session'), dict):
+            return None
+        return session
+
+    @staticmethod
+    def save(session):
+        '''Write the session to a temporary file renamed over the saved one'''
+        import yaml
+        path = TTKEditorSession.sessionPath()
+        tmpPath = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmpPath, 'w', encoding='utf-8') as f:
+                yaml.safe_dump({'version': TTKEditorSession._version, 'session': session},
+                               f, sort_keys=False, default_flow_style=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmpPath, path)
+        except (OSError, yaml.YAMLError) as e:
+            TTkLog.error(f"Error saving the session {path}: {e}")
+            try:
+                os.remove(tmpPath)
+            except OSError:
+                pass
@@ -22,155 +22,624 @@
 # SOFTWARE.
 
 
+import time
 from threading import Lock
 
-from pygments import highlight
-from pygments.util import ClassNotFound
-from pygments.lexers import guess_lexer, guess_lexer_for_filename, special
-from pygments.formatters import TerminalFormatter, Terminal256Formatter, TerminalTrueColorFormatter
-
 from TermTk import TTk, TTkK, TTkLog, TTkCfg, TTkTheme, TTkTerm, TTkHelper, TTkTimer
 from TermTk import TTkString
 from TermTk import TTkColor, TTkColorGradient
 from TermTk import pyTTkSlot, pyTTkSignal
 
 from TermTk import TTkTextDocument
-from .formatter import TTKEditorFormatter
+from .linestore import TTKEditorLineStore, TTKEditorMappedLines
+from .highlighter import highlightLines, supportsCheckpoints, TTKEditorHighlightWorker
+from .search import TTKEditorSearch
+from .lexercache import TTKEditorLexerCache
+from .highlightcache import TTKEditorHighlightCache
+from .undo import TTKEditorUndoHistory
+from .config import TTKEditorConfig
+from .reloader import fileState
 
 
 class TTKEditorTextDocument(TTkTextDocument):
     _linesRefreshed = 30
+    # Max lines lexed before a visible chunk to recover the lexer context,
+    # the background refresh will fix them when it reaches them
+    _linesContext = 100
     DEFAULT_ENCODING = "UTF-8"
 
+    # Highlight status of each line
+    HL_CLEAN = 0        # Highlighted, the end state is exact
+    HL_DIRTY = 1        # Changed or never highlighted
+    HL_PROVISIONAL = 2  # Highlighted from a guessed lexer state
+    HL_STALE = 3        # Unchanged, but the lexer state at its beginning may be changed
+
     __slots__ = (
         '_filePath', '_encoding', '_timerRefresh',
         'kodeHighlightUpdate', '_kodeDocMutex',
-        '_blocks', '_changedContent', '_refreshContent',
-        '_lexer', '_formatter', 'lexerNameChanged')
+        '_states', '_hlStatus', '_spans',
+        '_lexer', '_formatter', 'lexerNameChanged',
+        '_views', '_openTime', '_firstColoredScreenTime',
+        '_revision', '_highlightJob', '_highlightResult', '_loading', '_suspended', '_search', '_cachedHighlight', '_highlightSaved',
+        '_savedSnapId', '_wasModified', '_fileState', '_bom', '_newline', '_history', '_logRepository')
 
     def __init__(self, *args, **kwargs):
-        encoding = kwargs.get('encoding', self.DEFAULT_ENCODING)
-        self.kodeHighlightUpdate = pyTTkSignal()
+        # Not passed to TTkTextDocument, its arguments are keyword only from pyTermTk 0.41
+        encoding = kwargs.pop('encoding', self.DEFAULT_ENCODING)
+        filePath = kwargs.pop('filePath', "")
+        logRepository = kwargs.pop('logRepository', None)
+        bom = kwargs.pop('bom', False)
+        newline = kwargs.pop('newline', '\n')
+        mapped = kwargs.pop('mapped', False)
+        # First and last line highlighted
+        self.kodeHighlightUpdate = pyTTkSignal(int, int)
         self.lexerNameChanged = pyTTkSignal(str)
         self._kodeDocMutex = Lock()
         self._lexer = None
-        self._blocks = []
-        self._formatter = TTKEditorFormatter(style='gruvbox-dark', encoding=encoding)
+        self._views = []
+        self._openTime = time.monotonic()
+        self._firstColoredScreenTime = None
+        # Incremented on each change, the highlight results
+        # of an older revision are discarded
+        self._revision = 0
+        self._highlightJob = None
+        # (job, future) of the highlight done, applied by _refreshEvent
+        self._highlightResult = None
+        self._loading = False
+        # No highlight while the document has no views (see removeView)
+        self._suspended = False
+        # Created with the first highlight, Pygments is not imported before
+        self._formatter = None
+        # The highlight is restored from the highlight cache once loaded
+        self._cachedHighlight = False
+        # The highlight cache has the current highlight (see saveHighlight)
+        self._highlightSaved = True
+        # State of the file the lines are read from (see reloader.fileState)
+        self._fileState = None
         super().__init__(*args, **kwargs)
-        self._filePath = kwargs.get('filePath', "")
+        self._filePath = filePath
+        # The debug messages are composed only if kept by this repository
+        self._logRepository = logRepository
         self._encoding = encoding
+        # Written back when saved, the lines are always split by \n
+        self._bom = bom
+        self._newline = newline
+        if mapped:
+            # Read only, the lines are read from the file when required
+            self._dataLines = TTKEditorMappedLines(self._filePath, encoding)
+            self._lastSnap = self._dataLines
+            self._fileState = fileState(self._filePath, self._dataLines.size())
+        else:
+            # Edits and snapshots in O(log n) instead of splicing/copying the list
+            self._dataLines = TTKEditorLineStore(self._dataLines)
+            self._lastSnap = self._dataLines.copy()
+        # Replaces the snapshots of TTkTextDocument, the changes are kept
+        # as line range deltas (see saveSnapshot and _restoreSnapshotDiff)
+        self._history = TTKEditorUndoHistory(self._lastCursor, TTKEditorConfig.undoMemory, TTKEditorConfig.undoSpill)
+        self._snap = None
         self._timerRefresh = TTkTimer()
         self._timerRefresh.timeout.connect(self._refreshEvent)
         self._timerRefresh.start(0.3)
-        self._changedContent = (0, 0, len(self._dataLines))
-        self._refreshContent = (0, TTKEditorTextDocument._linesRefreshed)
-        self.contentsChange.connect(
-            lambda a, b, c: TTkLog.debug(f"{a=} {b=} {c=}"))
+        # The memory mapped files are not highlighted
+        lines = 0 if self.isMapped() else len(self._dataLines)
+        # Lexer state at the end of each line (checkpoint),
+        # None if the line is not highlighted
+        self._states = TTKEditorLineStore.repeat(None, lines)
+        self._hlStatus = bytearray([self.HL_DIRTY])*lines
+        # Highlight runs of each line, kept apart from the text
+        # and applied only when painted (see highlightedLines)
+        self._spans = TTKEditorLineStore.repeat(None, lines)
+        if self._logRepository and self._logRepository.isEnabled(TTkLog.DebugMsg):
+            self.contentsChange.connect(
+                lambda a, b, c: TTkLog.debug(f"{a=} {b=} {c=}"))
         self.contentsChange.connect(self._saveChangedContent)
+        self.contentsChanged.connect(self._newRevision)
+        self._search = TTKEditorSearch(self)
+        # Id of the snapshot saved in the file
+        self._savedSnapId = self.snapshootId()
+        self._wasModified = False
+        self.contentsChange.connect(self._checkModified)
+
+    @pyTTkSlot()
+    def _newRevision(self):
+        self._revision += 1
 
     @pyTTkSlot(int, int, int)
     def _saveChangedContent(self, a, b, c):
-        if self._changedContent:
-            self._changedContent = TTkTextDocument._mergeChangesSlices(
-                self._changedContent, (a, b, c))
-        else:
-            self._changedContent = (a, b, c)
-        if not self._refreshContent:
-            self._refreshContent = (
-                self._changedContent[0], TTKEditorTextDocument._linesRefreshed)
+        # The memory mapped files are not highlighted
+        if self.isMapped():
+            return
+        # Keep the highlight aligned to the lines
+        self._states[a:a+b] = TTKEditorLineStore.repeat(None, c)
+        self._hlStatus[a:a+b] = bytes([self.HL_DIRTY])*c
+        self._spans[a:a+b] = TTKEditorLineStore.repeat(None, c)
         self._timerRefresh.start(0.1)
 
+    def isMapped(self):
+        return isinstance(self._dataLines, TTKEditorMappedLines)
+
+    def isLoading(self):
+        return self._loading
+
+    def setLoading(self, loading):
+        if loading:
+            self._cachedHighlight = not self.isMapped() and TTKEditorHighlightCache.isCached(self._filePath)
+        with self._kodeDocMutex:
+            self._loading = loading
+            if not loading:
+                # The loaded text is the base for the undo and the modified status
+                self._lastSnap = self._dataLines.copy()
+                self._history.clear(self._lastCursor)
+                self._snapChanged = None
+                self._modified = False
+                self._savedSnapId = self.snapshootId()
+        if not loading:
+            if self._cachedHighlight:
+                self._restoreHighlight()
+            self._checkModified()
+
+    def appendLines(self, lines, replaceLast=False):
+        '''Append the TTkString lines at the end of the document,
+        if replaceLast the last line is replaced'''
+        with self._kodeDocMutex:
+            a = len(self._dataLines)
+            b = 1 if replaceLast else 0
+            self._dataLines[a-b:] = lines
+            self.contentsChange.emit(a-b, b, len(lines))
+        self.contentsChanged.emit()
+
+    def replaceLines(self, a, b, lines, cursor):
+        '''Replace the b lines from a with the TTkString lines
+        in a single change and undo step'''
+        with self._kodeDocMutex:
+            # The pending changes are kept in their own undo step
+            if self._snapChanged:
+                self.saveSnapshot(cursor)
+            self._dataLines[a:a+b] = lines
+            self.contentsChange.emit(a, b, len(lines))
+            self.saveSnapshot(cursor, merge=False)
+        self.contentsChanged.emit()
+        self._clampCursors()
+
+    def _clampCursors(self):
+        # Keep the cursors of the views inside the document
+        for view in self._views:
+            p = (c := view.textCursor()).position()
+            line = min(p.line, len(self._dataLines)-1)
+            c.setPosition(line, min(p.pos, len(self._dataLines[line])))
+
+    def fileState(self):
+        return self._fileState
+
+    def setFileState(self, state):
+        self._fileState = state
+
+    def reloadLines(self, hunks, snapId, state):
+        '''Apply the (line, removed, added lines) changes read from the file
+        in a single undo step, the document is left not modified.
+        Return False if the document is changed since the snapshot snapId'''
+        with self._kodeDocMutex:
+            if self._loading or self._snapChanged is not None or self.snapshootId() != snapId:
+                return False
+            # From the last change, the line numbers of the previous ones are still valid
+            for a, b, lines in reversed(hunks):
+                self._dataLines[a:a+b] = lines
+                self.contentsChange.emit(a, b, len(lines))
+            if hunks:
+                self.saveSnapshot(self._lastCursor.copy(), merge=False)
+            self._savedSnapId = self.snapshootId()
+            self._fileState = state
+        if hunks:
+            self.contentsChanged.emit()
+            self._clampCursors()
+        self._checkModified()
+        return True
+
+    def reloadMapped(self, appended):
+        '''Map again the file changed on disk,
+        only the new lines are scanned if appended'''
+        with self._kodeDocMutex:
+            lines = self._dataLines
+            if appended:
+                a, b, c = lines.grow()
+            else:
+                # The old map is released once not used
+                self._dataLines = self._lastSnap = TTKEditorMappedLines(self._filePath, self._encoding)
+                a, b, c = 0, len(lines), len(self._dataLines)
+            self._fileState = fileState(self._filePath, self._dataLines.size())
+            self.contentsChange.emit(a, b, c)
+            # Read only, there are no changes to be saved
+            self._snapChanged = None
+        self.contentsChanged.emit()
+        self._clampCursors()
+        self._checkModified()
+        return True
+
+    def undoHistory(self):
+        return self._history
+
+    def snapshootId(self):
+        return self._history.stateId()
+
+    def hasSnapshots(self):
+        return True
+
+    def isUndoAvailable(self):
+        return self._history.isUndoAvailable()
+
+    def isRedoAvailable(self):
+        return self._history.isRedoAvailable()
+
+    def setChanged(self, c):
+        self._modified = c
+        if c:
+            # The changes undone cannot be redone anymore
+            self._history.clearRedo()
+
+    def setModified(self, m=True):
+        if m:
+            self._history.clearRedo()
+        if self._modified == m:
+            return
+        self._modified = m
+        self.modificationChanged.emit(m)
+
+    def saveSnapshot(self, cursor, merge=True):
+        '''Add the changes since the last snapshot to the undo history,
+        the typing in a single line may be merged with the previous change'''
+        sa, sb, sc = self._snapChanged if self._snapChanged else (0, 0, 0)
+        self._snapChanged = None
+        if sb or sc:
+            # The saved state is kept
+            merge = merge and self._history.stateId() != self._savedSnapId
+            self._history.push(sa, self._lastSnap[sa:sa+sb], sc, cursor, merge)
+        else:
+            self._history.setCursor(cursor)
+        self._modified = False
+        self._lastSnap = self._dataLines.copy()
+        self._lastCursor = cursor
+        self.undoAvailable.emit(self.isUndoAvailable())
+        self.redoAvailable.emit(self.isRedoAvailable())
+
+    def _restoreSnapshotDiff(self, next=True):
+        # Same as TTkTextDocument._restoreSnapshotDiff, from the undo history,
+        # notifying the restored lines to keep the highlight and the search aligned
+        with self._kodeDocMutex:
+            history = self._history
+            if (change := history.redo(self._dataLines) if next else history.undo(self._dataLines)) is None:
+                return None
+            self.contentsChange.emit(*change)
+            # Already part of the history
+            self._snapChanged = None
+            self._lastSnap = self._dataLines.copy()
+            cursor = history.cursor()
+            self._lastCursor = cursor.copy()
+        self.contentsChanged.emit()
+        self.undoAvailable.emit(self.isUndoAvailable())
+        self.redoAvailable.emit(self.isRedoAvailable())
+        self._clampCursors()
+        self._checkModified()
+        return cursor
+
+    def isModified(self):
+        '''True if the lines differ from the saved snapshot'''
+        return self._snapChanged is not None or self.snapshootId() != self._savedSnapId
+
+    def _checkModified(self, *args):
+        if self._loading or (modified := self.isModified()) == self._wasModified:
+            return
+        self._wasModified = modified
+        self.modificationChanged.emit(modified)
+
+    def savePoint(self, cursor):
+        '''Save a snapshot of the pending changes,
+        return a copy of the lines and the id of the snapshot'''
+        with self._kodeDocMutex:
+            if self._snapChanged is not None:
+                self.saveSnapshot(cursor)
+            return self._dataLines.copy(), self.snapshootId()
+
+    def setSaved(self, snapId):
+        '''The snapshot with this id is saved in the file'''
+        self._savedSnapId = snapId
+        self._checkModified()
+
+    def addView(self, view):
+        if view in self._views:
+            return
+        self._views.append(view)
+        view.viewChanged.connect(self._viewportChanged)
+        if self._suspended:
+            self._suspended = False
+            self._timerRefresh.start(0)
+
+    def removeView(self, view):
+        if view not in self._views:
+            return
+        self._views.remove(view)
+        view.viewChanged.disconnect(self._viewportChanged)
+        if not self._views:
+            self.unloadHighlight()
+
+    def unloadHighlight(self):
+        '''Release the highlight, it is computed again
+        when a view is added'''
+        self.saveHighlight()
+        with self._kodeDocMutex:
+            self._suspended = True
+            self._timerRefresh.stop()
+            # Discard the running highlight
+            self._revision += 1
+            lines = 0 if self.isMapped() else len(self._dataLines)
+            self._states = TTKEditorLineStore.repeat(None, lines)
+            self._hlStatus = bytearray([self.HL_DIRTY])*lines
+            self._spans = TTKEditorLineStore.repeat(None, lines)
+            self._highlightSaved = True
+
+    def saveHighlight(self):
+        '''Save the highlight in the highlight cache, only if the document
+        is the same as the file and the highlight changed since the last save'''
+        if self._highlightSaved or self.isMapped() or self._lexer is None or self._fileState is None:
+            return
+        with self._kodeDocMutex:
+            if self._loading or self._suspended or self.isModified():
+                return
+            if self._hlStatus.count(self.HL_DIRTY) == len(self._hlStatus):
+                return
+            _, size, mtime, _ = self._fileState
+            status, states, spans = bytes(self._hlStatus), self._states.copy(), self._spans.copy()
+            self._highlightSaved = True
+        TTKEditorHighlightCache.save(self._filePath, mtime, size, self._lexer.name, status, states, spans)
+
+    def _restoreHighlight(self):
+        # The lines of the unchanged files are not lexed again
+        self._cachedHighlight = False
+        if self._fileState is None:
+            return
+        _, size, mtime, _ = self._fileState
+        if ((cached := TTKEditorHighlightCache.load(self._filePath, mtime, size, len(self._dataLines))) is None or
+                (lexer := TTKEditorLexerCache.lexerByName(cached[0], encoding=self._encoding)) is None):
+            return
+        _, status, states, spans = cached
+        self._createFormatter()
+        with self._kodeDocMutex:
+            if self._suspended or self.isModified() or len(status) != len(self._dataLines):
+                return
+            # Discard the running highlight
+            self._revision += 1
+            self._states = TTKEditorLineStore(states)
+            self._hlStatus = status
+            self._spans = TTKEditorLineStore(
+                None if st == self.HL_DIRTY else sp for st, sp in zip(status, spans))
+            self._highlightSaved = True
+            visibleRanges = self._visibleRanges()
+            if self._firstColoredScreenTime is None and visibleRanges and not self._hasDirtyLines(visibleRanges):
+                self._firstColoredScreenTime = time.monotonic() - self._openTime
+                TTkLog.info(f"First colored screen in {self._firstColoredScreenTime*1000:.1f}ms (cached): {self._filePath}")
+        self._setLexer(lexer)
+        self._timerRefresh.start(0)
+        self.kodeHighlightUpdate.emit(0, len(status)-1)
+
+    def close(self):
+        '''Stop the highlight timer and release the file'''
+        self.unloadHighlight()
+        TTkHelper.quitEvent.disconnect(self._timerRefresh.quit)
+        self._timerRefresh.quit()
+        self._search.close()
+        if self.isMapped():
+            self._dataLines.close()
+
+    def views(self):
+        return self._views
+
+    def firstColoredScreenTime(self):
+        '''Seconds from the document creation to the first time all the
+        visible lines got highlighted, None if it did not happen yet'''
+        return self._firstColoredScreenTime
+
+    def _viewRange(self, view, margin=False):
+        if not view.isVisibleAndParent():
+            return None
+        _, oy = view.getViewOffsets()
+        h = view.height()
+        wrapLines = view._textWrap._lines[oy:oy+h]
+        if not wrapLines:
+            return None
+        a, b = wrapLines[0][0], wrapLines[-1][0]+1
+        if margin:
+            a, b = max(0, a-h), b+h
+        return a, min(b, len(self._hlStatus))
+
+    def _visibleRanges(self, margin=False):
+        return [r for view in self._views if (r := self._viewRange(view, margin))]
+
+    def _findStatus(self, status, a=0, b=None):
+        b = len(self._hlStatus) if b is None else b
+        found = [i for s in status if (i := self._hlStatus.find(s, a, b)) >= 0]
+        return min(found) if found else -1
+
+    def _hasDirtyLines(self, ranges):
+        return any(
+            self._findStatus((self.HL_DIRTY, self.HL_STALE), a, b) >= 0
+            for a, b in ranges)
+
+    @pyTTkSlot()
+    def _viewportChanged(self):
+        if self._hasDirtyLines(self._visibleRanges()):
+            self._timerRefresh.start(0)
+
+    def _nextRefreshRange(self):
+        # The visible lines have the priority, then the lines
+        # around the viewports and at last the background refresh
+        for margin in (False, True):
+            for a, b in self._visibleRanges(margin):
+                if (i := self._findStatus((self.HL_DIRTY, self.HL_STALE), a, b)) >= 0:
+                    return i, b, True
+        if (i := self._findStatus((self.HL_DIRTY, self.HL_STALE, self.HL_PROVISIONAL))) >= 0:
+            return i, i+TTKEditorTextDocument._linesRefreshed, False
+        return None
+
+    def _checkpoint(self, line, priority):
+        '''Return the line where to restart the lexer to highlight
+        the given line, its state and the status to be assigned
+        to the highlighted lines'''
+        if not supportsCheckpoints(self._lexer):
+            # Lexed from the beginning, the visible lines from some lines before
+            if priority and line > TTKEditorTextDocument._linesContext:
+                return line-TTKEditorTextDocument._linesContext, ('root',), self.HL_PROVISIONAL
+            return 0, ('root',), self.HL_CLEAN
+        ra = line
+        while ra and not self._states[ra-1]:
+            if priority and line-ra >= TTKEditorTextDocument._linesContext:
+                return ra, ('root',), self.HL_PROVISIONAL
+            ra -= 1
+        if not ra:
+            return 0, ('root',), self.HL_CLEAN
+        if self._hlStatus[ra-1] == self.HL_PROVISIONAL:
+            return ra, self._states[ra-1], self.HL_PROVISIONAL
+        return ra, self._states[ra-1], self.HL_CLEAN
+
+    def _guessLexer(self):
+        with self._kodeDocMutex:
+            rawt = '\n'.join(l._text for l in self._dataLines[:TTKEditorTextDocument._linesRefreshed])
+        self._setLexer(TTKEditorLexerCache.lexer(self._filePath, rawt, encoding=self._encoding))
+
+    def _setLexer(self, lexer):
+        old, self._lexer = self._lexer, lexer
+        # Notified only when the language changes
+        if old is None or old.name != lexer.name:
+            self.lexerNameChanged.emit(lexer.name)
+
+    def _createFormatter(self):
+        if self._formatter is None:
+            from .formatter import TTKEditorFormatter
+            self._formatter = TTKEditorFormatter(style='gruvbox-dark', encoding=self._encoding)
+
     @pyTTkSlot()
     def _refreshEvent(self):
-        if not self._refreshContent:
+        if (result := self._highlightResult) is not None:
+            self._highlightResult = None
+            return self._applyHighlight(*result)
+        if self._highlightJob or self._suspended:
+            return
+        if self._loading and self._cachedHighlight:
+            # Restored once loaded (see setLoading)
+            return
+        if self.isMapped():
+            if not self._lexer:
+                self._setLexer(TTKEditorLexerCache.textLexer(encoding=self._encoding))
             return
-        self._kodeDocMutex.acquire()
-
-        ra, rb = self._refreshContent
-
-        if self._changedContent:
-            ca, cb, cc = self._changedContent
-            self._changedContent = None
-            self._blocks[ca:ca+cb] = [0]*cc
-            ra = min(ra, ca)
-
-        # find the beginning of the current block
-        # TTkLog.debug(self._blocks)
-        if ra and self._blocks:
-            blockId = self._blocks[ra]
-            for i, v in enumerate(reversed(self._blocks[:ra])):
-                # TTkLog.debug(f"{i=}:{v=} {blockId=}")
-                if v == blockId or not blockId:
-                    blockId = v
-                    ra -= 1
-                    rb += 1
-                else:
-                    break
-
-        # TTkLog.debug(f"{ra=} {rb=}")
-
-        eof = False
-        if (ra+rb) >= len(self._dataLines):
-            rb = len(self._dataLines)-ra
-            eof = True
-
-        tsl = self._dataLines[ra:ra+rb]
-        # Find the offset from the first not empty line
-        # because pygments autostrip the heading empty lines
-        offset = 0
-        for i, l in enumerate(tsl):
-            if l != '':
-                offset = i
-                break
-
-        rawl = [l._text for l in tsl[offset:]]
-        rawt = '\n'.join(rawl)
         if not self._lexer:
-            try:
-                self._lexer = guess_lexer_for_filename(self._filePath, rawt, encoding=self._encoding)
-            except ClassNotFound:
-                self._lexer = special.TextLexer(encoding=self._encoding)
-
-        self.lexerNameChanged.emit(self._lexer.name)
-
-        # TTkLog.debug(f"Refresh {self._lexer.name} {ra=} {rb=}")
-        tsl1 = [TTkString()]*(offset+1)
-        block = [0]*(offset+1)
-
-        kfd = TTKEditorFormatter.Data(tsl1, block)
-        self._formatter.setDl(kfd)
-
-        highlight(rawt, self._lexer, self._formatter)
-
-        # for ll in tsl:
-        #     TTkLog.debug(f"1: -{ll}-")
-        # for ll in tsl1:
-        #     TTkLog.debug(f"2: -{ll}-")
-
-        tsl1 = tsl1[:rb]
-        block = block[:rb]
-        self._dataLines[ra:ra+rb] = tsl1 + tsl[len(tsl1):]
-        self._blocks[ra:ra+rb] = block + [-1]*(rb-len(block))
-        # TTkLog.debug(self._blocks)
-
-        if kfd.error is not None:
-            self._refreshContent = (ra+kfd.error, rb << 1)
-            # TTkLog.debug(f"Error: {self._refreshContent=}")
-        elif kfd.multiline is not None:
-            self._refreshContent = (ra+kfd.multiline, rb << 1)
-        elif (ra+rb) < len(self._dataLines):
-            self._refreshContent = (ra+rb, TTKEditorTextDocument._linesRefreshed)
-        else:
-            self._refreshContent = None
-        # TTkLog.debug(f"{self._refreshContent=}")
+            if self._loading and len(self._dataLines) < TTKEditorTextDocument._linesRefreshed:
+                # Not enough text to guess the lexer yet
+                self._timerRefresh.start(0.1)
+                return
+            self._guessLexer()
+        self._createFormatter()
 
-        if not eof:
-            self._timerRefresh.start(0.03)
-        else:
-            TTkLog.debug(f"Refresh {self._lexer.name} DONE!!!")
+        # Only a snapshot of the lines to be highlighted is taken
+        # under the lock, the lexer runs in the highlight worker
+        with self._kodeDocMutex:
+            refreshRange = self._nextRefreshRange()
+            if not refreshRange:
+                return
+            line, end, priority = refreshRange
+
+            ra, stack, status = self._checkpoint(line, priority)
+            if not (priority or supportsCheckpoints(self._lexer)):
+                # Lexed to the end in a single pass instead of from the beginning for each chunk
+                end = len(self._dataLines)
+            rb = min(end, len(self._dataLines))
+            # TTkLog.debug(f"Refresh {self._lexer.name} {ra=} {rb=} {stack=}")
+            texts = [l._text for l in self._dataLines[ra:rb]]
+            oldStates = self._states[ra:rb]
+            oldStatus = self._hlStatus[ra:rb]
+            self._highlightJob = job = (self._revision, ra, status)
+
+        # Restart the lexer from the checkpoint and stop as soon as the state
+        # at the end of an unchanged line match the cached one,
+        # the following lines do not require to be highlighted again,
+        # it stops also if the document changes, the result would be discarded
+        revision = job[0]
+        future = TTKEditorHighlightWorker.submit(
+            highlightLines, self._lexer, self._formatter, stack,
+            texts, oldStates, oldStatus, (self.HL_CLEAN, self.HL_STALE),
+            lambda: self._revision != revision)
+        if future is None:
+            self._highlightJob = None
+            return
+        future.add_done_callback(lambda f: self._highlightDone(job, f))
+
+    def _highlightDone(self, job, future):
+        # Called from the highlight worker, the views are read
+        # and the update is notified only from the refresh timer
+        self._highlightResult = (job, future)
+        self._timerRefresh.start(0)
+
+    def _applyHighlight(self, job, future):
+        revision, ra, status = job
+        with self._kodeDocMutex:
+            self._highlightJob = None
+            if future.cancelled():
+                return
+            if future.exception():
+                TTkLog.error(f"Highlight failed {self._filePath}: {future.exception()}")
+                return
+            if revision != self._revision:
+                # The document changed while highlighting, the next refresh
+                # will process the same lines from the updated content
+                self._timerRefresh.start(0)
+                return
+
+            spans, states, matched = future.result()
+            rb = ra+len(spans)
+            self._spans[ra:rb] = spans
+            self._states[ra:rb] = states
+            self._hlStatus[ra:rb] = bytes([status])*len(spans)
+            self._highlightSaved = False
+            # The lexer state of the next line may be changed
+            if not matched and rb < len(self._hlStatus) and self._hlStatus[rb] == self.HL_CLEAN:
+                self._hlStatus[rb] = self.HL_STALE
 
-        self._kodeDocMutex.release()
-        self.kodeHighlightUpdate.emit()
+            visibleRanges = self._visibleRanges()
+            if self._firstColoredScreenTime is None and visibleRanges and not self._hasDirtyLines(visibleRanges):
+                self._firstColoredScreenTime = time.monotonic() - self._openTime
+                TTkLog.info(f"First colored screen in {self._firstColoredScreenTime*1000:.1f}ms: {self._filePath}")
+
+            if self._hasDirtyLines(self._visibleRanges(True)):
+                self._timerRefresh.start(0)
+            elif self._findStatus((self.HL_DIRTY, self.HL_STALE, self.HL_PROVISIONAL)) >= 0:
+                self._timerRefresh.start(0.03)
+            else:
+                # Cached once completed, in the highlight worker
+                TTKEditorHighlightWorker.submit(self.saveHighlight)
+                if self._logRepository and self._logRepository.isEnabled(TTkLog.DebugMsg):
+                    TTkLog.debug(f"Refresh {self._lexer.name} DONE!!!")
+
+        self.kodeHighlightUpdate.emit(ra, rb-1)
+
+    def visibleRange(self, view):
+        '''Return the first and the last+1 lines shown by the view, None if not visible'''
+        return self._viewRange(view)
+
+    def highlightSpans(self, fr, to):
+        '''Return the lines from fr to to (included) and their highlight runs,
+        None if not highlighted'''
+        if self.isMapped():
+            lines = self._dataLines[fr:to+1]
+            return lines, [None]*len(lines)
+        with self._kodeDocMutex:
+            return self._dataLines[fr:to+1], self._spans[fr:to+1]
+
+    def colorize(self, line, spans):
+        return self._formatter.colorize(line, spans) if spans else line
+
+    def highlightedLines(self, fr, to):
+        '''Return the lines from fr to to (included) colored by the highlighter'''
+        return [self.colorize(l, s) for l, s in zip(*self.highlightSpans(fr, to))]
+
+    def search(self):
+        return self._search
 
     def getLock(self):
         return self._kodeDocMutex
@@ -181,5 +650,11 @@ class TTKEditorTextDocument(TTkTextDocument):
     def encoding(self):
         return self._encoding
 
+    def bom(self):
+        return self._bom
+
+    def newline(self):
+        return self._newline
+
     def lexer(self):
         return self._lexer
@@ -22,12 +22,195 @@
 # SOFTWARE.
 
 
+from TermTk import TTkK
 from TermTk import TTkLog
+from TermTk import TTkColor
+from TermTk import TTkString
+from TermTk import pyTTkSlot
 from TermTk import TTkTextEditView
+from TermTk import TTkTextWrap
+
+from .linestore import TTKEditorMappedLines
+from .textdocument import TTKEditorTextDocument
+
+
+class TTKEditorTextWrap(TTkTextWrap):
+    def rewrap(self):
+        lines = self._textDocument._dataLines
+        if not isinstance(lines, TTKEditorMappedLines):
+            return super().rewrap()
+        # The memory mapped files are never wrapped,
+        # the screen lines are computed from the line offsets
+        self._lines = lines.wrapLines()
+        self.wrapChanged.emit()
+
+    def dataToScreenPosition(self, line, pos):
+        if not isinstance(self._textDocument._dataLines, TTKEditorMappedLines):
+            return super().dataToScreenPosition(line, pos)
+        l = self._textDocument._dataLines[line].substring(0, pos).tab2spaces(self._tabSpaces)
+        return l.termWidth(), line
+
 
 class TTKEditorTextEditView(TTkTextEditView):
+    # Background of the search matches
+    _matchColor = TTkColor.bg('#665c54')
+
+    __slots__ = ('_colorizedLines', '_follow')
+
+    def __init__(self, *args, **kwargs):
+        # line -> (line, highlight runs, colorized line) of the last painted lines
+        self._colorizedLines = {}
+        # Keep the last lines visible when the document grows
+        self._follow = kwargs.get('follow', False)
+        super().__init__(*args, **kwargs)
+
+    def follow(self):
+        return self._follow
+
+    @pyTTkSlot(bool)
+    def setFollow(self, follow):
+        self._follow = follow
+        if follow:
+            self._followTail()
+
+    def _followTail(self):
+        ox, _ = self.getViewOffsets()
+        self.viewMoveTo(ox, max(0, len(self._textWrap._lines)-self.height()))
+
+    def setDocument(self, document):
+        # Register the view to let the document highlight the visible lines first
+        if isinstance(oldDocument := self.document(), TTKEditorTextDocument):
+            oldDocument.removeView(self)
+            oldDocument.kodeHighlightUpdate.disconnect(self._highlightUpdated)
+            oldDocument.search().searchUpdated.disconnect(self._highlightUpdated)
+        self._colorizedLines = {}
+        if isinstance(document, TTKEditorTextDocument):
+            # The TTkTextWrap created by TTkTextEditView.setDocument is replaced,
+            # the lines are hidden to not wrap them twice (or read the mapped ones)
+            with document.getLock():
+                lines, document._dataLines = document._dataLines, []
+                try:
+                    super().setDocument(document)
+                finally:
+                    document._dataLines = lines
+        else:
+            super().setDocument(document)
+        self._textWrap.wrapChanged.disconnect(self.update)
+        self._textWrap = TTKEditorTextWrap(document=self._textDocument)
+        self._textWrap.wrapChanged.connect(self.update)
+        if isinstance(document, TTKEditorTextDocument):
+            document.addView(self)
+            document.kodeHighlightUpdate.connect(self._highlightUpdated)
+            document.search().searchUpdated.connect(self._highlightUpdated)
+
+    @pyTTkSlot(int, int)
+    def _highlightUpdated(self, fr, to):
+        # Ignore the lines out of the viewport
+        if (visible := self.document().visibleRange(self)) and fr < visible[1] and visible[0] <= to:
+            self.update()
+
+    def _updateSize(self):
+        lines = self._textDocument._dataLines
+        if not isinstance(lines, TTKEditorMappedLines):
+            return super()._updateSize()
+        # The size in bytes is enough to scroll horizontally
+        self._hsize = lines.maxLineSize() + 1
+
+    def _documentChanged(self):
+        document = self.document()
+        textWrap = self._textWrap
+        if not (isinstance(document, TTKEditorTextDocument) and document.isLoading() and not textWrap._enable):
+            super()._documentChanged()
+        else:
+            # While loading the lines are only appended (or the last one replaced),
+            # wrap just the new ones instead of the whole document
+            i = max(0, len(textWrap._lines)-1)
+            textWrap._lines[i:] = [(n, (0, len(l)+1)) for n, l in enumerate(document._dataLines[i:], i)]
+            textWrap.wrapChanged.emit()
+            self.viewChanged.emit()
+            self.update()
+            self.textChanged.emit()
+        if self._follow:
+            self._followTail()
+
+    def pasteEvent(self, txt) -> bool:
+        self.document().getLock().acquire()
+        ret = super().pasteEvent(txt)
+        self.document().getLock().release()
+        return ret
+
     def keyEvent(self, evt) -> bool:
         self.document().getLock().acquire()
         ret = super().keyEvent(evt)
         self.document().getLock().release()
-        return ret
\ No newline at end of file
+        return ret
+
+    def _markMatches(self, line, matches):
+        colors = line._colors.copy()
+        for s, e in matches:
+            colors[s:e] = [c + self._matchColor for c in colors[s:e]]
+        return TTkString._importString1(line._text, colors)
+
+    def _highlightedLines(self, fr, to, color):
+        # Same as TTkTextCursor.getHighlightedLines,
+        # applied to the lines colored by the document highlighter
+        document = self.document()
+        if isinstance(document, TTKEditorTextDocument):
+            # Colorize only the lines changed since the last paint
+            lines, spans = document.highlightSpans(fr, to)
+            cache, self._colorizedLines = self._colorizedLines, {}
+            ret = []
+            for i, (l, s) in enumerate(zip(lines, spans), fr):
+                c = cache.get(i)
+                if not (c and c[0] is l and c[1] is s):
+                    c = (l, s, document.colorize(l, s))
+                self._colorizedLines[i] = c
+                ret.append(c[2])
+            if document.search().pattern():
+                for i, matches in enumerate(document.search().matches(fr, to)):
+                    if matches:
+                        ret[i] = self._markMatches(ret[i], matches)
+        else:
+            ret = document._dataLines[fr:to+1]
+        sel = []
+        for p in self._textCursor._properties:
+            selSt = p.selectionStart()
+            selEn = p.selectionEnd()
+            if selEn.line >= fr and selSt.line <= to:
+                sel.append((selSt, selEn, p))
+        for selSt, selEn, _ in sel:
+            for i in range(max(selSt.line, fr), min(selEn.line+1, to+1)):
+                l = ret[i-fr]
+                pf = 0 if i > selSt.line else selSt.pos
+                pt = len(l) if i < selEn.line else selEn.pos
+                ret[i-fr] = l.setColor(color=color, posFrom=pf, posTo=pt)
+        # Add Blinking cursor
+        if len(self._textCursor._properties) > 1:
+            for _, _, prop in sel:
+                p = prop.position
+                ret[p.line-fr] = ret[p.line-fr].setColor(color=color+TTkColor.BLINKING, posFrom=p.pos, posTo=p.pos+1)
+                if p.pos == len(ret[p.line-fr]):
+                    ret[p.line-fr] = ret[p.line-fr]+TTkString('↵', color+TTkColor.BLINKING)
+                elif ret[p.line-fr].charAt(p.pos) == ' ':
+                    ret[p.line-fr].setCharAt(pos=p.pos, char='∙')
+        return ret
+
+    def paintEvent(self, canvas):
+        ox, oy = self.getViewOffsets()
+
+        style = self.currentStyle()
+        selectColor = style['selectedColor']
+        lineColor = style['lineColor']
+
+        h = self.height()
+        subLines = self._textWrap._lines[oy:oy+h]
+        if not subLines:
+            return
+        outLines = self._highlightedLines(subLines[0][0], subLines[-1][0], selectColor)
+
+        for y, l in enumerate(subLines):
+            t = outLines[l[0]-subLines[0][0]]
+            canvas.drawTTkString(pos=(-ox, y), text=t.substring(l[1][0], l[1][1]).tab2spaces(self._textWrap._tabSpaces))
+
+        if self._lineWrapMode == TTkK.FixedWidth:
+            canvas.drawVLine(pos=(self._textWrap._wrapWidth, 0), size=h, color=lineColor)
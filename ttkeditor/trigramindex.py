@@ -0,0 +1,287 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import re
+import marshal
+import hashlib
+import time
+from array import array
+from threading import RLock
+from concurrent.futures import as_completed
+
+try:
+    from re import _parser, _constants
+except ImportError:
+    import sre_parse as _parser
+    import sre_constants as _constants
+
+from TermTk import TTkLog
+
+from .config import TTKEditorConfig
+from .findinfiles import TTKEditorSearchWorker, walkFiles
+
+
+def fileTrigrams(paths, maxSize):
+    '''Return the (path, mtime, size, trigrams) of the files,
+    trigrams is the set of the lowercase byte trigrams of the text
+    or None for the binary files and the files bigger than maxSize'''
+    ret = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            data = None
+            if st.st_size <= maxSize:
+                with open(path, 'rb') as f:
+                    # The binary files are not read
+                    if b'\0' not in (data := f.read(8192)):
+                        data += f.read()
+                    else:
+                        data = None
+        except OSError:
+            continue
+        if data is None:
+            ret.append((path, st.st_mtime_ns, st.st_size, None))
+            continue
+        data = data.lower()
+        # Zipping the bytes is faster than slicing them
+        ret.append((path, st.st_mtime_ns, st.st_size, set(map(bytes, set(zip(data, data[1:], data[2:]))))))
+    return ret
+
+
+def _literals(parsed):
+    # The literal strings contained in every match of the parsed pattern
+    runs, run = [], []
+    for op, av in parsed:
+        if op is _constants.LITERAL:
+            run.append(chr(av))
+            continue
+        runs.append(''.join(run))
+        run = []
+        if op is _constants.SUBPATTERN:
+            runs += _literals(av[-1])
+        elif op in (_constants.MAX_REPEAT, _constants.MIN_REPEAT) and av[0] >= 1:
+            runs += _literals(av[2])
+    runs.append(''.join(run))
+    return [r for r in runs if r]
+
+
+def patternTrigrams(pattern, flags=0):
+    '''Return the lowercase byte trigrams contained
+    in the text of every match of the regex pattern'''
+    parsed = _parser.parse(pattern, flags)
+    # Under IGNORECASE "k" and "s" match also the non ASCII
+    # KELVIN SIGN and LATIN SMALL LETTER LONG S
+    ignoreCase = (flags | parsed.state.flags) & re.IGNORECASE
+    split = '[^\x00-\x7f]|[ks]' if ignoreCase else '[^\x00-\x7f]'
+    ret = set()
+    for run in _literals(parsed):
+        for text in re.split(split, run.lower()):
+            data = text.encode()
+            ret.update(data[i:i+3] for i in range(len(data)-2))
+    return ret
+
+
+class TTKEditorTrigramIndex():
+    '''On disk trigram index of the files under a folder.
+
+    The index keeps the trigrams of each file (lowercase bytes)
+    and is updated only for the files with a different mtime or size,
+    the files containing all the trigrams of a pattern are
+    the candidates to be searched. The folder is walked again
+    only if the last update is older than the max age requested'''
+    _version = 1
+    _batchSize = 64
+    # The removed files are compacted when more than the indexed ones
+    _compactRatio = 1
+
+    __slots__ = (
+        '_root', '_indexPath', '_mutex', '_updateMutex', '_updated',
+        '_files', '_ids', '_postings', '_removed', '_dirty')
+
+    # root -> index shared by the searches
+    _indexes = {}
+
+    @staticmethod
+    def forRoot(root):
+        root = os.path.realpath(root)
+        if root not in TTKEditorTrigramIndex._indexes:
+            TTKEditorTrigramIndex._indexes[root] = TTKEditorTrigramIndex(root)
+        return TTKEditorTrigramIndex._indexes[root]
+
+    def __init__(self, root):
+        self._root = os.path.realpath(root)
+        name = hashlib.sha1(self._root.encode()).hexdigest()[:16]
+        self._indexPath = os.path.join(TTKEditorConfig.pathCfg, 'index', f"{name}.idx")
+        self._mutex = RLock()
+        # Held while walking the folder, the queries are not blocked
+        self._updateMutex = RLock()
+        # Time of the last update, None if never updated
+        self._updated = None
+        self._clear()
+        self.load()
+
+    def _clear(self):
+        # id -> (path, mtime, size, text), None for the removed files
+        self._files = []
+        # path -> id
+        self._ids = {}
+        # trigram -> ids of the files containing it
+        self._postings = {}
+        self._removed = 0
+        self._dirty = False
+
+    def root(self):
+        return self._root
+
+    def indexPath(self):
+        return self._indexPath
+
+    def fileCount(self):
+        return len(self._ids)
+
+    def load(self):
+        with self._mutex:
+            self._clear()
+            try:
+                with open(self._indexPath, 'rb') as f:
+                    data = marshal.load(f)
+            except (OSError, EOFError, ValueError, TypeError):
+                return
+            if data.get('version') != self._version or data.get('root') != self._root:
+                return
+            self._files = data['files']
+            self._ids = {f[0]: i for i, f in enumerate(self._files) if f is not None}
+            self._removed = len(self._files) - len(self._ids)
+            self._postings = {t: array('I', ids) for t, ids in data['postings'].items()}
+
+    def save(self):
+        with self._mutex:
+            os.makedirs(os.path.dirname(self._indexPath), exist_ok=True)
+            tmpPath = f"{self._indexPath}.tmp"
+            with open(tmpPath, 'wb') as f:
+                marshal.dump({
+                    'version': self._version,
+                    'root': self._root,
+                    'files': self._files,
+                    'postings': {t: ids.tobytes() for t, ids in self._postings.items()}}, f)
+            os.replace(tmpPath, self._indexPath)
+            self._dirty = False
+
+    def rebuild(self, cancel=None):
+        '''Index again all the files'''
+        with self._updateMutex:
+            with self._mutex:
+                self._clear()
+                self._dirty = True
+            self.update(cancel)
+            TTkLog.info(f"Index {self._root} rebuilt: {self.fileCount()} files")
+
+    def update(self, cancel=None, maxAge=None):
+        '''Index the new and the changed files, remove the missing ones,
+        nothing is done if the last update is more recent than maxAge seconds'''
+        with self._updateMutex:
+            if maxAge is not None and self._updated is not None and time.monotonic()-self._updated < maxAge:
+                return
+            with self._mutex:
+                indexed = {path: self._files[i][1:3] for path, i in self._ids.items()}
+            changed = []
+            found = set()
+            for path in walkFiles(self._root, cancel):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.add(path)
+                if indexed.get(path) != (st.st_mtime_ns, st.st_size):
+                    changed.append(path)
+            if cancel and cancel.is_set():
+                return
+            futures = [TTKEditorSearchWorker.submit(fileTrigrams, changed[i:i+self._batchSize], TTKEditorConfig.largeFileSize)
+                       for i in range(0, len(changed), self._batchSize)]
+            results = [r for future in as_completed(futures) for r in future.result()]
+            with self._mutex:
+                for path in (indexed.keys() - found) | set(changed):
+                    self._remove(path)
+                for path, mtime, size, trigrams in results:
+                    self._add(path, mtime, size, trigrams)
+                if self._removed > self._compactRatio * len(self._ids):
+                    self._compact()
+                if self._dirty:
+                    TTkLog.debug(f"Index {self._root}: {len(changed)} files indexed")
+                    try:
+                        self.save()
+                    except OSError as e:
+                        TTkLog.error(f"Error saving the index {self._indexPath}: {e}")
+            self._updated = time.monotonic()
+
+    def _add(self, path, mtime, size, trigrams):
+        self._ids[path] = i = len(self._files)
+        self._files.append((path, mtime, size, trigrams is not None))
+        postings = self._postings
+        for t in trigrams or ():
+            if (ids := postings.get(t)) is None:
+                postings[t] = ids = array('I')
+            ids.append(i)
+        self._dirty = True
+
+    def _remove(self, path):
+        # The ids are kept in the postings until compacted
+        if (i := self._ids.pop(path, None)) is not None:
+            self._files[i] = None
+            self._removed += 1
+            self._dirty = True
+
+    def _compact(self):
+        # Renumber the files dropping the removed ones
+        newIds = array('I', [0])*len(self._files)
+        files = []
+        for i, f in enumerate(self._files):
+            if f is not None:
+                newIds[i] = len(files)
+                files.append(f)
+        alive = self._files
+        self._postings = {
+            t: new for t, ids in self._postings.items()
+            if (new := array('I', [newIds[i] for i in ids if alive[i] is not None]))}
+        self._files = files
+        self._ids = {f[0]: i for i, f in enumerate(files)}
+        self._removed = 0
+        self._dirty = True
+
+    def candidates(self, pattern, flags=0):
+        '''Return the files that may contain a match of the regex pattern,
+        the binary files are excluded'''
+        trigrams = patternTrigrams(pattern, flags)
+        with self._mutex:
+            files = self._files
+            if trigrams:
+                postings = sorted((self._postings.get(t, ()) for t in trigrams), key=len)
+                ids = set(postings[0])
+                for p in postings[1:]:
+                    if not ids:
+                        break
+                    ids.intersection_update(p)
+            else:
+                ids = range(len(files))
+            return sorted(files[i][0] for i in ids if files[i] is not None and files[i][3])
@@ -0,0 +1,234 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import sys
+import time
+import pickle
+import tempfile
+from itertools import count
+
+from TermTk import TTkLog, TTkColor, TTkString
+
+from .linestore import plainLine
+
+# Id of each state of the documents
+_ids = count(1)
+
+
+def _compact(line):
+    # The plain lines are kept as str, the colored ones as they are
+    if '\033' not in (text := line._text) and line._colors.count(TTkColor.RST) == len(text):
+        return text
+    return line
+
+
+def _expand(line):
+    if type(line) is not str:
+        return line
+    return plainLine(line) if line.isascii() else TTkString(line)
+
+
+def _size(line):
+    # Approximate memory used by a stored line
+    if type(line) is str:
+        return sys.getsizeof(line) + 8
+    return sys.getsizeof(line._text) + sys.getsizeof(line._colors) + 64
+
+
+class _TTKEditorUndoEntry():
+    __slots__ = ('line', 'count', 'lines', 'spilled', 'size', 'cursor', 'id', 'time')
+
+    def __init__(self, line, count, lines, cursor):
+        # The lines replacing the count lines from line,
+        # None if spilled to disk at the (offset, length) of spilled
+        self.line = line
+        self.count = count
+        self.lines = lines
+        self.spilled = None
+        self.size = sum(map(_size, lines))
+        # Cursor and id of the state once applied
+        self.cursor = cursor
+        self.id = next(_ids)
+        self.time = time.monotonic()
+
+
+class TTKEditorUndoHistory():
+    '''Undo and redo history of a document as line range deltas.
+
+    Each entry replaces a range of lines with its lines, undo and redo
+    swap them with the replaced ones: only the lines not in the document
+    are kept, as str if not colored. The runs of typing in a line are
+    merged in a single entry. The oldest entries beyond the memory budget
+    are spilled to a temporary file if spill is enabled, dropped otherwise'''
+    # Seconds between two changes of the same line merged in a single entry
+    _mergeInterval = 2.0
+
+    __slots__ = ('_entries', '_pos', '_size', '_budget', '_spill', '_spillFile', '_firstId', '_firstCursor')
+
+    def __init__(self, cursor, budget, spill=False):
+        self._budget = budget
+        self._spill = spill
+        self._spillFile = None
+        self.clear(cursor)
+
+    def clear(self, cursor):
+        '''Drop all the entries, cursor is the one of the current state'''
+        # The first _pos entries are applied, the others can be redone
+        self._entries = []
+        self._pos = 0
+        self._size = 0
+        self._firstId = next(_ids)
+        self._firstCursor = cursor
+        if self._spillFile is not None:
+            self._spillFile.close()
+            self._spillFile = None
+
+    def size(self):
+        '''Approximate memory used by the entries'''
+        return self._size
+
+    def entries(self):
+        return len(self._entries)
+
+    def isUndoAvailable(self):
+        return self._pos > 0
+
+    def isRedoAvailable(self):
+        return self._pos < len(self._entries)
+
+    def stateId(self):
+        '''Id of the current state'''
+        return self._entries[self._pos-1].id if self._pos else self._firstId
+
+    def cursor(self):
+        '''Cursor of the current state'''
+        return self._entries[self._pos-1].cursor if self._pos else self._firstCursor
+
+    def setCursor(self, cursor):
+        if self._pos:
+            self._entries[self._pos-1].cursor = cursor
+        else:
+            self._firstCursor = cursor
+
+    def clearRedo(self):
+        '''Drop the entries undone, the document is changed'''
+        if self._pos == len(self._entries):
+            return
+        for entry in self._entries[self._pos:]:
+            self._size -= entry.size
+        del self._entries[self._pos:]
+
+    def push(self, line, lines, count, cursor, merge=True):
+        '''Add the change of the lines from line replaced by count lines,
+        merged with the previous one if both change the same single line'''
+        self.clearRedo()
+        lines = [_compact(l) for l in lines]
+        if merge and self._entries and len(lines) == count == 1:
+            last = self._entries[-1]
+            if (last.line == line and last.count == len(last.lines or ()) == 1 and
+                    time.monotonic() - last.time < TTKEditorUndoHistory._mergeInterval):
+                # The previous content of the line is kept, the new state gets a new id
+                last.cursor = cursor
+                last.id = next(_ids)
+                last.time = time.monotonic()
+                return
+        entry = _TTKEditorUndoEntry(line, count, lines, cursor)
+        self._entries.append(entry)
+        self._pos += 1
+        self._size += entry.size
+        self._evict()
+
+    def undo(self, lines):
+        '''Restore the previous state in lines,
+        return the (line, removed, added) lines changed, None if not available'''
+        if not self._pos:
+            return None
+        self._pos -= 1
+        return self._swap(self._entries[self._pos], lines)
+
+    def redo(self, lines):
+        '''Restore the next state in lines,
+        return the (line, removed, added) lines changed, None if not available'''
+        if self._pos == len(self._entries):
+            return None
+        self._pos += 1
+        return self._swap(self._entries[self._pos-1], lines)
+
+    def _swap(self, entry, lines):
+        stored = entry.lines if entry.lines is not None else self._load(entry)
+        a, b = entry.line, entry.line+entry.count
+        old = [_compact(l) for l in lines[a:b]]
+        lines[a:b] = [_expand(l) for l in stored]
+        if entry.lines is not None:
+            self._size -= entry.size
+        entry.lines, entry.spilled = old, None
+        entry.count = len(stored)
+        entry.size = sum(map(_size, old))
+        self._size += entry.size
+        self._evict()
+        return a, b-a, entry.count
+
+    def _evict(self):
+        # The oldest entries first, then the last ones undone,
+        # the entries next to the current state are kept
+        if self._size <= self._budget:
+            return
+        if self._spill:
+            for i in [*range(self._pos-1), *range(len(self._entries)-1, self._pos, -1)]:
+                if self._size <= self._budget:
+                    return
+                if self._entries[i].lines is not None and not self._store(self._entries[i]):
+                    break
+            else:
+                return
+        while self._size > self._budget and self._pos > 1:
+            entry = self._entries.pop(0)
+            self._pos -= 1
+            self._firstId, self._firstCursor = entry.id, entry.cursor
+            if entry.lines is not None:
+                self._size -= entry.size
+        while self._size > self._budget and len(self._entries) > self._pos+1:
+            if (entry := self._entries.pop()).lines is not None:
+                self._size -= entry.size
+
+    def _store(self, entry):
+        # Move the lines of the entry to the spill file
+        try:
+            if self._spillFile is None:
+                self._spillFile = tempfile.TemporaryFile(prefix='ttkeditor-undo-')
+            data = pickle.dumps(entry.lines, protocol=pickle.HIGHEST_PROTOCOL)
+            offset = self._spillFile.seek(0, 2)
+            self._spillFile.write(data)
+        except (OSError, pickle.PicklingError) as e:
+            TTkLog.error(f"Error spilling the undo history: {e}")
+            return False
+        entry.spilled = (offset, len(data))
+        entry.lines = None
+        self._size -= entry.size
+        return True
+
+    def _load(self, entry):
+        offset, length = entry.spilled
+        self._spillFile.seek(offset)
+        return pickle.loads(self._spillFile.read(length))
@@ -0,0 +1,223 @@
+# MIT License
+#
+# Copyright (c) 2024 Guillermo A. Molina <guillermoadrianmolina AT gmail DOT com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from threading import Thread, Event, Lock
+
+from TermTk import TTkHelper, TTkLog
+from TermTk import pyTTkSlot, pyTTkSignal
+
+
+class _TTKEditorInotify():
+    '''Minimal inotify binding, the folders are watched
+    to catch the files replaced by a rename'''
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    _mask = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+        IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR)
+    _event = struct.Struct('iIII')
+
+    __slots__ = ('_libc', '_fd')
+
+    def __init__(self):
+        '''Raise OSError if inotify is not available'''
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, "inotify is available only on linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if (fd := self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)) < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._fd = fd
+
+    def fileno(self):
+        return self._fd
+
+    def addWatch(self, path):
+        if (wd := self._libc.inotify_add_watch(self._fd, os.fsencode(path), self._mask)) < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {path}")
+        return wd
+
+    def rmWatch(self, wd):
+        self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read(self):
+        '''Return the (wd, mask, name) of the pending events'''
+        try:
+            data = os.read(self._fd, 64*1024)
+        except BlockingIOError:
+            return []
+        ret = []
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, size = self._event.unpack_from(data, pos)
+            pos += self._event.size
+            name = os.fsdecode(data[pos:pos+size].rstrip(b'\0'))
+            pos += size
+            ret.append((wd, mask, name))
+        return ret
+
+    def close(self):
+        os.close(self._fd)
+
+
+class TTKEditorFileWatcher():
+    '''Notify the changes of the watched files from a background thread,
+    using inotify on linux and polling the file stats elsewhere.
+
+    The events are collected for a short delay,
+    a file rewritten in many steps is notified once'''
+    # Time the events are collected before the notification
+    _delay = 0.1
+    # Time between two checks of the stats when inotify is not available
+    _pollInterval = 1.0
+
+    __slots__ = (
+        '_paths', '_folders', '_inotify', '_mutex',
+        '_thread', '_stop',
+        'fileChanged')
+
+    def __init__(self):
+        # path
+        self.fileChanged = pyTTkSignal(str)
+        # path -> (inode, size, mtime), the last stats polled
+        self._paths = {}
+        # folder -> [wd, names], watched by inotify
+        self._folders = {}
+        self._mutex = Lock()
+        self._stop = Event()
+        try:
+            self._inotify = _TTKEditorInotify()
+        except (OSError, AttributeError) as e:
+            TTkLog.warn(f"Polling the files, inotify not available: {e}")
+            self._inotify = None
+        target = self._runInotify if self._inotify else self._runPolling
+        self._thread = Thread(target=target, name='TTKEditorFileWatcher', daemon=True)
+        self._thread.start()
+        TTkHelper.quitEvent.connect(self.close)
+
+    def isPolling(self):
+        return self._inotify is None
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def addPath(self, path):
+        path = os.path.realpath(path)
+        with self._mutex:
+            if path in self._paths:
+                return
+            self._paths[path] = self._stat(path)
+            if self._inotify is None:
+                return
+            folder, name = os.path.split(path)
+            if folder not in self._folders:
+                try:
+                    self._folders[folder] = [self._inotify.addWatch(folder), set()]
+                except OSError as e:
+                    TTkLog.warn(f"Not watched {path}: {e}")
+                    return
+            self._folders[folder][1].add(name)
+
+    def removePath(self, path):
+        path = os.path.realpath(path)
+        with self._mutex:
+            if self._paths.pop(path, False) is False:
+                return
+            folder, name = os.path.split(path)
+            if (watch := self._folders.get(folder)) is None:
+                return
+            watch[1].discard(name)
+            if not watch[1]:
+                del self._folders[folder]
+                self._inotify.rmWatch(watch[0])
+
+    def paths(self):
+        with self._mutex:
+            return list(self._paths)
+
+    @pyTTkSlot()
+    def close(self):
+        self._stop.set()
+
+    def _notify(self, paths):
+        for path in paths:
+            # Removed in the meanwhile
+            if path in self._paths:
+                self.fileChanged.emit(path)
+
+    def _runInotify(self):
+        inotify = self._inotify
+        pending = set()
+        since = 0
+        while not self._stop.is_set():
+            timeout = max(0, since+self._delay-time.monotonic()) if pending else self._pollInterval
+            ready, _, _ = select.select([inotify], [], [], timeout)
+            if ready:
+                events = inotify.read()
+                with self._mutex:
+                    folders = {wd: (folder, names) for folder, (wd, names) in self._folders.items()}
+                    for wd, mask, name in events:
+                        if mask & inotify.IN_Q_OVERFLOW:
+                            # Some events are lost, all the files may be changed
+                            changed = set(self._paths)
+                        elif wd in folders and name in folders[wd][1]:
+                            changed = {os.path.join(folders[wd][0], name)}
+                        else:
+                            continue
+                        if not pending:
+                            since = time.monotonic()
+                        pending |= changed
+            if pending and time.monotonic()-since >= self._delay:
+                self._notify(pending)
+                pending = set()
+        inotify.close()
+
+    def _runPolling(self):
+        while not self._stop.wait(self._pollInterval):
+            changed = []
+            for path in self.paths():
+                stat = self._stat(path)
+                with self._mutex:
+                    if path in self._paths and self._paths[path] != stat:
+                        self._paths[path] = stat
+                        changed.append(path)
+            self._notify(changed)